@@ -1,11 +1,12 @@
 import datetime
-import queue
+from collections import deque
 from core.portfolio_handler import PortfolioHandler
 from constant_position_sizer import ConstantPositionSizer
 from strategy.constant_mix_strategy import ConstantMixStrategy
 from core.price_handler import PriceHandler
 from data.data_factory import StockData
 from core.excution_handler import SimulationExecutionHandler
+from core.statistics import IncrementalStatistics
 
 def run_q1():
 
@@ -14,7 +15,7 @@ def run_q1():
     end_date        = datetime.datetime(2014, 1, 1)
 
     strategy        = ConstantMixStrategy({'AAPL': 0.4, 'C': 0.6})
-    events_queue    = queue.Queue()
+    events_queue    = deque()
     position_sizer  = ConstantPositionSizer()
     s1              = StockData('quandl', ['AAPL', 'C'])
     data_symbols    = [s1]
@@ -28,11 +29,11 @@ def run_q1():
                      risk_manager=None,
                      execution_handler = execution_handler,
                      strategy= strategy,
-                     statistics= None
-
+                     statistics= IncrementalStatistics(),
+                     start_time= start_date
                      )
     port_handler.initialize_parameters()
-    port_handler.run_session()
+    port_handler.start_trading(testing=True)
     print('finished')
 
 if __name__ == "__main__":
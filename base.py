@@ -1,4 +1,9 @@
+import traceback
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pipe, Process
+
+from core.pool import WeightEventPool
 
 
 class AbstractStrategy(object):
@@ -27,18 +32,171 @@ class AbstractStrategy(object):
         self.portfolio_handler = portfolio_handler
 
     def save_signals(self,  event):
-        self.portfolio_handler.events_queue.put(event)
+        self.portfolio_handler.put_event(event)
 
 
 class Strategies(AbstractStrategy):
     """
-    Strategies is a collection of strategy
+    Strategies is a collection of strategies run as one.
+
+    Every child receives the same PriceEventPool and the
+    WeightEventPools they return are merged into one. Each child's
+    latest target weights are kept, so when only some children
+    rebalance on a bar the tickers they target are set to the
+    combination of every child's latest weights for them.
+
+    The children can be evaluated concurrently, each bar, on a pool
+    of threads, or on one worker process per child. The merge
+    always follows the order of the children, whatever order they
+    finish in, so the result is deterministic.
+
+    Parameters:
+    strategies - The child strategies.
+    allocations - One weight per child: a multiplier of its weights
+        with merge='sum' (1 by default), its share of the capital
+        with merge='sleeves' (equal by default, normalised to 1).
+    merge - 'sum' or 'sleeves'.
+    executor - None to run the children in turn, 'thread' or 'process'.
+    max_workers - The number of threads of the thread pool.
+
+    Child strategies run in processes are sent to their worker
+    before initialize() and keep their state there across bars, but
+    never see the portfolio handler: only strategies that work from
+    the events alone can run that way.
     """
-    def __init__(self, *strategies):
-        self._lst_strategies = strategies
+    def __init__(self, *strategies, **kwargs):
+        self._lst_strategies    = strategies
+        self.merge              = kwargs.get('merge', 'sum')
+        self.executor           = kwargs.get('executor')
+        self.max_workers        = kwargs.get('max_workers')
+        allocations             = kwargs.get('allocations')
 
-    def calculate_signals(self, event):
+        if self.merge not in ('sum', 'sleeves'):
+            raise ValueError("Unknown merge '%s', use 'sum' or 'sleeves'" % self.merge)
+        if self.executor not in (None, 'thread', 'process'):
+            raise ValueError("Unknown executor '%s', use None, 'thread' or 'process'" % self.executor)
+        if allocations is None:
+            allocations = [1.0] * len(strategies)
+        if len(allocations) != len(strategies):
+            raise ValueError("Give one allocation per strategy")
+        if self.merge == 'sleeves':
+            total       = float(sum(allocations))
+            allocations = [allocation / total for allocation in allocations]
+        self.allocations    = list(allocations)
+        self._latest        = [{} for _ in strategies]
+        self._pool          = None
+        self._workers       = None
+
+    def initialize(self, portfolio_handler):
+        AbstractStrategy.initialize(self, portfolio_handler)
+        if self.executor == 'process':
+            self._workers = [_StrategyProcess(strategy) for strategy in self._lst_strategies]
+            return
         for strategy in self._lst_strategies:
-            event = strategy.calculate_signals(event)
+            strategy.initialize(portfolio_handler)
+        if self.executor == 'thread':
+            self._pool = ThreadPoolExecutor(self.max_workers or len(self._lst_strategies))
+
+    def calculate_signals(self, event):
+        if self._workers is not None:
+            for worker in self._workers:
+                worker.send(event)
+            results = [worker.receive() for worker in self._workers]
+        else:
+            if self._pool is not None:
+                pools = self._pool.map(lambda strategy: strategy.calculate_signals(event), self._lst_strategies)
+            else:
+                pools = [strategy.calculate_signals(event) for strategy in self._lst_strategies]
+            results = [None if pool is None else pool.get_weights() for pool in pools]
+        return self._merge(event.time, results)
+
+    def _merge(self, time, results):
+        tickers = []
+        for latest, weights in zip(self._latest, results):
+            if weights is None:
+                continue
+            latest.clear()
+            latest.update(weights)
+            tickers.extend(ticker for ticker in weights if ticker not in tickers)
+        if not tickers:
+            return None
+
+        merged = WeightEventPool(time)
+        merged.add_weights({
+            ticker: sum(
+                allocation * latest.get(ticker, 0.0)
+                for allocation, latest in zip(self.allocations, self._latest)
+            )
+            for ticker in tickers
+        })
+        return merged
+
+    def get_state(self):
+        """
+        The latest weights of the children and the state of those
+        with a get_state(); children run in worker processes keep
+        theirs in the worker and are not included.
+        """
+        children = [
+            None if self._workers is not None or not hasattr(strategy, 'get_state') else strategy.get_state()
+            for strategy in self._lst_strategies
+        ]
+        return {'latest': [dict(latest) for latest in self._latest], 'children': children}
+
+    def set_state(self, state):
+        self._latest = state['latest']
+        for strategy, child in zip(self._lst_strategies, state['children']):
+            if child is not None:
+                strategy.set_state(child)
+
+    def close(self):
+        """
+        Shuts down the thread pool or the worker processes.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._workers is not None:
+            for worker in self._workers:
+                worker.close()
+            self._workers = None
+
+
+class _StrategyProcess(object):
+    """
+    A worker process holding one strategy, fed one event at a time
+    through a pipe.
+    """
+    def __init__(self, strategy):
+        self.connection, child  = Pipe()
+        self.process            = Process(target=_run_strategy, args=(strategy, child))
+        self.process.daemon     = True
+        self.process.start()
+        child.close()
+
+    def send(self, event):
+        self.connection.send(event)
+
+    def receive(self):
+        ok, result = self.connection.recv()
+        if not ok:
+            raise RuntimeError("Strategy failed in its worker process:\n%s" % result)
+        return result
+
+    def close(self):
+        self.connection.send(None)
+        self.process.join()
+        self.connection.close()
 
 
+def _run_strategy(strategy, connection):
+    while True:
+        event = connection.recv()
+        if event is None:
+            break
+        try:
+            pool = strategy.calculate_signals(event)
+            connection.send((True, None if pool is None else pool.get_weights()))
+        except Exception:
+            connection.send((False, traceback.format_exc()))
+    connection.close()
@@ -0,0 +1,269 @@
+"""
+End-to-end backtest benchmark: runs PortfolioHandler.run_session on
+the daily DataStore CSVs and on synthetic universes, and reports
+bars/sec, peak RSS, the memory allocated per bar and the blocks
+retained per bar, both traced by tracemalloc, and the time spent in
+each stage (price streaming, strategy, sizing, execution,
+portfolio), as measured by a StageProfiler.
+
+Every case runs in its own process, so peak RSS is per case. The
+results are written as JSON, tagged with the git commit, to be
+compared between commits:
+
+    python -m benchmark.backtest_benchmark [--quick] [--output FILE]
+    python -m benchmark.backtest_benchmark --compare OLD.json NEW.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from multiprocessing import Process, Queue
+
+import numpy as np
+import pandas as pd
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import ArrayPriceHandler, CsvPriceHandler
+from core.profiler import StageProfiler
+from data.csv_api import DATA_STORE, CsvData
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+TICKERS     = [10, 100, 1000, 5000]
+YEARS       = [5, 20, 40]
+QUICK       = [(10, 5), (100, 5), (10, 20)]
+BARS_A_YEAR = 260
+ALLOC_BARS  = 250
+# the StageProfiler stages, by the name they are reported under
+STAGES      = {
+    '_stream_next': 'prices',
+    '_calculate_signals': 'strategy',
+    '_convert_signals_to_order': 'sizing',
+    '_on_suggested_order': 'execution',
+    'update_portfolio_value': 'portfolio',
+    'loop': 'loop'
+}
+
+
+def synthetic_prices(n_tickers, n_bars, seed=0):
+    """
+    Geometric random walks for a universe of n_tickers over n_bars
+    business days, as an ArrayPriceHandler's inputs.
+    """
+    rng         = np.random.RandomState(seed)
+    timestamp   = pd.bdate_range('1980-01-01', periods=n_bars)
+    tickers     = ['T%04d' % i for i in range(n_tickers)]
+    returns     = rng.normal(0.0003, 0.015, (n_bars, n_tickers))
+    adj_close   = 50.0 * np.exp(np.cumsum(returns, axis=0))
+    return timestamp, tickers, adj_close, adj_close.copy()
+
+
+def datastore_prices(csv_dir=DATA_STORE):
+    """
+    The daily DataStore files over the dates they all cover.
+    """
+    tickers = []
+    for name in sorted(os.listdir(csv_dir)):
+        if name.endswith('.csv'):
+            with open(os.path.join(csv_dir, name)) as f:
+                if f.readline().strip().split(',') == CsvData.COLUMNS:
+                    tickers.append(name[:-4])
+    frames  = [CsvData(csv_dir)._read(ticker, None, None) for ticker in tickers]
+    start   = max(frame.index[0] for frame in frames)
+    end     = min(frame.index[-1] for frame in frames)
+    ph      = CsvPriceHandler(tickers, start, end, csv_dir=csv_dir)
+    ph._get_initial_data()
+    return ph.timestamp, tickers, ph.close, ph.adj_close
+
+
+def build_handler(timestamp, tickers, close, adj_close, position_book, profiler=None):
+    price_handler   = ArrayPriceHandler(timestamp, tickers, close, adj_close)
+    weights         = dict((ticker, 1.0 / len(tickers)) for ticker in tickers)
+    handler         = PortfolioHandler(
+        tickers, 1e6 * len(tickers), None, price_handler, ConstantPositionSizer(), None,
+        SimulationExecutionHandler(), ConstantMixStrategy(weights), None, timestamp[0],
+        position_book=position_book, profiler=profiler
+    )
+    handler.initialize_parameters()
+    return handler
+
+
+def measure_allocations(handler):
+    """
+    Runs a session under tracemalloc and returns the memory it
+    allocates per bar, in KB, and the memory blocks still held after
+    it, per bar.
+
+    The memory allocated in a bar is the traced peak during the bar
+    above the traced memory at its start, so temporaries freed
+    within the bar count as well as what the bar keeps.
+    """
+    stream_next = handler._stream_next
+    starts      = []
+    allocated   = []
+
+    def traced_stream_next():
+        if starts:
+            allocated.append(tracemalloc.get_traced_memory()[1] - starts[-1])
+        tracemalloc.reset_peak()
+        starts.append(tracemalloc.get_traced_memory()[0])
+        return stream_next()
+    handler._stream_next = traced_stream_next
+
+    tracemalloc.start()
+    before  = tracemalloc.take_snapshot()
+    handler.run_session()
+    if starts:
+        allocated.append(tracemalloc.get_traced_memory()[1] - starts[-1])
+    after   = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks  = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    n_bars  = max(len(allocated) - 1, 1)     # the last call finds the stream exhausted
+    return float(np.mean(allocated)) / 1024.0 if allocated else 0.0, float(blocks) / n_bars
+
+
+def run_case(case, results):
+    """
+    Runs one case in the current process and puts its measures on
+    the results queue.
+    """
+    name, n_tickers, years, position_book = case
+    start = time.time()
+    if name == 'datastore':
+        prices = datastore_prices()
+    else:
+        prices = synthetic_prices(n_tickers, years * BARS_A_YEAR)
+    load_time = time.time() - start
+    timestamp, tickers, close, adj_close = prices
+    n_bars = len(timestamp) - 1     # the start bar is not streamed
+
+    # memory allocated and retained per bar over a short traced run
+    n_alloc = min(ALLOC_BARS, len(timestamp))
+    handler = build_handler(timestamp[:n_alloc], tickers, close[:n_alloc], adj_close[:n_alloc], position_book)
+    allocated_kb, retained_blocks = measure_allocations(handler)
+    del handler
+
+    # time, in total and per stage
+    profiler = StageProfiler()
+    handler = build_handler(timestamp, tickers, close, adj_close, position_book, profiler)
+    start   = time.time()
+    handler.run_session()
+    elapsed = time.time() - start
+    summary = profiler.get_summary()
+    results.put({
+        'case': name,
+        'n_tickers': len(tickers),
+        'n_bars': n_bars,
+        'position_book': position_book,
+        'load_seconds': load_time,
+        'seconds': elapsed,
+        'bars_per_sec': n_bars / elapsed,
+        'ticker_bars_per_sec': n_bars * len(tickers) / elapsed,
+        'peak_rss_mb': _peak_rss_mb(),
+        'allocated_kb_per_bar': allocated_kb,
+        'retained_blocks_per_bar': retained_blocks,
+        'stage_seconds': dict((STAGES[stage], row['self_time']) for stage, row in summary.items()),
+        'stage_calls': dict((STAGES[stage], row['calls']) for stage, row in summary.items()),
+        'final_equity': float(handler.portfolio.equity)
+    })
+
+
+def get_cases(quick=False, book_above=100):
+    grid    = QUICK if quick else [(n, years) for n in TICKERS for years in YEARS]
+    cases   = [('datastore', None, None, False)]
+    for n_tickers, years in grid:
+        cases.append(('synthetic_%dx%dy' % (n_tickers, years), n_tickers, years, n_tickers > book_above))
+    return cases
+
+
+def run(cases, output=None):
+    results = []
+    for case in cases:
+        queue   = Queue()
+        process = Process(target=run_case, args=(case, queue))
+        process.start()
+        result  = queue.get()
+        process.join()
+        results.append(result)
+        print("%-22s %6d tickers %6d bars %9.0f bars/sec %8.0f MB %8.1f KB/bar %7.1f blocks/bar  %s" % (
+            result['case'], result['n_tickers'], result['n_bars'], result['bars_per_sec'],
+            result['peak_rss_mb'], result['allocated_kb_per_bar'], result['retained_blocks_per_bar'],
+            ' '.join('%s %0.0f%%' % (stage, 100.0 * seconds / result['seconds'])
+                     for stage, seconds in sorted(result['stage_seconds'].items()))))
+
+    report = {
+        'commit': _git_commit(),
+        'date': datetime.datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'results': results
+    }
+    if output is None:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        output = os.path.join(directory, 'backtest_%s_%s.json' % (
+            report['commit'][:10], datetime.datetime.now().strftime('%Y%m%d%H%M%S')))
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("results written to %s" % output)
+    return report
+
+
+def compare(old_path, new_path):
+    """
+    Prints the change in bars/sec and peak RSS of the cases common to
+    two result files.
+    """
+    with open(old_path) as f:
+        old = dict((result['case'], result) for result in json.load(f)['results'])
+    with open(new_path) as f:
+        new = json.load(f)['results']
+    for result in new:
+        before = old.get(result['case'])
+        if before is None:
+            continue
+        print("%-22s bars/sec %9.0f -> %9.0f (%+6.1f%%)   RSS %6.0f -> %6.0f MB" % (
+            result['case'], before['bars_per_sec'], result['bars_per_sec'],
+            100.0 * (result['bars_per_sec'] / before['bars_per_sec'] - 1),
+            before['peak_rss_mb'], result['peak_rss_mb']))
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / 2.0 ** 20
+    return peak / 1024.0
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--quick', action='store_true', help='a small grid of synthetic universes')
+    parser.add_argument('--output', help='the JSON results file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two results files')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run(get_cases(args.quick), args.output)
+    sys.exit(0)
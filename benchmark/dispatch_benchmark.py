@@ -0,0 +1,86 @@
+"""
+Measures the per-bar overhead of the PortfolioHandler event loop
+with queue.Queue against the deque fast path.
+
+The price handler, strategy, sizer and execution handler are
+no-op stand-ins, so the timings are the cost of the loop itself.
+
+    python -m benchmark.dispatch_benchmark [n_bars]
+"""
+import queue
+import sys
+import time
+from collections import deque
+
+from core.pool import FillEventPool, OrderEventPool, PriceEventPool, WeightEventPool
+from core.portfolio_handler import PortfolioHandler
+
+
+class _PriceHandler(object):
+    def __init__(self, n_bars):
+        self.timestamp  = range(n_bars)
+        self.curr_idx   = -1
+
+    def initialize(self, portfolio_handler):
+        pass
+
+    def istick(self):
+        return False
+
+    def continue_backtest(self):
+        return self.curr_idx < len(self.timestamp)
+
+    def stream_next(self):
+        self.curr_idx += 1
+        return PriceEventPool(self.curr_idx)
+
+
+class _Strategy(object):
+    def initialize(self, portfolio_handler):
+        pass
+
+    def calculate_signals(self, event):
+        return WeightEventPool(event.time)
+
+
+class _PositionSizer(object):
+    def initialize(self, portfolio_handler):
+        pass
+
+    def size_order(self, weight_events):
+        return OrderEventPool(weight_events.time)
+
+
+class _ExecutionHandler(object):
+    def initialize(self, portfolio_handler):
+        pass
+
+    def execute_order(self, order_events):
+        return FillEventPool(order_events.time)
+
+
+def time_session(events_queue, n_bars):
+    handler = PortfolioHandler(
+        [], 10000.0, events_queue,
+        _PriceHandler(n_bars), _PositionSizer(), None, _ExecutionHandler(),
+        _Strategy(), None, 0
+    )
+    handler.initialize_parameters()
+    start = time.time()
+    handler.run_session()
+    return time.time() - start
+
+
+def run(n_bars=100000):
+    results = {}
+    for name, events_queue in [('queue.Queue', queue.Queue()), ('deque', deque())]:
+        elapsed = time_session(events_queue, n_bars)
+        results[name] = elapsed
+        print("%-12s %8.3fs  %6.2f us/bar  %10.0f bars/sec" % (
+            name, elapsed, 1e6 * elapsed / n_bars, n_bars / elapsed))
+    print("speedup      %8.2fx" % (results['queue.Queue'] / results['deque']))
+    return results
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,118 @@
+"""
+Measures the time, memory and allocation count of streaming one
+bar of prices and of building one order pool, comparing the
+previous dict-backed events and pools with the slotted, view and
+array-backed ones in core.
+
+    python -m benchmark.event_benchmark [n_tickers] [n_bars]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.pool import OrderEventPool, PriceEventPool
+
+
+class _DictPriceEvent(object):
+    def __init__(self, ticker, price, adj_price):
+        self.ticker     = ticker
+        self.price      = price
+        self.adj_price  = adj_price
+
+
+class _DictOrderEvent(object):
+    def __init__(self, ticker, action, quantity):
+        self.ticker     = ticker
+        self.action     = action
+        self.quantity   = quantity
+
+
+class _DictEventPool(object):
+    def __init__(self, time):
+        self.pool   = {}
+        self.time   = time
+
+    def add(self, event):
+        self.pool[event.ticker] = event
+
+
+def before_price_bar(tickers, close, adj_close, idx):
+    row_close   = close[idx].tolist()
+    row_adj     = adj_close[idx].tolist()
+    pool        = _DictEventPool(idx)
+    for i, ticker in enumerate(tickers):
+        pool.add(_DictPriceEvent(ticker, row_close[i], row_adj[i]))
+    return pool
+
+
+def after_price_bar(tickers, ticker_idx, close, adj_close, idx):
+    return PriceEventPool(idx, tickers, ticker_idx, close[idx], adj_close[idx])
+
+
+def before_order_pool(tickers, idx):
+    pool = _DictEventPool(idx)
+    for ticker in tickers:
+        pool.add(_DictOrderEvent(ticker, "BOT", 100))
+    return pool
+
+
+def after_order_pool(tickers, idx):
+    pool = OrderEventPool(idx)
+    for ticker in tickers:
+        pool.add_order(ticker, "BOT", 100)
+    return pool
+
+
+def after_order_pool_bulk(tickers, idx):
+    pool = OrderEventPool(idx)
+    pool.add_orders(tickers, ["BOT"] * len(tickers), [100] * len(tickers))
+    return pool
+
+
+def measure(name, func, n_bars):
+    """
+    Runs func(idx) for n_bars bars, keeping every result alive as a
+    backtest keeping the previous bar would, and reports time per
+    bar, allocated blocks per bar and retained bytes per bar.
+    """
+    start = time.time()
+    for idx in range(n_bars):
+        func(idx)
+    elapsed = time.time() - start
+
+    tracemalloc.start()
+    before  = tracemalloc.take_snapshot()
+    keep    = [func(idx) for idx in range(n_bars)]
+    after   = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats   = after.compare_to(before, 'filename')
+    blocks  = sum(stat.count_diff for stat in stats)
+    size    = sum(stat.size_diff for stat in stats)
+    print("%-18s %8.2f us/bar  %8.1f allocs/bar  %10.0f bytes/bar" % (
+        name, 1e6 * elapsed / n_bars, float(blocks) / n_bars, float(size) / n_bars))
+    del keep
+    return {'us_per_bar': 1e6 * elapsed / n_bars, 'allocs_per_bar': float(blocks) / n_bars,
+            'bytes_per_bar': float(size) / n_bars}
+
+
+def run(n_tickers=500, n_bars=200):
+    tickers     = ['T%d' % i for i in range(n_tickers)]
+    ticker_idx  = {ticker: i for i, ticker in enumerate(tickers)}
+    close       = np.random.uniform(10, 100, (n_bars, n_tickers))
+    adj_close   = close * 0.98
+
+    print("%d tickers, %d bars" % (n_tickers, n_bars))
+    return {
+        'price_before': measure('price pool before', lambda idx: before_price_bar(tickers, close, adj_close, idx), n_bars),
+        'price_after': measure('price pool after', lambda idx: after_price_bar(tickers, ticker_idx, close, adj_close, idx), n_bars),
+        'order_before': measure('order pool before', lambda idx: before_order_pool(tickers, idx), n_bars),
+        'order_after': measure('order pool after', lambda idx: after_order_pool(tickers, idx), n_bars),
+        'order_after_bulk': measure('order pool bulk', lambda idx: after_order_pool_bulk(tickers, idx), n_bars),
+    }
+
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
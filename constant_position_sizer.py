@@ -1,6 +1,12 @@
+import logging
 from math import floor
+
+import numpy as np
+
 from core.event import EventType, OrderEvent
-from core.pool import OrderEventPool
+from core.pool import OrderEventPool, WeightEventPool
+
+logger = logging.getLogger(__name__)
 
 
 class ConstantPositionSizer(object):
@@ -8,40 +14,107 @@ class ConstantPositionSizer(object):
     Size the order to reflect the dollar-weighting of the
     current equity account size based on pre-specified
     ticker weights.
+
+    By default all the orders of a WeightEventPool are sized in one
+    vectorised step from the current quantities, the last closes
+    and the equity. Orders smaller than min_quantity shares or
+    min_notional in value are dropped, and an unchanged weight
+    never produces an order.
+
+    Parameters:
+    vectorized - False for the original order-by-order sizing,
+        which also emits zero-quantity orders.
+    min_quantity - The smallest order kept, in shares.
+    min_notional - The smallest order kept, in value.
+
+    Orders are logged at DEBUG level on the 'constant_position_sizer'
+    logger.
     """
+    def __init__(self, vectorized=True, min_quantity=1, min_notional=0.0):
+        self.vectorized     = vectorized
+        self.min_quantity   = max(min_quantity, 1)
+        self.min_notional   = min_notional
+
     def initialize(self, portfolio_handler):
         self.portfolio_handler = portfolio_handler
 
     def size_order(self, weight_events):
+        if weight_events.type != EventType.TARGETWEIGHT:
+            raise NotImplementedError("Unsupported event.type '%s' in size_order" % weight_events.type)
+        if self.vectorized:
+            order_events = self._size_orders_vectorized(weight_events)
+        else:
+            order_events = self._size_orders(weight_events)
+        if logger.isEnabledFor(logging.DEBUG):
+            self._log_orders(order_events)
+        return order_events
+
+    def size_orders(self, weight_events_list):
+        """
+        Nets the target weights of several WeightEventPools for the
+        same timestamp, e.g. from different strategies, by summing
+        them per ticker, and sizes a single order per ticker.
+        """
+        netted = {}
+        for weight_events in weight_events_list:
+            for ticker, weight in weight_events.get_weights().items():
+                netted[ticker] = netted.get(ticker, 0.0) + weight
+        combined = WeightEventPool(weight_events_list[0].time)
+        combined.add_weights(netted)
+        return self.size_order(combined)
+
+    def _size_orders_vectorized(self, weight_events):
+        order_events    = OrderEventPool(weight_events.time)
+        weights         = weight_events.get_weights()
+        if not weights:
+            return order_events
+
+        tickers         = list(weights)
+        targets         = np.fromiter(weights.values(), dtype=np.float64, count=len(tickers))
+        price_handler   = self.portfolio_handler.price_handler
+        portfolio       = self.portfolio_handler.portfolio
+        portfolio.update_portfolio()
+        equity          = portfolio.equity
+        prices          = price_handler.get_last_closes(price_handler.get_ticker_columns(tickers))
+        current         = portfolio.get_quantities(tickers) * prices / equity
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quantities  = np.floor((targets - current) * equity / prices)
+            size        = np.abs(quantities)
+            keep        = np.isfinite(quantities) & (size >= self.min_quantity) & (size * prices >= self.min_notional)
+        if keep.any():
+            kept = np.flatnonzero(keep)
+            order_events.add_orders(
+                [tickers[i] for i in kept],
+                np.where(quantities[kept] > 0, "BOT", "SLD").tolist(),
+                size[kept].astype(np.int64).tolist()
+            )
+        return order_events
+
+    def _size_orders(self, weight_events):
         initial_order_events = OrderEventPool(weight_events.time)
-        initial_order_events.type = EventType.ORDER
-        if weight_events.type == EventType.TARGETWEIGHT:
-            current_weights      = self.portfolio_handler.get_current_weights()
-            suggested_weights    = weight_events.get_weights()
-
-            for ticker in suggested_weights:
-                if ticker in current_weights:
-                    changed_weight = suggested_weights[ticker] - current_weights[ticker]
-                else:
-                    changed_weight = suggested_weights[ticker]
-
-                quantity = self._get_quantity_from_weight(ticker, changed_weight)
-                if quantity is not None:
-                    if quantity > 0:
-                        action = "BOT"
-                    else:
-                        action = "SLD"
-                        quantity = - quantity
-                else:
-                     action = None
+        current_weights      = self.portfolio_handler.get_current_weights()
+        suggested_weights    = weight_events.get_weights()
 
-                order = OrderEvent(ticker, action, quantity)
-                initial_order_events.add(order)
-            initial_order_events.print_orders()
-            return initial_order_events
-        else:
-            raise NotImplemented("Unsupported event.type '%s' in size_order" % weight_events.type)
+        for ticker in suggested_weights:
+            if ticker in current_weights:
+                changed_weight = suggested_weights[ticker] - current_weights[ticker]
+            else:
+                changed_weight = suggested_weights[ticker]
+
+            quantity = self._get_quantity_from_weight(ticker, changed_weight)
+            if quantity is not None:
+                if quantity > 0:
+                    action = "BOT"
+                else:
+                    action = "SLD"
+                    quantity = - quantity
+            else:
+                 action = None
 
+            order = OrderEvent(ticker, action, quantity)
+            initial_order_events.add(order)
+        return initial_order_events
 
     def _get_quantity_from_weight(self, ticker, weight):
         price = self.portfolio_handler.get_last_close(ticker)
@@ -53,3 +126,8 @@ class ConstantPositionSizer(object):
             weighted_quantity = None
         quantity = weighted_quantity
         return quantity
+
+    def _log_orders(self, order_events):
+        logger.debug("Time: %s", order_events.time)
+        for ticker, action, quantity in zip(order_events.tickers, order_events.actions, order_events.quantities):
+            logger.debug("Order: Ticker=%s, Action=%s, Quantity=%s", ticker, action, quantity)
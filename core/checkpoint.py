@@ -0,0 +1,63 @@
+import os
+import pickle
+
+
+VERSION = 1
+
+
+class Checkpoint(object):
+    """
+    Snapshots of a running session written to a binary file every
+    n bars and once more when the session ends, so that a long
+    backtest can be resumed after a failure, or extended with new
+    bars, without replaying its history.
+
+    A snapshot is taken between two bars, once every event of the
+    last bar has been handled. It holds the PortfolioHandler's
+    get_state(): the portfolio accounts, positions and history, the
+    timestamp of the last bar, the queued events and the state of
+    every component that has a get_state() (strategy, position
+    sizer, execution handler, risk manager and statistics). It is
+    pickled with the highest protocol and replaces the previous
+    file atomically.
+
+    The trade log is flushed with every snapshot and its extent is
+    saved with it. Resuming cuts the log back to that extent, so the
+    fills written after the last snapshot of a run that failed are
+    not logged twice.
+
+    Parameters:
+    path - The snapshot file.
+    every - The number of bars between snapshots, None for a single
+        snapshot at the end of the session.
+    """
+    def __init__(self, path, every=250):
+        self.path   = path
+        self.every  = every
+        self._bars  = 0
+
+    def on_bar(self, portfolio_handler):
+        """
+        Called before each new bar is streamed.
+        """
+        if self.every and self._bars and self._bars % self.every == 0:
+            self.save(portfolio_handler)
+        self._bars += 1
+
+    def save(self, portfolio_handler):
+        if portfolio_handler.trade_log is not None:
+            portfolio_handler.trade_log.flush()
+        state   = portfolio_handler.get_state()
+        state['version'] = VERSION
+        tmp     = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get('version') != VERSION:
+            raise ValueError("Unsupported checkpoint version %s in %s" % (state.get('version'), path))
+        return state
@@ -7,7 +7,12 @@ class Event(object):
     Event is base class providing an interface for all subsequent
     (inherited) events, that will trigger further events in the
     trading infrastructure.
+
+    Events are slotted: a backtest creates many of them per bar and
+    slots keep each one small and cheap to allocate.
     """
+    __slots__ = ()
+
     # @property
     # def ticker(self):
     #     return self.ticker
@@ -36,6 +41,8 @@ class Event(object):
 #         self.suggested_quantity = suggested_quantity
 
 class PriceEvent(Event):
+    __slots__ = ('ticker', 'price', 'adj_price')
+
     def __init__(self, ticker, price, adj_price):
         self.ticker      = ticker
         self.price       = price
@@ -46,6 +53,8 @@ class WeightEvent(Event):
     Handles the event of sending a Signal from a Strategy object.
     This is received by a Portfolio object and acted upon.
     """
+    __slots__ = ('ticker', 'weight')
+
     def __init__(self, ticker, weight=0):
         """
         Initialises the SignalEvent.
@@ -63,6 +72,7 @@ class WeightEvent(Event):
 
 
 class OrderEvent(Event):
+    __slots__ = ('ticker', 'action', 'quantity')
 
     def __init__(self, ticker, action, quantity):
         """
@@ -87,8 +97,9 @@ class OrderEvent(Event):
         )
 
 class FillEvent(Event):
+    __slots__ = ('ticker', 'action', 'quantity', 'price', 'commission')
 
-    def __init__(self, ticker, action, quantity, price):
+    def __init__(self, ticker, action, quantity, price, commission=0):
         """
         Initialises the FillEvent object.
         timestamp - The timestamp when the order was filled.
@@ -103,6 +114,7 @@ class FillEvent(Event):
         self.action   = action
         self.quantity = quantity
         self.price    = price
+        self.commission = commission
 
     def isvalid(self):
         flag = True
@@ -1,4 +1,6 @@
-from core.event import EventType, FillEvent
+import numpy as np
+
+from core.pool import FillEventPool, OrderEventPool
 
 
 class SimulationExecutionHandler(object):
@@ -11,6 +13,10 @@ class SimulationExecutionHandler(object):
     This allows a straightforward "first go" test of any strategy,
     before implementation with a more sophisticated execution
     handler.
+
+    A whole OrderEventPool is filled in one vectorised pass at the
+    adjusted closes of the current bar, with the Interactive
+    Brokers commission.
     """
 
     def initialize(self, portfolio_handler):
@@ -29,25 +35,158 @@ class SimulationExecutionHandler(object):
         )
         return commission
 
+    def calculate_commissions(self, quantities, fill_prices):
+        """
+        calculate_commission over arrays of quantities and prices.
+        """
+        return np.minimum(0.5 * fill_prices * quantities, np.maximum(1.0, 0.005 * quantities))
+
+    def get_pending_orders(self, time):
+        """
+        Orders carried over from earlier bars, to be executed at
+        time, as an OrderEventPool, or None. Orders are always
+        filled in full here.
+        """
+        return None
+
     def execute_order(self, order_events):
         """
         Converts OrderEvents into FillEvents "naively",
         i.e. without any latency, slippage or fill ratio problems.
 
         Parameters:
-        event - An Event object with order information.
+        order_events - An OrderEventPool of the orders of the bar.
         """
-        if order_events.type == EventType.ORDER:
-            order_events.type = EventType.FILL
+        fill_events = FillEventPool(order_events.time)
+        orders      = self._get_valid_orders(order_events)
+        if orders is None:
+            return fill_events
+
+        tickers, buy, quantities, columns = orders
+        prices = self.portfolio_handler.price_handler.get_last_closes(columns)
+        fill_events.add_fills(
+            tickers, np.where(buy, "BOT", "SLD").tolist(), _to_list(quantities),
+            prices.tolist(), self.calculate_commissions(quantities, prices).tolist()
+        )
+        return fill_events
+
+    def _get_valid_orders(self, order_events):
+        """
+        The orders with an action and a positive quantity, as the
+        list of their tickers and arrays of buy flags, quantities
+        and price matrix columns; None without any.
+        """
+        valid = [
+            i for i, (action, quantity) in enumerate(zip(order_events.actions, order_events.quantities))
+            if action is not None and quantity
+        ]
+        if not valid:
+            return None
+        tickers     = [order_events.tickers[i] for i in valid]
+        buy         = np.array([order_events.actions[i] == "BOT" for i in valid])
+        quantities  = np.array([order_events.quantities[i] for i in valid], dtype=np.float64)
+        columns     = self.portfolio_handler.price_handler.get_ticker_columns(tickers)
+        return tickers, buy, quantities, columns
+
+
+class SlippageExecutionHandler(SimulationExecutionHandler):
+    """
+    Simulated execution with a fixed slippage and a cap on the
+    share of each bar's volume an order may take.
 
-        for ticker in order_events.pool:
-            close_price = self.portfolio_handler.price_handler.tickers[ticker]['close']
-            order_events.pool[ticker] = self._convert_suggested_to_fill(order_events.pool[ticker], close_price)
+    Buys fill slippage_bps basis points above the adjusted close
+    and sells as far below it. At most participation times the
+    bar's volume of a ticker is filled per bar; the rest of the
+    order is carried over and executed on the next bars, ahead of
+    any new orders, until it is filled. A new order for a ticker
+    replaces what is left of its previous one, as the sizer computes
+    it from the positions actually held. Tickers without a known
+    volume are filled in full.
+
+    Parameters:
+    slippage_bps - The slippage in basis points of the price.
+    participation - The largest fraction of a bar's volume filled,
+        None for no cap.
+    carry_partial - False to cancel the unfilled part of orders
+        instead of carrying it over.
+    """
+    def __init__(self, slippage_bps=5.0, participation=0.1, carry_partial=True):
+        self.slippage_bps   = slippage_bps
+        self.participation  = participation
+        self.carry_partial  = carry_partial
+        self.pending        = {}        # ticker -> (action, quantity) left to fill
+        self._used          = {}        # ticker -> volume filled in the current bar
+        self._used_time     = None
+
+    def get_pending_orders(self, time):
+        if not self.pending:
+            return None
+        order_events = OrderEventPool(time)
+        tickers = list(self.pending)
+        order_events.add_orders(
+            tickers,
+            [self.pending[ticker][0] for ticker in tickers],
+            [self.pending[ticker][1] for ticker in tickers]
+        )
         return order_events
 
-    def _convert_suggested_to_fill(self, order_event, price):
-            ticker = order_event.ticker
-            action   = order_event.action
-            quantity = order_event.quantity
-            fill_event = FillEvent(ticker, action, quantity, price)
-            return fill_event
\ No newline at end of file
+    def get_state(self):
+        return {'pending': dict(self.pending), 'used': dict(self._used), 'used_time': self._used_time}
+
+    def set_state(self, state):
+        self.pending    = state['pending']
+        self._used      = state['used']
+        self._used_time = state['used_time']
+
+    def execute_order(self, order_events):
+        fill_events = FillEventPool(order_events.time)
+        orders      = self._get_valid_orders(order_events)
+        if orders is None:
+            return fill_events
+
+        tickers, buy, quantities, columns = orders
+        price_handler   = self.portfolio_handler.price_handler
+        prices          = price_handler.get_last_closes(columns)
+        filled          = quantities
+
+        if self.participation is not None:
+            if order_events.time != self._used_time:
+                self._used      = {}
+                self._used_time = order_events.time
+            used        = np.array([self._used.get(ticker, 0.0) for ticker in tickers])
+            volumes     = price_handler.get_last_volumes(columns)
+            capacity    = np.floor(self.participation * volumes) - used
+            capacity    = np.where(np.isnan(volumes), np.inf, np.maximum(capacity, 0.0))
+            filled      = np.minimum(quantities, capacity)
+            for ticker, quantity in zip(tickers, filled.tolist()):
+                self._used[ticker] = self._used.get(ticker, 0.0) + quantity
+
+        # each order executed replaces what was left of the previous one
+        remaining = (quantities - filled).tolist()
+        for ticker, action, quantity in zip(tickers, buy.tolist(), remaining):
+            if quantity > 0 and self.carry_partial:
+                self.pending[ticker] = ("BOT" if action else "SLD", quantity)
+            else:
+                self.pending.pop(ticker, None)
+
+        done = filled > 0
+        if not done.any():
+            return fill_events
+        buy, filled, prices = buy[done], filled[done], prices[done]
+        fill_prices = prices * (1.0 + np.where(buy, 1.0, -1.0) * self.slippage_bps / 10000.0)
+        fill_events.add_fills(
+            [ticker for ticker, kept in zip(tickers, done.tolist()) if kept],
+            np.where(buy, "BOT", "SLD").tolist(), _to_list(filled), fill_prices.tolist(),
+            self.calculate_commissions(filled, fill_prices).tolist()
+        )
+        return fill_events
+
+
+def _to_list(quantities):
+    """
+    Quantities as a list, of ints when they are whole numbers of
+    shares.
+    """
+    if (quantities == np.floor(quantities)).all():
+        return quantities.astype(np.int64).tolist()
+    return quantities.tolist()
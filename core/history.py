@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+
+class PortfolioHistory(object):
+    """
+    Records the per-timestamp statistics, quantities and weights
+    of a Portfolio into preallocated NumPy buffers.
+
+    Rows are written by integer position and the buffers double in
+    size when full, so a live session that outgrows the initial
+    capacity still appends in amortised constant time. Writing the
+    same timestamp twice overwrites its row instead of adding one.
+
+    The pandas DataFrames are only built when they are requested.
+    """
+    STATISTICS = ['equity', 'cash', 'realised_pnl', 'unrealised_pnl']
+
+    def __init__(self, tickers, capacity=None):
+        """
+        Parameters:
+        tickers - The ticker columns of the quantity and weight history.
+        capacity - The number of rows to preallocate, typically the
+            length of the PriceHandler timestamp index.
+        """
+        self.tickers        = list(tickers)
+        self.capacity       = max(capacity or 0, 1)
+        self.n              = 0
+
+        self._rows          = {}
+        self._times         = np.empty(self.capacity, dtype=object)
+        self._statistics    = np.zeros((self.capacity, len(self.STATISTICS)))
+        self._quantities    = np.zeros((self.capacity, len(self.tickers)))
+        self._weights       = np.zeros((self.capacity, len(self.tickers)))
+        self._frames        = {}
+
+    @property
+    def statistics(self):
+        return self._frame('statistics', self._statistics, self.STATISTICS)
+
+    @property
+    def quantities(self):
+        return self._frame('quantities', self._quantities, self.tickers)
+
+    @property
+    def weights(self):
+        return self._frame('weights', self._weights, self.tickers)
+
+    def add_ticker(self, ticker):
+        """
+        Appends a zero-filled column for a ticker that was not
+        part of the initial universe.
+        """
+        self.tickers.append(ticker)
+        column              = np.zeros((self.capacity, 1))
+        self._quantities    = np.hstack([self._quantities, column])
+        self._weights       = np.hstack([self._weights, column])
+        self._frames        = {}
+
+    def record(self, time, statistics, quantities, weights):
+        """
+        Writes one row of history for the given timestamp.
+
+        Parameters:
+        time - The timestamp of the row.
+        statistics - Values ordered as PortfolioHistory.STATISTICS.
+        quantities - Net quantities ordered as self.tickers.
+        weights - Portfolio weights ordered as self.tickers.
+        """
+        row = self._rows.get(time)
+        if row is None:
+            row = self.n
+            if row == self.capacity:
+                self._grow()
+            self._rows[time]    = row
+            self._times[row]    = time
+            self.n              += 1
+
+        self._statistics[row]   = statistics
+        self._quantities[row]   = quantities
+        self._weights[row]      = weights
+        self._frames            = {}
+
+    def _grow(self):
+        capacity            = 2 * self.capacity
+        self._times         = self._resize(self._times, capacity)
+        self._statistics    = self._resize(self._statistics, capacity)
+        self._quantities    = self._resize(self._quantities, capacity)
+        self._weights       = self._resize(self._weights, capacity)
+        self.capacity       = capacity
+
+    def _resize(self, buffer, capacity):
+        resized = np.zeros((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+        resized[:self.n] = buffer[:self.n]
+        return resized
+
+    def __getstate__(self):
+        # only the rows written so far, to keep snapshots compact
+        state = dict(self.__dict__)
+        for name in ('_times', '_statistics', '_quantities', '_weights'):
+            state[name] = state[name][:self.n].copy()
+        state['capacity']   = self.n
+        state['_frames']    = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.capacity == 0:
+            self.capacity = 1
+            for name in ('_times', '_statistics', '_quantities', '_weights'):
+                setattr(self, name, self._resize(getattr(self, name), 1))
+
+    def _frame(self, name, buffer, columns):
+        if name not in self._frames:
+            index = pd.Index(list(self._times[:self.n]))
+            self._frames[name] = pd.DataFrame(buffer[:self.n].copy(), index=index, columns=list(columns))
+        return self._frames[name]
@@ -0,0 +1,426 @@
+import numpy as np
+import pandas as pd
+
+
+class RingBuffer(object):
+    """
+    The last window rows of a stream of (tickers,) arrays, kept in
+    a preallocated (window x tickers) array that is overwritten in
+    place.
+    """
+    def __init__(self, window, n):
+        self.window = window
+        self.data   = np.zeros((window, n))
+        self.pos    = 0
+        self.count  = 0
+
+    @property
+    def full(self):
+        return self.count >= self.window
+
+    def push(self, row):
+        """
+        Writes row over the oldest one and returns the row it
+        replaced, zeros while the buffer is filling up.
+        """
+        old                 = self.data[self.pos].copy()
+        self.data[self.pos] = row
+        self.pos            = (self.pos + 1) % self.window
+        self.count          += 1
+        return old
+
+    def filled(self):
+        """
+        The rows written so far, in no particular order.
+        """
+        return self.data if self.full else self.data[:self.count]
+
+
+class Indicator(object):
+    """
+    An indicator of every ticker at once, updated with one
+    (tickers,) array per bar in O(1) and read from self.value,
+    which is NaN until the indicator has seen enough bars.
+
+    batch() computes the same indicator over a whole
+    (timestamps x tickers) matrix and warm_up() primes the running
+    state from the end of one.
+    """
+    def __init__(self, n):
+        self.n      = n
+        self.value  = np.full(n, np.nan)
+
+    def update(self, x):
+        raise NotImplementedError("Should implement update()")
+
+    def update_row(self, row):
+        """
+        Updates from a row of the prices of an IndicatorSet.
+        """
+        return self.update(row)
+
+    def batch(self, values):
+        raise NotImplementedError("Should implement batch()")
+
+    def warm_up(self, values):
+        for row in np.asarray(values, dtype=np.float64)[-self.window:]:
+            self.update_row(row)
+        return self.value
+
+
+class _Rolling(Indicator):
+    """
+    A window indicator over a RingBuffer whose running sums are
+    recomputed from the buffer once per window, and for any ticker
+    whose sums are not finite, so rounding errors cannot build up and
+    a NaN price stops counting once it has left the window.
+    """
+    def __init__(self, window, n):
+        Indicator.__init__(self, n)
+        self.window         = window
+        self.buffer         = RingBuffer(window, n)
+        self._since_sync    = 0
+
+    def update(self, x):
+        x       = np.asarray(x, dtype=np.float64)
+        full    = self.buffer.full
+        old     = self.buffer.push(x)
+        self._add(x, old, full)
+
+        self._since_sync += 1
+        if self._since_sync >= self.window:
+            self._sync(slice(None))
+            self._since_sync = 0
+        else:
+            stale = ~self._finite()
+            if stale.any():
+                self._sync(stale)
+
+        if self.buffer.full:
+            self.value = self._value(x)
+        return self.value
+
+    def _add(self, x, old, full):
+        raise NotImplementedError("Should implement _add()")
+
+    def _sync(self, columns):
+        raise NotImplementedError("Should implement _sync()")
+
+    def _finite(self):
+        raise NotImplementedError("Should implement _finite()")
+
+    def _value(self, x):
+        raise NotImplementedError("Should implement _value()")
+
+
+class SMA(_Rolling):
+    """
+    Simple moving average over window bars, from a running sum.
+    """
+    def __init__(self, window, n):
+        _Rolling.__init__(self, window, n)
+        self._sum = np.zeros(n)
+
+    def _add(self, x, old, full):
+        self._sum += x - old
+
+    def _sync(self, columns):
+        self._sum[columns] = self.buffer.filled()[:, columns].sum(axis=0)
+
+    def _finite(self):
+        return np.isfinite(self._sum)
+
+    def _value(self, x):
+        return self._sum / self.window
+
+    def batch(self, values):
+        return pd.DataFrame(values).rolling(self.window).mean().values
+
+
+class RollingStd(_Rolling):
+    """
+    Rolling standard deviation over window bars. The mean and the
+    sum of squared deviations are updated with Welford's method,
+    adding the new value and removing the one leaving the window,
+    which avoids the cancellation of a running sum of squares.
+    """
+    def __init__(self, window, n, ddof=1):
+        _Rolling.__init__(self, window, n)
+        self.ddof   = ddof
+        self.mean   = np.zeros(n)
+        self._m2    = np.zeros(n)
+
+    def _add(self, x, old, full):
+        if full:
+            delta       = x - old
+            mean        = self.mean + delta / self.window
+            self._m2    += delta * (x - mean + old - self.mean)
+        else:
+            delta       = x - self.mean
+            mean        = self.mean + delta / self.buffer.count
+            self._m2    += delta * (x - mean)
+        self.mean = mean
+
+    def _sync(self, columns):
+        filled              = self.buffer.filled()[:, columns]
+        mean                = filled.mean(axis=0)
+        self.mean[columns]  = mean
+        self._m2[columns]   = ((filled - mean) ** 2).sum(axis=0)
+
+    def _finite(self):
+        return np.isfinite(self._m2)
+
+    def _value(self, x):
+        return np.sqrt(np.maximum(self._m2, 0.0) / (self.window - self.ddof))
+
+    def batch(self, values):
+        return pd.DataFrame(values).rolling(self.window).std(ddof=self.ddof).values
+
+
+class ZScore(RollingStd):
+    """
+    The number of rolling standard deviations the latest value is
+    from the rolling mean, both over window bars.
+    """
+    def _value(self, x):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (x - self.mean) / RollingStd._value(self, x)
+
+    def batch(self, values):
+        rolling = pd.DataFrame(values).rolling(self.window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return ((values - rolling.mean().values) / rolling.std(ddof=self.ddof).values)
+
+
+class RollingMax(Indicator):
+    """
+    Rolling maximum over window bars, by the van Herk/Gil-Werman
+    method: the bars are cut into blocks of window bars and the
+    maximum of a window is that of the tail of the previous block,
+    from its suffix maxima computed once per block, and of the head
+    of the current block, from a running maximum. An update is O(1)
+    amortised on any series, falling ones included, and a NaN
+    counts until it has left the window.
+    """
+    SIGN = 1.0
+
+    def __init__(self, window, n):
+        Indicator.__init__(self, n)
+        self.window     = window
+        self.buffer     = RingBuffer(window, n)
+        # suffix maxima of the previous block, and -inf past its end
+        self._suffix    = np.full((window + 1, n), -np.inf)
+        self._prefix    = np.full(n, -np.inf)
+
+    def update(self, x):
+        x   = self.SIGN * np.asarray(x, dtype=np.float64)
+        j   = self.buffer.pos
+        self.buffer.push(x)
+        self._prefix = x if j == 0 else np.maximum(self._prefix, x)
+        if self.buffer.full:
+            self.value = self.SIGN * np.maximum(self._suffix[j + 1], self._prefix)
+        if j == self.window - 1:
+            # the block is complete, its suffix maxima serve the next one
+            self._suffix[:-1] = np.maximum.accumulate(self.buffer.data[::-1], axis=0)[::-1]
+        return self.value
+
+    def batch(self, values):
+        return pd.DataFrame(values).rolling(self.window).max().values
+
+
+class RollingMin(RollingMax):
+    """
+    Rolling minimum over window bars, as the negated maximum of the
+    negated values.
+    """
+    SIGN = -1.0
+
+    def batch(self, values):
+        return pd.DataFrame(values).rolling(self.window).min().values
+
+
+class RollingCorrelation(_Rolling):
+    """
+    Rolling correlation over window bars between every ticker and
+    a benchmark, from running sums of the values shifted by the
+    first values seen, which keeps the sums small.
+
+    Parameters:
+    window - The number of bars.
+    n - The number of tickers.
+    benchmark - The column of the benchmark in the rows given to
+        update_row(), e.g. by an IndicatorSet.
+    """
+    def __init__(self, window, n, benchmark=None):
+        _Rolling.__init__(self, window, n)
+        self.benchmark  = benchmark
+        self._other     = RingBuffer(window, n)
+        self._shift     = None
+        self._sums      = np.zeros((5, n))     # x, y, xx, yy, xy
+
+    def update_row(self, row):
+        return self.update(row, row[self.benchmark])
+
+    def update(self, x, y):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.broadcast_to(np.asarray(y, dtype=np.float64), x.shape)
+        if self._shift is None:
+            self._shift = (np.nan_to_num(x), np.nan_to_num(y))
+        self._y = y - self._shift[1]
+        return _Rolling.update(self, x - self._shift[0])
+
+    def _add(self, x, old, full):
+        y           = self._y
+        old_y       = self._other.push(y)
+        self._sums  += _moments(x, y) - _moments(old, old_y)
+
+    def _sync(self, columns):
+        x = self.buffer.filled()[:, columns]
+        y = self._other.filled()[:, columns]
+        self._sums[:, columns] = _moments(x, y).sum(axis=1)
+
+    def _finite(self):
+        return np.isfinite(self._sums).all(axis=0)
+
+    def _value(self, x):
+        sx, sy, sxx, syy, sxy = self._sums
+        w       = self.window
+        cov     = w * sxy - sx * sy
+        var     = np.maximum(w * sxx - sx * sx, 0.0) * np.maximum(w * syy - sy * sy, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return cov / np.sqrt(var)
+
+    def batch(self, values, other=None):
+        values  = pd.DataFrame(values)
+        other   = values[self.benchmark] if other is None else pd.Series(np.asarray(other, dtype=np.float64))
+        return values.rolling(self.window).corr(other).values
+
+
+def _moments(x, y):
+    return np.array([x, y, x * x, y * y, x * y])
+
+
+class EMA(Indicator):
+    """
+    Exponential moving average with smoothing alpha, or
+    2 / (span + 1) given a span, started at the first value and
+    holding its value over NaN prices.
+    """
+    def __init__(self, n, span=None, alpha=None):
+        Indicator.__init__(self, n)
+        if alpha is None:
+            alpha = 2.0 / (span + 1.0)
+        self.alpha  = alpha
+        self.window = span
+
+    def update(self, x):
+        x       = np.asarray(x, dtype=np.float64)
+        value   = np.where(np.isnan(self.value), x, self.alpha * x + (1 - self.alpha) * self.value)
+        self.value = np.where(np.isnan(x), self.value, value)
+        return self.value
+
+    def batch(self, values):
+        return pd.DataFrame(values).ewm(alpha=self.alpha, adjust=False, ignore_na=True).mean().values
+
+    def warm_up(self, values):
+        # an EMA depends on the whole history, not on a window
+        if len(values):
+            self.value = self.batch(np.asarray(values, dtype=np.float64))[-1]
+        return self.value
+
+
+class IndicatorSet(object):
+    """
+    Named indicators over the same tickers, fed once per bar with
+    the PriceEventPool from PriceHandler.stream_next.
+
+    When the pool is a view over the price matrices the row of
+    prices is read straight from it, so an update costs a single
+    fancy index plus the O(1) updates of the indicators.
+
+    Parameters:
+    tickers - The tickers, in the column order of the indicators.
+    field - 'adj_prices' for adjusted closes, 'prices' for closes.
+    """
+    MATRICES = {'adj_prices': 'adj_close', 'prices': 'close'}
+
+    def __init__(self, tickers, field='adj_prices'):
+        self.tickers        = list(tickers)
+        self.field          = field
+        self.indicators     = {}
+        self._columns       = None
+        self._ticker_idx    = None
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __getitem__(self, name):
+        return self.indicators[name].value
+
+    def add(self, name, indicator):
+        self.indicators[name] = indicator
+        return indicator
+
+    def get(self, name, ticker):
+        return self.indicators[name].value[self.tickers.index(ticker)]
+
+    def update(self, price_events):
+        row = self._row(price_events)
+        for indicator in self.indicators.values():
+            indicator.update_row(row)
+
+    def _row(self, price_events):
+        if price_events.ticker_idx is not None:
+            if price_events.ticker_idx is not self._ticker_idx:
+                self._ticker_idx    = price_events.ticker_idx
+                self._columns       = np.array([self._ticker_idx[ticker] for ticker in self.tickers], dtype=np.intp)
+            return getattr(price_events, self.field)[self._columns]
+        if self.field == 'prices':
+            return np.array([price_events.get_price(ticker) for ticker in self.tickers])
+        return np.array([price_events.get_adj_price(ticker) for ticker in self.tickers])
+
+    def _values(self, price_handler, idx):
+        matrix = getattr(price_handler, self.MATRICES[self.field])
+        return np.asarray(matrix[:idx + 1, price_handler.get_ticker_columns(self.tickers)], dtype=np.float64)
+
+    def warm_up(self, price_handler, idx=None):
+        """
+        Primes every indicator with the bars of a PriceHandler up to
+        and including idx, its current bar by default, e.g. from a
+        strategy's initialize().
+        """
+        idx     = price_handler.curr_idx if idx is None else idx
+        values  = self._values(price_handler, idx)
+        for indicator in self.indicators.values():
+            indicator.warm_up(values)
+
+    def batch(self, price_handler):
+        """
+        Every indicator over all the bars of a PriceHandler, as
+        (timestamps x tickers) DataFrames.
+        """
+        values = self._values(price_handler, len(price_handler.timestamp) - 1)
+        return {
+            name: pd.DataFrame(indicator.batch(values), price_handler.timestamp, self.tickers)
+            for name, indicator in self.indicators.items()
+        }
+
+
+if __name__ == "__main__":
+    import time
+
+    n_bars, n_tickers   = 2000, 500
+    prices              = 100 * np.cumprod(1 + np.random.normal(0, 0.01, (n_bars, n_tickers)), axis=0)
+    prices[:50, :10]    = np.nan
+
+    for indicator in [SMA(300, n_tickers), EMA(n_tickers, span=50), RollingStd(60, n_tickers),
+                      ZScore(60, n_tickers), RollingMax(100, n_tickers), RollingMin(100, n_tickers),
+                      RollingCorrelation(60, n_tickers, benchmark=0)]:
+        start   = time.time()
+        stream  = np.array([indicator.update_row(row).copy() for row in prices])
+        elapsed = time.time() - start
+        batch   = indicator.batch(prices)
+        error   = np.nanmax(np.abs(stream - batch))
+        print("%-18s %6.1f us/bar  max difference to batch %0.2e  NaN agree %s" % (
+            type(indicator).__name__, 1e6 * elapsed / n_bars, error,
+            (np.isnan(stream) == np.isnan(batch)).all()))
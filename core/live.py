@@ -0,0 +1,325 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from core.event import EventType
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFeed(object):
+    """
+    An asynchronous price feed fed by put() calls, standing in for
+    a socket or a vendor API. Ticks are (time, ticker, price, volume,
+    received) tuples; received is the perf_counter time the tick
+    arrived, the start of its latency.
+
+    Iterating the feed yields lists of ticks: every tick queued
+    while the previous list was being handled comes at once.
+    """
+    def __init__(self):
+        self._queue     = asyncio.Queue()
+        self._closed    = False
+
+    def put(self, time, ticker, price, volume=np.nan):
+        self._queue.put_nowait((time, ticker, price, volume, _clock()))
+
+    def close(self):
+        self._queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        ticks = [await self._queue.get()]
+        while not self._queue.empty():
+            ticks.append(self._queue.get_nowait())
+        if None in ticks:
+            self._closed = True
+            ticks = [tick for tick in ticks if tick is not None]
+            if not ticks:
+                raise StopAsyncIteration
+        return ticks
+
+
+class FileTailFeed(object):
+    """
+    An asynchronous price feed tailing a text file that another
+    process appends 'time,ticker,price[,volume]' lines to. Between
+    reads that find nothing new it sleeps for poll_interval seconds.
+    Malformed lines are logged and skipped.
+
+    Parameters:
+    path - The file to follow.
+    poll_interval - The seconds slept when there is no new line.
+    from_start - True to also read the lines already in the file.
+    idle_timeout - The seconds without a new line after which the
+        feed ends, None to follow the file forever.
+    """
+    def __init__(self, path, poll_interval=0.01, from_start=False, idle_timeout=None):
+        self.path           = path
+        self.poll_interval  = poll_interval
+        self.from_start     = from_start
+        self.idle_timeout   = idle_timeout
+        self._file          = None
+        self._partial       = ''
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._file is None:
+            self._file = open(self.path)
+            if not self.from_start:
+                self._file.seek(0, 2)
+        idle = 0.0
+        while True:
+            ticks = self._read_lines()
+            if ticks:
+                return ticks
+            if self.idle_timeout is not None and idle >= self.idle_timeout:
+                self._file.close()
+                raise StopAsyncIteration
+            await asyncio.sleep(self.poll_interval)
+            idle += self.poll_interval
+
+    def _read_lines(self):
+        data = self._partial + self._file.read()
+        lines = data.split('\n')
+        # a line without its newline yet is kept for the next read
+        self._partial = lines.pop()
+        received = _clock()
+        ticks = []
+        for line in lines:
+            if not line.strip():
+                continue
+            fields = line.strip().split(',')
+            try:
+                if len(fields) < 3:
+                    raise ValueError("expected time,ticker,price[,volume]")
+                volume = float(fields[3]) if len(fields) > 3 and fields[3] else np.nan
+                ticks.append((pd.Timestamp(fields[0]), fields[1], float(fields[2]), volume, received))
+            except ValueError as e:
+                logger.warning("Skipping malformed line %r of %s: %s", line, self.path, e)
+        return ticks
+
+
+class AsyncLiveSession(object):
+    """
+    A live session of a PortfolioHandler driven by an asynchronous
+    price feed, such as QueueFeed or FileTailFeed.
+
+    Each list of ticks from the feed updates the last prices of
+    their tickers and becomes one new bar; ticks for tickers outside
+    the price handler's universe or without a valid time and price
+    are logged and skipped. Each bar is appended to the price
+    handler and streamed through the usual stages: strategy, sizing,
+    execution and portfolio update. The session coroutine yields to
+    the event loop between stages and awaits the feed between bars,
+    so it sleeps instead of polling while no price arrives.
+
+    The latency from the arrival of a tick to the orders it leads to,
+    and to the end of the handling of its bar, is recorded for every
+    bar and summarised as percentiles by get_latency_stats().
+
+    Parameters:
+    portfolio_handler - An initialised PortfolioHandler whose price
+        handler holds at least the bar of its start time.
+    feed - An asynchronous iterator of lists of ticks.
+    end_session_time - The datetime the session ends at, None to run
+        until the feed ends.
+    """
+    def __init__(self, portfolio_handler, feed, end_session_time=None):
+        self.portfolio_handler  = portfolio_handler
+        self.feed               = feed
+        self.end_session_time   = end_session_time
+        self.order_latency      = []
+        self.bar_latency        = []
+
+        portfolio_handler.session_type      = "live"
+        portfolio_handler.end_session_time  = end_session_time
+        if not isinstance(portfolio_handler.events_queue, deque):
+            raise ValueError("AsyncLiveSession needs a PortfolioHandler with a deque events queue")
+
+        price_handler   = portfolio_handler.price_handler
+        self._last      = {
+            'close': np.array(price_handler.close[-1], dtype=np.float64),
+            'adj_close': np.array(price_handler.adj_close[-1], dtype=np.float64)
+        }
+
+    def run_session(self):
+        asyncio.run(self.run_session_async())
+
+    async def run_session_async(self):
+        handler = self.portfolio_handler
+        print("Running Realtime Session until %s" % (self.end_session_time or "the feed ends"))
+        feed = self.feed.__aiter__()
+        while True:
+            timeout = None
+            if self.end_session_time is not None:
+                timeout = (self.end_session_time - datetime.now()).total_seconds()
+                if timeout <= 0:
+                    break
+            try:
+                ticks = await asyncio.wait_for(feed.__anext__(), timeout)
+            except (StopAsyncIteration, asyncio.TimeoutError):
+                break
+            ticks = self._valid_ticks(ticks)
+            if ticks:
+                self._append_bar(ticks)
+                await self._handle_bar(min(tick[4] for tick in ticks))
+
+        if handler.trade_log is not None:
+            handler.trade_log.flush()
+        self.print_latency_stats()
+
+    def _valid_ticks(self, ticks):
+        ticker_idx  = self.portfolio_handler.price_handler.ticker_idx
+        valid       = []
+        for tick in ticks:
+            try:
+                time, ticker, price, volume, received = tick
+                if ticker not in ticker_idx:
+                    raise ValueError("unknown ticker")
+                tick = (pd.Timestamp(time), ticker, float(price), float(volume), received)
+                if tick[0] is pd.NaT or not np.isfinite(tick[2]):
+                    raise ValueError("invalid time or price")
+            except (TypeError, ValueError) as e:
+                logger.warning("Skipping tick %r: %s", tick, e)
+                continue
+            valid.append(tick)
+        return valid
+
+    def _append_bar(self, ticks):
+        price_handler   = self.portfolio_handler.price_handler
+        last            = self._last
+        volume          = np.full(len(last['close']), np.nan)
+        columns         = price_handler.get_ticker_columns([tick[1] for tick in ticks])
+        for column, (_, _, price, tick_volume, _) in zip(columns.tolist(), ticks):
+            last['close'][column]       = price
+            last['adj_close'][column]   = price
+            volume[column]              = tick_volume if np.isnan(volume[column]) else volume[column] + tick_volume
+
+        # ticks stamped at or before the last bar, e.g. within the same
+        # clock tick, still make a new bar, one time unit later
+        stamp = max(tick[0] for tick in ticks)
+        if stamp <= price_handler.timestamp[-1]:
+            unit  = np.datetime_data(price_handler.timestamp.dtype)[0]
+            stamp = price_handler.timestamp[-1] + pd.Timedelta(1, unit)
+        price_handler.append([stamp], last['close'][None], last['adj_close'][None], volume[None])
+
+    async def _handle_bar(self, received):
+        handler = self.portfolio_handler
+        events  = handler.events_queue
+        handler._stream_next()
+        ordered = False
+        while events:
+            event_pool = events.popleft()
+            if event_pool is None:
+                continue
+            if event_pool.type == EventType.ORDER and len(event_pool) and not ordered:
+                self.order_latency.append(_clock() - received)
+                ordered = True
+            handler._dispatch_event(event_pool)
+            handler.update_portfolio_value()
+            await asyncio.sleep(0)
+        self.bar_latency.append(_clock() - received)
+
+    def get_latency_stats(self):
+        """
+        Percentiles, in seconds, of the latency from a tick to the
+        first order of its bar and to the end of its bar.
+        """
+        return {
+            'tick_to_order': _percentiles(self.order_latency),
+            'tick_to_bar_end': _percentiles(self.bar_latency)
+        }
+
+    def print_latency_stats(self):
+        print("%-16s %8s %10s %10s %10s %10s" % ('latency (ms)', 'count', 'p50', 'p90', 'p99', 'max'))
+        for name, stats in self.get_latency_stats().items():
+            print("%-16s %8d %10.3f %10.3f %10.3f %10.3f" % (
+                name, stats['count'], 1e3 * stats['p50'], 1e3 * stats['p90'],
+                1e3 * stats['p99'], 1e3 * stats['max']))
+
+
+def _percentiles(values):
+    if not values:
+        return {'count': 0, 'p50': np.nan, 'p90': np.nan, 'p99': np.nan, 'max': np.nan}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'count': len(values), 'p50': p50, 'p90': p90, 'p99': p99, 'max': max(values)}
+
+
+def _clock():
+    return time.perf_counter()
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    from constant_position_sizer import ConstantPositionSizer
+    from core.excution_handler import SimulationExecutionHandler
+    from core.portfolio_handler import PortfolioHandler
+    from core.price_handler import ArrayPriceHandler
+    from strategy.constant_mix_strategy import ConstantMixStrategy
+
+    tickers = ['AAPL', 'SPY', 'AGG']
+    weights = {'AAPL': 0.3, 'SPY': 0.3, 'AGG': 0.4}
+
+    # the ticks are stamped on a simulated clock running from the
+    # open of the last business day, so the demo trades any day
+    open_time = pd.offsets.BDay().rollback(pd.Timestamp.now().normalize()) + pd.Timedelta(hours=9, minutes=30)
+
+    def make_handler():
+        start   = open_time - pd.Timedelta(minutes=1)
+        prices  = np.array([[100.0, 200.0, 100.0]])
+        handler = PortfolioHandler(
+            tickers, 1e6, None, ArrayPriceHandler(pd.DatetimeIndex([start]), tickers, prices, prices.copy()),
+            ConstantPositionSizer(), None, SimulationExecutionHandler(),
+            ConstantMixStrategy(weights, schedule=1), None, start
+        )
+        handler.initialize_parameters()
+        return handler
+
+    async def produce(put, n=500):
+        rng     = np.random.RandomState(0)
+        prices  = np.array([100.0, 200.0, 100.0])
+        started = _clock()
+        for _ in range(n):
+            i           = rng.randint(len(tickers))
+            prices[i]   *= np.exp(rng.normal(0, 0.001))
+            put(open_time + pd.Timedelta(seconds=_clock() - started), tickers[i], prices[i])
+            await asyncio.sleep(0.001)
+
+    async def queue_demo():
+        feed    = QueueFeed()
+        session = AsyncLiveSession(make_handler(), feed)
+
+        async def producer():
+            await produce(feed.put)
+            feed.close()
+        await asyncio.gather(producer(), session.run_session_async())
+        print("equity %0.2f\n" % session.portfolio_handler.portfolio.equity)
+
+    async def file_demo():
+        path    = os.path.join(tempfile.mkdtemp(), 'ticks.csv')
+        open(path, 'w').close()
+        session = AsyncLiveSession(make_handler(), FileTailFeed(path, poll_interval=0.001, idle_timeout=0.5))
+
+        with open(path, 'a') as f:
+            def write(time, ticker, price):
+                f.write('%s,%s,%0.4f\n' % (time, ticker, price))
+                f.flush()
+            await asyncio.gather(produce(write), session.run_session_async())
+        print("equity %0.2f" % session.portfolio_handler.portfolio.equity)
+
+    asyncio.run(queue_demo())
+    asyncio.run(file_demo())
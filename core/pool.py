@@ -1,16 +1,25 @@
-from core.event import EventType, WeightEvent
+from core.event import EventType, FillEvent, OrderEvent, PriceEvent, WeightEvent
 
 
 class EventPool(object):
+    __slots__ = ('type', 'time', '_pool')
+
     @property
     def typename(self):
         return self.type.name
 
+    @property
+    def pool(self):
+        return self._pool
+
     def __init__(self, time):
-        self.pool = {}
+        self._pool = {}
         self.type = EventType.TIME
         self.time = time
 
+    def __len__(self):
+        return len(self.pool)
+
     def get(self, ticker):
         event = self.pool[ticker]
         return event
@@ -19,12 +28,61 @@ class EventPool(object):
         self.pool[event.ticker] = event
 
 class PriceEventPool(EventPool):
-    def __init__(self, time):
+    """
+    The prices of one bar for all tickers.
+
+    When built by the PriceHandler the pool is a view over one row
+    of its price matrices: no PriceEvent exists until one is asked
+    for through get() or pool, so streaming a bar of thousands of
+    tickers allocates only this object.
+    """
+    __slots__ = ('tickers', 'ticker_idx', 'prices', 'adj_prices')
+
+    def __init__(self, time, tickers=None, ticker_idx=None, prices=None, adj_prices=None):
         EventPool.__init__(self,time)
-        self.type = EventType.PRICE
+        self.type       = EventType.PRICE
+        self.tickers    = tickers if tickers is not None else []
+        self.ticker_idx = ticker_idx
+        self.prices     = prices
+        self.adj_prices = adj_prices
+        if ticker_idx is not None:
+            self._pool  = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = {ticker: self._create_event(ticker) for ticker in self.tickers}
+        return self._pool
+
+    def __len__(self):
+        return len(self.tickers) if self._pool is None else len(self._pool)
+
+    def get(self, ticker):
+        if self._pool is None:
+            return self._create_event(ticker)
+        return self._pool[ticker]
+
+    def add(self, event):
+        self.pool[event.ticker] = event
+
+    def get_price(self, ticker):
+        if self._pool is None:
+            return float(self.prices[self.ticker_idx[ticker]])
+        return self._pool[ticker].price
+
+    def get_adj_price(self, ticker):
+        if self._pool is None:
+            return float(self.adj_prices[self.ticker_idx[ticker]])
+        return self._pool[ticker].adj_price
+
+    def _create_event(self, ticker):
+        i = self.ticker_idx[ticker]
+        return PriceEvent(ticker, float(self.prices[i]), float(self.adj_prices[i]))
 
 
 class WeightEventPool(EventPool):
+    __slots__ = ()
+
     def __init__(self, time):
         EventPool.__init__(self,time)
         self.type = EventType.TARGETWEIGHT
@@ -39,13 +97,143 @@ class WeightEventPool(EventPool):
             self.pool[ticker] = weight_event
 
 
-class OrderEventPool(EventPool):
+class ArrayEventPool(EventPool):
+    """
+    An event pool stored as parallel lists, one per event field
+    and one entry per ticker, so that a whole pool can be processed
+    with array operations. The dictionary of events in pool is only
+    built when it is asked for and is a snapshot: changes go through
+    add() or add_event().
+
+    Adding an event for a ticker that is already in the pool
+    replaces it, as in the dictionary-backed pools.
+    """
+    __slots__ = ('tickers', '_index')
+    FIELDS = ()         # the parallel lists
+    ATTRIBUTES = ()     # the matching event attributes
+    EVENT = None
+
     def __init__(self, time):
         EventPool.__init__(self, time)
+        self._pool      = None
+        self._index     = {}
+        self.tickers    = []
+        for field in self.FIELDS:
+            setattr(self, field, [])
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            columns = [getattr(self, field) for field in self.FIELDS]
+            self._pool = {
+                ticker: self.EVENT(ticker, *values)
+                for ticker, values in zip(self.tickers, zip(*columns))
+            }
+        return self._pool
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def get(self, ticker):
+        i = self._index[ticker]
+        return self.EVENT(ticker, *[getattr(self, field)[i] for field in self.FIELDS])
+
+    def add(self, event):
+        self.add_event(event.ticker, *[getattr(event, attribute) for attribute in self.ATTRIBUTES])
+
+    def add_event(self, ticker, *values):
+        self._pool = None
+        i = self._index.get(ticker)
+        if i is None:
+            self._index[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+            for field, value in zip(self.FIELDS, values):
+                getattr(self, field).append(value)
+        else:
+            for field, value in zip(self.FIELDS, values):
+                getattr(self, field)[i] = value
+
+
+class OrderEventPool(ArrayEventPool):
+    __slots__ = ('actions', 'quantities')
+    FIELDS = ('actions', 'quantities')
+    ATTRIBUTES = ('action', 'quantity')
+    EVENT = OrderEvent
+
+    def __init__(self, time):
+        ArrayEventPool.__init__(self, time)
         self.type = EventType.ORDER
 
+    def add_order(self, ticker, action, quantity):
+        self._pool = None
+        i = self._index.get(ticker)
+        if i is None:
+            self._index[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+            self.actions.append(action)
+            self.quantities.append(quantity)
+        else:
+            self.actions[i]     = action
+            self.quantities[i]  = quantity
+
+    def add_orders(self, tickers, actions, quantities):
+        """
+        Adds the orders given as parallel sequences.
+        """
+        if self.tickers:
+            for order in zip(tickers, actions, quantities):
+                self.add_order(*order)
+            return
+        self._pool      = None
+        self.tickers    = list(tickers)
+        self.actions    = list(actions)
+        self.quantities = list(quantities)
+        self._index     = {ticker: i for i, ticker in enumerate(self.tickers)}
 
     def print_orders(self):
         print("Time: %s " % self.time)
         for ticker in self.pool:
             self.pool[ticker].print_order()
+
+
+class FillEventPool(ArrayEventPool):
+    __slots__ = ('actions', 'quantities', 'prices', 'commissions')
+    FIELDS = ('actions', 'quantities', 'prices', 'commissions')
+    ATTRIBUTES = ('action', 'quantity', 'price', 'commission')
+    EVENT = FillEvent
+
+    def __init__(self, time):
+        ArrayEventPool.__init__(self, time)
+        self.type = EventType.FILL
+
+    def add_fill(self, ticker, action, quantity, price, commission=0):
+        self._pool = None
+        i = self._index.get(ticker)
+        if i is None:
+            self._index[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+            self.actions.append(action)
+            self.quantities.append(quantity)
+            self.prices.append(price)
+            self.commissions.append(commission)
+        else:
+            self.actions[i]     = action
+            self.quantities[i]  = quantity
+            self.prices[i]      = price
+            self.commissions[i] = commission
+
+    def add_fills(self, tickers, actions, quantities, prices, commissions):
+        """
+        Adds the fills given as parallel sequences.
+        """
+        if self.tickers:
+            for fill in zip(tickers, actions, quantities, prices, commissions):
+                self.add_fill(*fill)
+            return
+        self._pool          = None
+        self.tickers        = list(tickers)
+        self.actions        = list(actions)
+        self.quantities     = list(quantities)
+        self.prices         = list(prices)
+        self.commissions    = list(commissions)
+        self._index         = {ticker: i for i, ticker in enumerate(self.tickers)}
@@ -1,9 +1,12 @@
 
+import numpy as np
+
+from core.history import PortfolioHistory
 from core.position import Position
-import pandas as pd
+from core.position_book import PositionBook
 
 class Portfolio(object):
-    def __init__(self, price_handler, cash, tickers):
+    def __init__(self, price_handler, cash, tickers, position_book=False):
         """
         On creation, the Portfolio object contains no
         positions and all values are "reset" to the initial
@@ -12,6 +15,11 @@ class Portfolio(object):
         Note that realised_pnl is the running tally pnl from closed
         positions (closed_pnl), as well as realised_pnl
         from currently open positions.
+
+        With position_book=True the positions are kept in a single
+        vectorised PositionBook instead of one Position per ticker,
+        which is much faster for large universes. self.positions is
+        then left empty and self.book holds the accounts.
         """
 
         self.price_handler          = price_handler
@@ -23,21 +31,70 @@ class Portfolio(object):
         self.unrealised_pnl         = 0
 
         self.portfolio_handler      = None
-        self.statistics             = pd.DataFrame(columns=['equity', 'cash', 'realised_pnl', 'unrealised_pnl'])
-        self.quantities             = pd.DataFrame(columns=tickers)
-        self.weights                = pd.DataFrame(columns=tickers)
+        self.history                = PortfolioHistory(tickers, self._history_capacity())
         self.positions              = {}
-        self._init_positions(tickers)
+        self.book                   = PositionBook(tickers) if position_book else None
+        self.current_weights        = {}
+        self._book_columns          = None
+        if self.book is None:
+            self._init_positions(tickers)
+
+        # valuation cache, see update_portfolio
+        self._dirty                 = True
+        self._valued_time           = None
+
+    @property
+    def statistics(self):
+        return self.history.statistics
+
+    @property
+    def quantities(self):
+        return self.history.quantities
+
+    @property
+    def weights(self):
+        return self.history.weights
 
     def initialize(self, portfolio_handler):
         self.portfolio_handler = portfolio_handler
 
+    def _history_capacity(self):
+        timestamp = getattr(self.price_handler, 'timestamp', None)
+        if timestamp is None:
+            return None
+        return len(timestamp)
+
     def update_portfolio(self):
         """
         Updates the value of all positions that are currently open.
         Value of closed positions is tallied as self.realised_pnl.
+
+        The valuation is cached per timestamp: the positions are only
+        marked-to-market again once the bar has moved on or a fill has
+        marked the portfolio dirty, so repeated calls within a bar
+        are free.
         """
+        cur_time = self.portfolio_handler.cur_time
+        if not self._dirty and cur_time == self._valued_time:
+            return
 
+        if self.book is None:
+            quantities, weights = self._mark_positions()
+        else:
+            quantities, weights = self._mark_book()
+
+        self.history.record(
+            cur_time,
+            [self.equity, self.cur_cash, self.realised_pnl, self.unrealised_pnl],
+            quantities, weights
+        )
+        statistics = self.portfolio_handler.statistics
+        if statistics is not None:
+            statistics.update(cur_time, self.equity, self.cur_cash, weights)
+        self._dirty         = False
+        self._valued_time   = cur_time
+
+    def _mark_positions(self):
         # self.equity = self.realised_pnl
         self.equity         = self.init_cash
         self.realised_pnl   = 0
@@ -57,10 +114,33 @@ class Portfolio(object):
             self.realised_pnl   += pt.realised_pnl
             self.equity         += pt.total_pnl
 
-        self.statistics.loc[self.portfolio_handler.cur_time] =\
-            [self.equity, self.cur_cash, self.realised_pnl, self.unrealised_pnl]
-        self.quantities.loc[self.portfolio_handler.cur_time] = [self.positions[ticker].net for ticker in self.positions]
-        self.weights.loc[self.portfolio_handler.cur_time] = [self.get_current_weights(ticker) for ticker in self.positions]
+        self.current_weights = {
+            ticker: self.positions[ticker].market_value / self.equity
+            for ticker in self.positions
+        }
+        quantities  = [self.positions[ticker].net for ticker in self.positions]
+        weights     = [self.current_weights[ticker] for ticker in self.positions]
+        return quantities, weights
+
+    def _mark_book(self):
+        book = self.book
+        if self.price_handler.istick():
+            quotes  = [self.price_handler.get_best_bid_ask(ticker) for ticker in book.tickers]
+            bid     = np.array([quote[0] for quote in quotes])
+            ask     = np.array([quote[1] for quote in quotes])
+            book.mark_to_market(bid, ask)
+        else:
+            if self._book_columns is None or len(self._book_columns) != len(book):
+                self._book_columns = self.price_handler.get_ticker_columns(book.tickers)
+            book.mark_to_market(self.price_handler.get_last_closes(self._book_columns))
+
+        self.unrealised_pnl = book.unrealised_pnl.sum()
+        self.realised_pnl   = book.realised_pnl.sum()
+        self.equity         = self.init_cash + book.total_pnl.sum()
+
+        weights = book.market_value / self.equity
+        self.current_weights = dict(zip(book.tickers, weights.tolist()))
+        return book.net, weights
 
     def _init_positions(self, tickers):
         for ticker in tickers:
@@ -150,6 +230,9 @@ class Portfolio(object):
 
         Hence, this single method will be called by the
         PortfolioHandler to update the Portfolio itself.
+
+        The portfolio is only marked dirty here; the caller revalues
+        it once via update_portfolio after a whole batch of fills.
         """
 
         if action == "BOT":
@@ -157,7 +240,9 @@ class Portfolio(object):
         elif action == "SLD":
             self.cur_cash += ((quantity * price) - commission)
 
-        if ticker not in self.positions:
+        if self.book is not None:
+            self._transact_book([action], [ticker], [quantity], [price], [commission])
+        elif ticker not in self.positions:
             # self._add_position(
             #     action, ticker, quantity,
             #     price, commission
@@ -167,6 +252,7 @@ class Portfolio(object):
                 price, commission
             )
             self.positions[ticker] = position
+            self.history.add_ticker(ticker)
         else:
             # self._modify_position(
             #     action, ticker, quantity,
@@ -175,16 +261,87 @@ class Portfolio(object):
             self.positions[ticker].transact_shares(
                 action, quantity, price, commission
             )
-        self.update_portfolio()
+        self._dirty = True
+
+    def transact_positions(
+        self, actions, tickers,
+        quantities, prices, commissions
+    ):
+        """
+        Applies a batch of fills, given as parallel sequences, in
+        one pass. With a PositionBook this is a single vectorised
+        update of the book and of the cash.
+        """
+        if self.book is None:
+            for fill in zip(actions, tickers, quantities, prices, commissions):
+                self.transact_position(*fill)
+            return
+
+        actions     = np.asarray(actions, dtype=object)
+        notional    = np.asarray(quantities, dtype=np.float64) * np.asarray(prices, dtype=np.float64)
+        commissions = np.asarray(commissions, dtype=np.float64)
+        self.cur_cash -= ((notional + commissions) * (actions == "BOT")).sum()
+        self.cur_cash += ((notional - commissions) * (actions == "SLD")).sum()
+
+        self._transact_book(actions, tickers, quantities, prices, commissions)
+        self._dirty = True
+
+    def _transact_book(self, actions, tickers, quantities, prices, commissions):
+        # a ticker new to the book may come twice in one batch
+        for ticker in dict.fromkeys(tickers):
+            if ticker not in self.book:
+                self.history.add_ticker(ticker)
+        self.book.transact(tickers, actions, quantities, prices, commissions)
+
+    def get_state(self):
+        """
+        The accounts, positions and history of the portfolio, for a
+        Checkpoint.
+        """
+        return {
+            'init_cash': self.init_cash,
+            'equity': self.equity,
+            'cur_cash': self.cur_cash,
+            'closed_positions': self.closed_positions,
+            'realised_pnl': self.realised_pnl,
+            'unrealised_pnl': self.unrealised_pnl,
+            'history': self.history,
+            'positions': self.positions,
+            'book': self.book,
+            'current_weights': self.current_weights,
+            'valued_time': self._valued_time
+        }
+
+    def set_state(self, state):
+        self.init_cash          = state['init_cash']
+        self.equity             = state['equity']
+        self.cur_cash           = state['cur_cash']
+        self.closed_positions   = state['closed_positions']
+        self.realised_pnl       = state['realised_pnl']
+        self.unrealised_pnl     = state['unrealised_pnl']
+        self.history            = state['history']
+        self.positions          = state['positions']
+        self.book               = state['book']
+        self.current_weights    = state['current_weights']
+        self._book_columns      = None
+        self._dirty             = True
+        self._valued_time       = state['valued_time']
+
+    def get_quantities(self, tickers):
+        """
+        Net quantities held of the given tickers, zero for tickers
+        without a position.
+        """
+        if self.book is not None:
+            net, ids = self.book.net, self.book.ticker_idx
+            return np.array([net[ids[ticker]] if ticker in ids else 0.0 for ticker in tickers])
+        positions = self.positions
+        return np.array([positions[ticker].net if ticker in positions else 0.0 for ticker in tickers])
 
     def get_current_weights(self, ticker=None):
         self.update_portfolio()
-        wt = {}
         if ticker is None:
-            for ticker in self.positions:
-                pt = self.positions[ticker]
-                wt[ticker] = pt.market_value / self.equity
+            wt = dict(self.current_weights)
         else:
-            pt = self.positions[ticker]
-            wt = pt.market_value / self.equity
+            wt = self.current_weights[ticker]
         return wt
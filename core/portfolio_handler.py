@@ -1,17 +1,24 @@
 import queue
+from collections import deque
 from datetime import datetime
 
+from core.checkpoint import Checkpoint
 from core.event import EventType
 from core.portfolio import Portfolio
 
 
 class PortfolioHandler(object):
 
+    # the components whose get_state() goes into a checkpoint
+    _COMPONENTS = ['strategy', 'position_sizer', 'risk_manager', 'execution_handler', 'statistics', 'trade_log']
+
     def __init__(
         self, tickers, initial_cash, events_queue,
         price_handler, position_sizer,
         risk_manager, execution_handler,
-        strategy, statistics, start_time
+        strategy, statistics, start_time,
+        position_book=False, trade_log=None, profiler=None,
+        checkpoint=None
     ):
 
         self.initial_cash       = initial_cash
@@ -20,11 +27,41 @@ class PortfolioHandler(object):
         self.position_sizer     = position_sizer
         self.risk_manager       = risk_manager
         self.execution_handler  = execution_handler
-        self.portfolio          = Portfolio(initial_cash, tickers)
+        self.portfolio          = Portfolio(price_handler, initial_cash, tickers, position_book)
         self.strategy           = strategy
         self.statistics         = statistics
         self.cur_time           = start_time
         self.session_type       = "backtest"
+        self.trade_log          = trade_log
+        self.profiler           = profiler
+        self.checkpoint         = checkpoint
+
+        # A plain deque (the default) runs backtests on the lock-free
+        # fast path of run_session; a queue.Queue is kept for live
+        # sessions fed from other threads.
+        if self.events_queue is None:
+            self.events_queue   = deque()
+        if isinstance(self.events_queue, deque):
+            self._put_event     = self.events_queue.append
+        else:
+            self._put_event     = self.events_queue.put
+
+        self._get_pending_orders = getattr(execution_handler, 'get_pending_orders', None)
+        self._net_orders        = (
+            isinstance(self.events_queue, deque) and
+            hasattr(self.position_sizer, 'size_orders')
+        )
+
+        # a StageProfiler wraps the stage methods of this instance,
+        # so they have to be in place before the dispatch table
+        if self.profiler is not None:
+            self.profiler.instrument(self)
+
+        self._dispatch          = {
+            EventType.PRICE:        self._calculate_signals,
+            EventType.TARGETWEIGHT: self._convert_signals_to_order,
+            EventType.ORDER:        self._on_suggested_order
+        }
 
     def initialize_parameters(self):
         self.price_handler.initialize(self)
@@ -33,6 +70,8 @@ class PortfolioHandler(object):
         self.execution_handler.initialize(self)
         if self.position_sizer is not None:
             self.position_sizer.initialize(self)
+        if self.statistics is not None:
+            self.statistics.initialize(self)
 
     def get_current_weights(self, ticker=None):
         if ticker is None:
@@ -56,46 +95,131 @@ class PortfolioHandler(object):
 
     def _stream_next(self):
         event         = self.price_handler.stream_next()
+        if event.time is None:
+            # the stream is exhausted, until the price handler is extended
+            return
         self.cur_time = event.time
-        self._place_events_onto_queue(event)
+        self.put_event(event)
 
     def _calculate_signals(self, event):
+        # orders left unfilled on earlier bars go before new ones
+        if self._get_pending_orders is not None:
+            pending = self._get_pending_orders(event.time)
+            if pending is not None:
+                self.put_event(pending)
         event = self.strategy.calculate_signals(event)
-        self._place_events_onto_queue(event)
+        self.put_event(event)
 
     def _convert_signals_to_order(self, weight_events):
+        # target weights queued for the same timestamp, e.g. by
+        # several strategies, are netted into a single order pool
+        events = self.events_queue
+        if self._net_orders and events and self._same_targets(events[0], weight_events.time):
+            weight_events_list = [weight_events]
+            while events and self._same_targets(events[0], weight_events.time):
+                weight_events_list.append(events.popleft())
+            order_events = self.position_sizer.size_orders(weight_events_list)
+        else:
+            order_events = self.position_sizer.size_order(weight_events)
+        self.put_event(order_events)
 
-        order_events = self.position_sizer.size_order(weight_events)
-        self._place_events_onto_queue(order_events)
+    def _same_targets(self, event_pool, time):
+        return (
+            event_pool is not None and
+            event_pool.type == EventType.TARGETWEIGHT and
+            event_pool.time == time
+        )
 
     def _on_suggested_order(self, order_events):
         order_events = self.execution_handler.execute_order(order_events)
         self._convert_fill_to_portfolio_update(order_events)
 
 
+    def get_state(self):
+        """
+        The state of the session between two bars, for a Checkpoint.
+        """
+        price_handler   = self.price_handler
+        time            = price_handler.get_timestamp_by_idx(price_handler._last_idx())
+        if isinstance(self.events_queue, deque):
+            events      = list(self.events_queue)
+        else:
+            events      = list(self.events_queue.queue)
+        components = {}
+        for name in self._COMPONENTS:
+            component = getattr(self, name)
+            if component is not None and hasattr(component, 'get_state'):
+                components[name] = component.get_state()
+        return {
+            'time': time,
+            'portfolio': self.portfolio.get_state(),
+            'events': events,
+            'components': components
+        }
+
+    def set_state(self, state):
+        """
+        Restores a state of get_state(). The price handler is moved
+        to the bar of the snapshot, which has to be in its timestamps,
+        and the session goes on from the following bar.
+        """
+        price_handler = self.price_handler
+        matches = (price_handler.timestamp == state['time']).nonzero()[0]
+        if not len(matches):
+            raise ValueError("The price handler has no bar at the checkpoint time %s" % state['time'])
+        price_handler.curr_idx = matches[0]
+        price_handler._subscribe_tickers(price_handler.curr_idx)
+        self.cur_time = state['time']
+        self.portfolio.set_state(state['portfolio'])
+        for name, component_state in state['components'].items():
+            component = getattr(self, name)
+            if component is not None:
+                component.set_state(component_state)
+        for event in state['events']:
+            self.put_event(event)
+
+    def resume(self, path):
+        """
+        Continues a session from a Checkpoint file. Call it after
+        initialize_parameters() and before run_session(); the price
+        handler may cover more bars than the checkpointed session.
+        """
+        self.set_state(Checkpoint.load(path))
+
     def _continue_loop_condition(self):
         if self.session_type == "backtest":
             return self.price_handler.continue_backtest()
         else:
             return datetime.now() < self.end_session_time
 
-    def _place_events_onto_queue(self, events):
-        self.events_queue.put(events)
+    def put_event(self, events):
+        self._put_event(events)
+
+    def _dispatch_event(self, event_pool):
+        try:
+            handler = self._dispatch[event_pool.type]
+        except KeyError:
+            raise NotImplementedError("Unsupported event_pool.type '%s'" % event_pool.type)
+        handler(event_pool)
 
     def _convert_fill_to_portfolio_update(self, fill_events):
-        for ticker in fill_events.pool:
-            fill_event  = fill_events.pool[ticker]
-            action      = fill_event.action
-            ticker      = fill_event.ticker
-            quantity    = fill_event.quantity
-            price       = fill_event.price
-            commission = 0
-            # Create or modify the position from the fill info
-            if fill_event.isvalid():
-                self.portfolio.transact_position(
-                    action, ticker, quantity,
-                    price, commission
-                )
+        # Create or modify the positions from the valid, non-empty fills,
+        # charging the commission each fill carries from the execution
+        # handler (Interactive Brokers US Fixed for the simulated one)
+        fills = [
+            fill for fill in zip(fill_events.actions, fill_events.tickers, fill_events.quantities,
+                                 fill_events.prices, fill_events.commissions)
+            if fill[0] is not None and fill[2]
+        ]
+        if fills:
+            actions, tickers, quantities, prices, commissions = zip(*fills)
+            self.portfolio.transact_positions(actions, tickers, quantities, prices, commissions)
+            if self.statistics is not None:
+                self.statistics.add_trades(self.cur_time, quantities, prices)
+            if self.trade_log is not None:
+                self.trade_log.add_fills(fill_events.time, tickers, actions, quantities, prices, commissions)
+        # mark-to-market once for the whole batch of fills
+        self.update_portfolio_value()
 
 
     def run_session(self):
@@ -105,23 +229,57 @@ class PortfolioHandler(object):
         else:
             print("Running Realtime Session until %s" % self.end_session_time)
 
+        if self.profiler is not None:
+            self.profiler.start()
+        if self.session_type == "backtest" and isinstance(self.events_queue, deque):
+            self._run_backtest_loop()
+        else:
+            self._run_queue_loop()
+
+        if self.checkpoint is not None:
+            self.checkpoint.save(self)
+        if self.trade_log is not None:
+            self.trade_log.flush()
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.profiler.print_summary()
+
+    def _run_queue_loop(self):
         while self._continue_loop_condition():
             try:
                 event_pool = self.events_queue.get(False)
             except queue.Empty:
+                if self.checkpoint is not None:
+                    self.checkpoint.on_bar(self)
                 self._stream_next()
             else:
                 if event_pool is not None:
-                    if event_pool.type  == EventType.PRICE:
-                        self._calculate_signals(event_pool)
-                    elif event_pool.type == EventType.TARGETWEIGHT:
-                        self._convert_signals_to_order(event_pool)
-                    elif event_pool.type == EventType.ORDER:
-                        self._on_suggested_order(event_pool)
-                    else:
-                        raise NotImplemented("Unsupported event_pool.type '%s'" % event_pool.type)
+                    self._dispatch_event(event_pool)
                     self.update_portfolio_value()
 
+    def _run_backtest_loop(self):
+        """
+        The single-threaded backtest loop over a deque. It handles
+        events in exactly the same order as the queue.Queue loop,
+        without its locking and exception-driven control flow.
+        """
+        events              = self.events_queue
+        dispatch_event      = self._dispatch_event
+        continue_backtest   = self.price_handler.continue_backtest
+        update_portfolio    = self.update_portfolio_value
+        checkpoint          = self.checkpoint
+
+        while continue_backtest():
+            if not events:
+                if checkpoint is not None:
+                    checkpoint.on_bar(self)
+                self._stream_next()
+                continue
+            event_pool = events.popleft()
+            if event_pool is not None:
+                dispatch_event(event_pool)
+                update_portfolio()
+
     def start_trading(self, testing=False):
         """
         Runs either a backtest or live session, and outputs performance when complete.
@@ -50,10 +50,13 @@ class Position(object):
         bid-ask spread. Once the market value is calculated it
         allows calculation of the unrealised and realised profit
         and loss of any transactions.
+
+        A flat position is worth nothing, even while its ticker has
+        no price (NaN) yet, e.g. before it is listed.
         """
         midpoint = (bid + ask) / 2
 
-        self.market_value   = self.net * midpoint
+        self.market_value   = self.net * midpoint if self.net != 0 else 0
         self.unrealised_pnl = self.market_value - self.cost_basis
         self.total_pnl      = self.unrealised_pnl + self.realised_pnl
 
@@ -65,13 +68,25 @@ class Position(object):
         Takes care to update the average bought/sold, total
         bought/sold, the cost basis and PnL calculations,
         as carried out through Interactive Brokers TWS.
+
+        A fill that increases the position averages its price and
+        commission into avg_price: a buy adds the commission to the
+        cost, a sell short takes it off the proceeds. A fill that
+        reduces the position books its PnL and its commission in
+        realised_pnl and leaves avg_price of the shares still open
+        unchanged; a closed position has no avg_price and one
+        flipped through zero is opened at price. Hence the cost
+        basis is what is left invested and the equity of a portfolio
+        is its cash plus the market value of its positions.
         """
         if bid is None: 
             bid = price
         if ask is None:
             ask = price
 
-        if action is None:
+        # Nothing is traded, nothing changes (and avg_bot/avg_sld
+        # would otherwise divide by zero on a first 0-share order)
+        if action is None or quantity == 0:
             return
 
         self.total_commission += commission
@@ -82,9 +97,10 @@ class Position(object):
 
             if self.net < 0:
                 self.realised_pnl += min(quantity, abs(self.net)) * (self.avg_price - price) - commission  # Adjust realised PNL
-                commission        = 0      # assume commission is all in realised_pnl
-            # Increasing long position
-            self.avg_price  = (self.avg_price * self.net + price * quantity + commission) / (self.net + quantity)
+                self.avg_price     = _reduced_avg_price(self.avg_price, self.net, quantity, price)
+            else:
+                # Increasing long position
+                self.avg_price = (self.avg_price * self.net + price * quantity + commission) / (self.net + quantity)
             self.buys       += quantity
             self.total_bot  = self.buys * self.avg_bot
 
@@ -94,9 +110,10 @@ class Position(object):
 
             if self.net > 0:
                 self.realised_pnl += min(quantity, abs(self.net)) * (price - self.avg_price) - commission  # Adjust realised PNL
-                commission        = 0  # assume commission is all in realised_pnl
-
-            self.avg_price  = (self.avg_price * self.net - price * quantity - commission) / (self.net - quantity)
+                self.avg_price     = _reduced_avg_price(self.avg_price, self.net, quantity, price)
+            else:
+                # Increasing short position, the commission reduces the proceeds
+                self.avg_price = (self.avg_price * self.net - price * quantity + commission) / (self.net - quantity)
             self.sells      += quantity
             self.total_sld  = self.sells * self.avg_sld
 
@@ -108,6 +125,21 @@ class Position(object):
 
         self.update_market_value(bid, ask)
 
+
+def _reduced_avg_price(avg_price, net, quantity, price):
+    """
+    Average price after trading quantity against an open position of
+    net shares. The commission is all in realised_pnl, the shares left
+    open keep their average price, a closed position has none and a
+    position flipped through zero is opened at price.
+    """
+    if quantity < abs(net):
+        return avg_price
+    if quantity == abs(net):
+        return 0
+    return price
+
+
 if __name__ == "__main__":
     p = Position('AAPL', 'BOT', 150, 100, 5, 150, 150)
     print(vars(p))
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+
+class PositionBook(object):
+    """
+    PositionBook keeps the accounts of a whole universe of
+    positions as NumPy arrays indexed by ticker id, so that a
+    batch of fills or a mark-to-market of every ticker is a
+    handful of vectorised expressions.
+
+    The accounting follows Position.transact_shares and
+    Position.update_market_value exactly, field for field.
+
+    The field arrays are views of buffers with spare rows that
+    double in size when full, so adding tickers one by one or in
+    bulk is amortised O(1) per ticker. The fields are always updated
+    in place to keep them views of their buffers.
+    """
+    FIELDS = [
+        'realised_pnl', 'market_value', 'cost_basis', 'unrealised_pnl', 'total_pnl',
+        'buys', 'sells', 'net', 'avg_bot', 'avg_sld', 'avg_price',
+        'total_bot', 'total_sld', 'total_commission', 'net_total', 'net_incl_comm'
+    ]
+
+    def __init__(self, tickers):
+        self.tickers    = []
+        self.ticker_idx = {}
+        self._capacity  = 0
+        self._buffers   = {}
+        for field in self.FIELDS:
+            self._buffers[field] = np.zeros(0)
+            setattr(self, field, self._buffers[field])
+        self.add_tickers(tickers)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self.ticker_idx
+
+    def add_ticker(self, ticker):
+        """
+        Appends a flat position for a ticker and returns its id.
+        """
+        self.add_tickers([ticker])
+        return self.ticker_idx[ticker]
+
+    def add_tickers(self, tickers):
+        """
+        Appends flat positions for the tickers not in the book yet,
+        growing the arrays at most once.
+        """
+        new = [ticker for ticker in dict.fromkeys(tickers) if ticker not in self.ticker_idx]
+        if not new:
+            return
+        n, m = len(self.tickers), len(self.tickers) + len(new)
+        if m > self._capacity:
+            self._capacity = max(2 * self._capacity, m)
+            for field in self.FIELDS:
+                buffer      = np.zeros(self._capacity)
+                buffer[:n]  = getattr(self, field)
+                self._buffers[field] = buffer
+        for field in self.FIELDS:
+            buffer          = self._buffers[field]
+            buffer[n:m]     = 0.0
+            setattr(self, field, buffer[:m])
+        for ticker in new:
+            self.ticker_idx[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+
+    def get_ids(self, tickers):
+        self.add_tickers(tickers)
+        ticker_idx = self.ticker_idx
+        return np.array([ticker_idx[ticker] for ticker in tickers], dtype=np.intp)
+
+    def mark_to_market(self, bid, ask=None):
+        """
+        Updates the market value, unrealised and total PnL of every
+        position from arrays of bid and ask prices ordered by ticker
+        id. With only bid given it is used as the mid price. A flat
+        position is worth nothing, even while its ticker has no price
+        (NaN) yet.
+        """
+        midpoint = bid if ask is None else (np.asarray(bid) + np.asarray(ask)) / 2
+        np.multiply(self.net, midpoint, out=self.market_value)
+        self.market_value[self.net == 0] = 0.0
+        np.subtract(self.market_value, self.cost_basis, out=self.unrealised_pnl)
+        np.add(self.unrealised_pnl, self.realised_pnl, out=self.total_pnl)
+
+    def transact(self, tickers, actions, quantities, prices, commissions):
+        """
+        Applies a batch of fills to the book.
+
+        Parameters:
+        tickers - The ticker symbols of the fills.
+        actions - 'BOT' or 'SLD' for each fill; None entries are skipped.
+        quantities - The filled quantities.
+        prices - The fill prices.
+        commissions - The brokerage commissions.
+
+        Several fills for the same ticker are applied in the order
+        given, exactly as repeated Position.transact_shares calls.
+        """
+        ids         = self.get_ids(tickers)
+        actions     = np.asarray(actions, dtype=object)
+        quantities  = np.asarray(quantities, dtype=np.float64)
+        prices      = np.asarray(prices, dtype=np.float64)
+        commissions = np.asarray(commissions, dtype=np.float64)
+
+        valid = (actions != None) & (quantities != 0)
+        if not valid.all():
+            ids, actions, quantities, prices, commissions = (
+                ids[valid], actions[valid], quantities[valid], prices[valid], commissions[valid]
+            )
+        if len(ids) == 0:
+            return
+
+        bot         = actions == "BOT"
+        occurrence  = self._occurrence(ids)
+        for k in range(occurrence.max() + 1):
+            sel = occurrence == k
+            self._transact_unique(ids[sel], bot[sel], quantities[sel], prices[sel], commissions[sel])
+
+    def _transact_unique(self, i, bot, quantity, price, commission):
+        """
+        Applies fills to distinct ticker ids i in one vectorised step.
+        """
+        net         = self.net[i]
+        avg_price   = self.avg_price[i]
+        buys        = self.buys[i]
+        sells       = self.sells[i]
+
+        self.total_commission[i] += commission
+
+        self.avg_bot[i] = np.where(
+            bot, _ratio(self.avg_bot[i] * buys + price * quantity, buys + quantity, self.avg_bot[i]), self.avg_bot[i]
+        )
+        self.avg_sld[i] = np.where(
+            bot, self.avg_sld[i], _ratio(self.avg_sld[i] * sells + price * quantity, sells + quantity, self.avg_sld[i])
+        )
+
+        # Adjust realised PNL when reducing an existing position,
+        # in which case the commission is all in realised_pnl
+        closing     = np.where(bot, net < 0, net > 0)
+        held        = np.abs(net)
+        closed      = np.minimum(quantity, held)
+        pnl         = closed * np.where(bot, avg_price - price, price - avg_price) - commission
+        self.realised_pnl[i] += np.where(closing, pnl, 0.0)
+
+        # A reduced position keeps its average price, a closed one has
+        # none and one flipped through zero is opened at price; an
+        # increased one averages in the fill and its commission
+        signed      = np.where(bot, quantity, -quantity)
+        reduced     = np.where(quantity < held, avg_price, np.where(quantity == held, 0.0, price))
+        increased   = _ratio(avg_price * net + signed * price + commission, net + signed, np.zeros(len(i)))
+        self.avg_price[i] = np.where(closing, reduced, increased)
+
+        buys        = buys + np.where(bot, quantity, 0.0)
+        sells       = sells + np.where(bot, 0.0, quantity)
+        self.buys[i]        = buys
+        self.sells[i]       = sells
+        self.total_bot[i]   = buys * self.avg_bot[i]
+        self.total_sld[i]   = sells * self.avg_sld[i]
+
+        # Adjust net values, including commissions
+        self.net[i]             = buys - sells
+        self.net_total[i]       = self.total_sld[i] - self.total_bot[i]
+        self.net_incl_comm[i]   = self.net_total[i] - self.total_commission[i]
+        self.cost_basis[i]      = self.net[i] * self.avg_price[i]
+
+        self.market_value[i]    = self.net[i] * price
+        self.unrealised_pnl[i]  = self.market_value[i] - self.cost_basis[i]
+        self.total_pnl[i]       = self.unrealised_pnl[i] + self.realised_pnl[i]
+
+    def _occurrence(self, ids):
+        """
+        For each fill, the number of earlier fills in the batch for
+        the same ticker id.
+        """
+        order       = np.argsort(ids, kind='mergesort')
+        sorted_ids  = ids[order]
+        n           = len(ids)
+        starts      = np.ones(n, dtype=bool)
+        starts[1:]  = sorted_ids[1:] != sorted_ids[:-1]
+        first       = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+        occurrence  = np.empty(n, dtype=np.intp)
+        occurrence[order] = np.arange(n) - first
+        return occurrence
+
+    def to_frame(self):
+        """
+        Returns the book as a DataFrame with one row per ticker.
+        """
+        return pd.DataFrame({field: getattr(self, field) for field in self.FIELDS},
+                            index=self.tickers, columns=self.FIELDS)
+
+
+def _ratio(numerator, denominator, fallback):
+    """
+    Element-wise numerator / denominator, taking fallback wherever
+    the denominator is zero.
+    """
+    out = np.array(fallback, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+if __name__ == "__main__":
+    book = PositionBook(['AAPL', 'GS'])
+    book.transact(['AAPL', 'GS'], ['BOT', 'BOT'], [150, 10], [100, 200], [5, 1])
+    book.transact(['AAPL'], ['SLD'], [200], [105], [5])
+    book.mark_to_market(np.array([104.0, 210.0]))
+    print(book.to_frame().T)
@@ -3,10 +3,12 @@ import datetime
 import pandas as pd
 import numpy as np
 
+from data.csv_api import CsvData
 from data.data_factory import StockData
 from data.get_data import get_data_from_db
+from data.memmap_store import MemmapStore
 from core.pool import PriceEventPool
-from core.event import PriceEvent
+from core.trading_calendar import TradingCalendar
 
 class PriceHandler(object):
     def __init__(self, data_symbols, init_tickers=[], start_date = None, end_date= None, freq = 'B'):
@@ -22,13 +24,29 @@ class PriceHandler(object):
         self.curr_idx           = -1
         self.portfolio_handler  = None
 
+        # timestamps x tickers price matrices, built once by _get_initial_data
+        self.ticker_idx         = {ticker: i for i, ticker in enumerate(self.init_tickers)}
+        self.close              = None
+        self.adj_close          = None
+        # traded volume, NaN where unknown, used by execution models
+        self.volume             = None
+
+        # exchange holidays (dates or a file) for the trading calendar
+        self.holidays           = None
+        self._calendar          = None
+
+        # spare capacity behind the price matrices and the timestamps,
+        # see append
+        self._buffers           = {}
+        self._buffered_index    = None
+
     def initialize(self, portfolio_handler=None):
         self._get_initial_data()
         self.portfolio_handler = portfolio_handler
         timestamp = self.portfolio_handler.cur_time
         if self.portfolio_handler is not None:
             self.curr_idx = np.argmax(self.timestamp == timestamp)
-        self._subscribe_tickers(timestamp)
+        self._subscribe_tickers(self.curr_idx)
 
 
     def get_current_timestamp(self):
@@ -46,22 +64,57 @@ class PriceHandler(object):
     def stream_next(self):
         self.curr_idx += 1
         if self.curr_idx < len(self.timestamp):
-            timestamp   = self.timestamp[self.curr_idx]
-            self._subscribe_tickers(timestamp)
+            self._subscribe_tickers(self.curr_idx)
             price_events = self.tickers
         else:
             price_events = PriceEventPool(None)
 
         return price_events
 
+    def get_calendar(self):
+        """
+        The TradingCalendar of self.timestamp, built on first use.
+        """
+        if self._calendar is None:
+            self._calendar = TradingCalendar(self.timestamp, self.holidays)
+        return self._calendar
+
     def istick(self):
         return False
 
     def get_last_close(self, ticker):
-        price_event = self.tickers.pool[ticker]
-        close_price = price_event.adj_price
+        close_price = self.adj_close[self._last_idx(), self.ticker_idx[ticker]]
         return close_price
 
+    def get_ticker_columns(self, tickers):
+        """
+        Column positions of the given tickers in the price matrices.
+        """
+        return np.array([self.ticker_idx[ticker] for ticker in tickers], dtype=np.intp)
+
+    def get_last_closes(self, columns=None):
+        """
+        Adjusted closes of the current bar for every ticker, or for
+        the columns returned by get_ticker_columns.
+        """
+        row = self.adj_close[self._last_idx()]
+        if columns is None:
+            return row.copy()
+        return row[columns]
+
+    def get_last_volumes(self, columns=None):
+        """
+        Volumes of the current bar, NaN where unknown, for every
+        ticker or for the columns returned by get_ticker_columns.
+        """
+        if self.volume is None:
+            n = len(self.adj_close[0]) if columns is None else len(columns)
+            return np.full(n, np.nan)
+        row = self.volume[self._last_idx()]
+        if columns is None:
+            return row.copy()
+        return row[columns]
+
     def continue_backtest(self):
         flag = True
         if self.curr_idx >= len(self.timestamp):
@@ -70,34 +123,248 @@ class PriceHandler(object):
 
 
 
-    def _create_price_event(self, ticker, timestamp):
-        try:
-            row             = self.data.loc[timestamp, :]
-            adj_close       = row[ticker + '-Adj Close']
-            close           = row[ticker + '-Close']
-        except(KeyError,):
-            adj_close       = None
-            close           = None
+    def extend(self, end_date):
+        """
+        Adds the bars after the last timestamp up to end_date,
+        loading only their data, and returns the number of bars
+        added. A finished session goes on with the new bars on the
+        next run_session(), so a daily job costs O(new days).
+        """
+        timestamp = pd.date_range(self.timestamp[-1], end_date, freq=self.freq)
+        timestamp = timestamp[timestamp > self.timestamp[-1]]
+        if not len(timestamp):
+            return 0
+        data = self._get_new_data(timestamp[0], timestamp[-1])
+        close, adj_close, volume = self._align(data, timestamp)
+
+        # bars before the first new data row carry the last prices
+        close       = np.where(np.isnan(close), self.close[-1], close)
+        adj_close   = np.where(np.isnan(adj_close), self.adj_close[-1], adj_close)
+        self.end_date = end_date
+        return self.append(timestamp, close, adj_close, volume)
+
+    def append(self, timestamp, close, adj_close, volume=None):
+        """
+        Appends rows to the timestamps and the price matrices and
+        returns the number of rows added.
+
+        The matrices and the timestamps are views of buffers with
+        spare rows that double in size when full, and the trading
+        calendar is extended with the new rows only, so appending is
+        amortised O(new rows). When the stream was exhausted, it
+        resumes at the first new row.
+
+        Parameters:
+        timestamp - The timestamps of the rows, after the last one.
+        close - The (rows x tickers) close prices.
+        adj_close - The (rows x tickers) adjusted close prices.
+        volume - The (rows x tickers) volumes, NaN when not given.
+        """
+        timestamp = pd.DatetimeIndex(timestamp)
+        if not len(timestamp):
+            return 0
+        n = len(self.timestamp)
+        if timestamp[0] <= self.timestamp[-1]:
+            raise ValueError("Appended bars have to start after %s" % self.timestamp[-1])
+
+        if volume is None:
+            volume = np.full((len(timestamp), self.adj_close.shape[1]), np.nan)
+        if self.volume is None:
+            self.volume = np.full(self.adj_close.shape, np.nan)
+        self.close      = self._append_rows('close', close, n)
+        self.adj_close  = self._append_rows('adj_close', adj_close, n)
+        self.volume     = self._append_rows('volume', volume, n)
+        self.timestamp  = self._append_timestamp(timestamp, n)
+        if self._calendar is not None:
+            self._calendar.extend(self.timestamp)
 
-        if adj_close is None:
-            adj_close = self.tickers.pool[ticker].adj_price
-        if close is None:
-            close     = self.tickers.pool[ticker].price
+        if self.curr_idx >= n:
+            self.curr_idx = n - 1
+        return len(timestamp)
 
-        event = PriceEvent(ticker, close, adj_close)
-        return event
+    def _append_rows(self, name, rows, n):
+        matrix  = getattr(self, name)
+        buffer  = self._buffers.get(name)
+        rows    = np.asarray(rows, dtype=np.float64)
+        m       = n + len(rows)
+        if buffer is None or matrix.base is not buffer or len(buffer) < m:
+            buffer          = np.empty((max(2 * n, m),) + matrix.shape[1:])
+            buffer[:n]      = matrix[:n]
+            self._buffers[name] = buffer
+        buffer[n:m] = rows
+        return buffer[:m]
 
-    def _subscribe_tickers(self, timestamp):
+    def _append_timestamp(self, timestamp, n):
+        buffer  = self._buffers.get('timestamp')
+        values  = timestamp.values
+        # e.g. nanosecond stamps appended to a microsecond index
+        dtype   = np.promote_types(self.timestamp.values.dtype, values.dtype)
+        m       = n + len(values)
+        if (buffer is None or self.timestamp is not self._buffered_index or
+                len(buffer) < m or buffer.dtype != dtype):
+            buffer      = np.empty(max(2 * n, m), dtype=dtype)
+            buffer[:n]  = self.timestamp.values
+            self._buffers['timestamp'] = buffer
+        buffer[n:m] = values
+        self._buffered_index = pd.DatetimeIndex(buffer[:m], copy=False)
+        return self._buffered_index
 
-        event_pool = PriceEventPool(timestamp)
-        for ticker in self.init_tickers:
-            event = self._create_price_event(ticker, timestamp)
-            event_pool.add(event)
+    def _get_new_data(self, start_date, end_date):
+        return get_data_from_db(None, self.data_symbols, start_date, end_date)
+
+    def _last_idx(self):
+        """
+        Row of the price matrices for the most recently streamed bar.
+        Once the stream is exhausted the last bar stays current.
+        """
+        return min(self.curr_idx, len(self.timestamp) - 1)
+
+    def _subscribe_tickers(self, idx):
+        event_pool = PriceEventPool(
+            self.timestamp[idx], self.init_tickers, self.ticker_idx,
+            self.close[idx], self.adj_close[idx]
+        )
         self.last_price_events  = self.tickers
         self.tickers            = event_pool
 
     def _get_initial_data(self):
         self.data = get_data_from_db(self.data, self.data_symbols, self.start_date, self.end_date)
+        self._build_price_matrix()
+
+    def _build_price_matrix(self):
+        """
+        Materialises the 'Close' and 'Adj Close' columns of every
+        ticker into contiguous (timestamps x tickers) float arrays
+        aligned to self.timestamp.
+
+        Gaps are forward-filled on the union of the data and stream
+        calendars, so a bar without a data row (e.g. a holiday under
+        the 'B' frequency) carries the previous prices forward. The
+        volume of such a bar is zero, as nothing traded; it is NaN
+        for tickers whose data has no 'Volume' column.
+
+        The bars before a ticker's first data row, e.g. before it was
+        listed, have NaN prices: the ticker is not tradable yet. The
+        position sizer emits no order for it and the portfolio values
+        its flat position at zero.
+        """
+        self.close, self.adj_close, self.volume = self._align(self.data, self.timestamp)
+
+    def _align(self, data, timestamp):
+        close_cols  = [ticker + '-Close' for ticker in self.init_tickers]
+        adj_cols    = [ticker + '-Adj Close' for ticker in self.init_tickers]
+
+        prices  = data.reindex(columns=close_cols + adj_cols)
+        prices  = prices.reindex(prices.index.union(timestamp)).ffill()
+        prices  = prices.reindex(timestamp)
+
+        n           = len(self.init_tickers)
+        values      = np.asarray(prices.values, dtype=np.float64)
+        close       = np.ascontiguousarray(values[:, :n])
+        adj_close   = np.ascontiguousarray(values[:, n:])
+
+        volume_cols = [ticker + '-Volume' for ticker in self.init_tickers]
+        volume      = data.reindex(columns=volume_cols).reindex(timestamp)
+        known       = [column in data.columns for column in volume_cols]
+        volume.loc[:, known] = volume.loc[:, known].fillna(0)
+        return close, adj_close, np.ascontiguousarray(np.asarray(volume.values, dtype=np.float64))
+
+
+class CsvPriceHandler(PriceHandler):
+    """
+    PriceHandler reading daily bars straight from a directory of
+    DataStore-format CSV files, so a backtest runs fully offline.
+
+    Parameters:
+    init_tickers - The tickers to stream, one <ticker>.csv each.
+    csv_dir - The directory of the files, DataStore by default.
+    max_workers - The number of files read concurrently.
+    """
+    def __init__(self, init_tickers, start_date=None, end_date=None, freq='B', csv_dir=None, max_workers=8):
+        PriceHandler.__init__(self, [], init_tickers, start_date, end_date, freq)
+        self.csv_data = CsvData(csv_dir, max_workers)
+
+    def _get_initial_data(self):
+        self.data = self.csv_data.get_data(list(self.init_tickers), self.start_date, self.end_date)
+        self._build_price_matrix()
+
+    def _get_new_data(self, start_date, end_date):
+        return self.csv_data.get_data(list(self.init_tickers), start_date, end_date)
+
+
+class ArrayPriceHandler(PriceHandler):
+    """
+    PriceHandler over price matrices that are already loaded, e.g.
+    memory-mapped arrays shared between the processes of a sweep.
+
+    Parameters:
+    timestamp - The DatetimeIndex of the rows.
+    init_tickers - The tickers of the columns, in order.
+    close - The (timestamps x tickers) close prices.
+    adj_close - The (timestamps x tickers) adjusted close prices.
+    volume - The (timestamps x tickers) volumes, if known.
+    """
+    def __init__(self, timestamp, init_tickers, close, adj_close, volume=None):
+        PriceHandler.__init__(self, [], init_tickers, timestamp[0], timestamp[-1])
+        self.timestamp  = timestamp
+        self.close      = close
+        self.adj_close  = adj_close
+        self.volume     = volume
+
+    def _get_initial_data(self):
+        pass
+
+    def extend(self, end_date):
+        raise NotImplementedError("ArrayPriceHandler has no data source, use append()")
+
+
+class MemmapPriceHandler(PriceHandler):
+    """
+    PriceHandler backed by a MemmapStore. The price matrices are
+    read-only views of the memory-mapped store files, so startup
+    costs next to nothing and every process backtesting on the same
+    store shares its pages.
+
+    The stream runs over the days of the store between start_date
+    and end_date rather than over a generated date range; the store
+    is already forward-filled on its own calendar.
+    """
+    def __init__(self, store_path, init_tickers, start_date=None, end_date=None):
+        self.store  = MemmapStore(store_path)
+        dates       = self.store.get_dates()
+        start_date  = pd.Timestamp(start_date) if start_date is not None else dates[0]
+        end_date    = pd.Timestamp(end_date) if end_date is not None else dates[-1]
+        PriceHandler.__init__(self, [], init_tickers, start_date, end_date)
+
+        self._rows      = slice(dates.searchsorted(start_date, 'left'), dates.searchsorted(end_date, 'right'))
+        self.timestamp  = dates[self._rows]
+        # the matrices keep the store's full width, so map each
+        # ticker to its store column instead of copying a subset
+        self.ticker_idx = {ticker: self.store.ticker_idx[ticker] for ticker in init_tickers}
+
+    def _get_initial_data(self):
+        self.close      = self.store.get_field('Close')[self._rows]
+        self.adj_close  = self.store.get_field('Adj Close')[self._rows]
+        if 'Volume' in self.store.fields:
+            self.volume = self.store.get_field('Volume')[self._rows]
+
+    def extend(self, end_date):
+        """
+        Adds the days appended to the store since it was opened, up
+        to end_date. The history is copied out of the memory map
+        once, on the first extension.
+        """
+        self.store  = MemmapStore(self.store.path)
+        dates       = self.store.get_dates()
+        end_date    = pd.Timestamp(end_date)
+        rows        = slice(dates.searchsorted(self.timestamp[-1], 'right'), dates.searchsorted(end_date, 'right'))
+        if rows.start >= rows.stop:
+            return 0
+        volume = self.store.get_field('Volume')[rows] if 'Volume' in self.store.fields else None
+        self.end_date = end_date
+        return self.append(
+            dates[rows], self.store.get_field('Close')[rows], self.store.get_field('Adj Close')[rows], volume
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+import json
+import os
+import time
+
+
+STAGES = [
+    '_stream_next', '_calculate_signals', '_convert_signals_to_order',
+    '_on_suggested_order', 'update_portfolio_value'
+]
+
+
+class StageProfiler(object):
+    """
+    Opt-in instrumentation of the stages of a PortfolioHandler:
+    wall time, call count and the size of the event pool handled,
+    per stage.
+
+    instrument() replaces the stage methods of the handler instance
+    with timed wrappers, so a handler without a profiler runs its
+    methods untouched. Times are exclusive: a stage called from
+    another one, e.g. the mark-to-market after the fills, is only
+    counted in its own stage; total_time includes the nested calls.
+
+    Parameters:
+    trace - True to record every call, for export_trace().
+    max_events - The most calls recorded in the trace; later calls
+        are still timed but not traced.
+    """
+    def __init__(self, trace=False, max_events=1000000):
+        self.trace      = trace
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        self.self_time  = dict((stage, 0.0) for stage in STAGES)
+        self.total_time = dict((stage, 0.0) for stage in STAGES)
+        self.calls      = dict((stage, 0) for stage in STAGES)
+        self.pool_sizes = dict((stage, 0) for stage in STAGES)
+        self.events     = []
+        self.wall_time  = 0.0
+        self._stack     = []
+        self._start     = None
+
+    def instrument(self, portfolio_handler):
+        for stage in STAGES:
+            setattr(portfolio_handler, stage, self._wrap(getattr(portfolio_handler, stage), stage))
+
+    def _wrap(self, func, stage):
+        self_time   = self.self_time
+        total_time  = self.total_time
+        calls       = self.calls
+        pool_sizes  = self.pool_sizes
+        events      = self.events
+        stack       = self._stack
+        clock       = time.perf_counter
+        trace       = self.trace
+        max_events  = self.max_events
+
+        def timed(*args):
+            size = len(args[0]) if args and args[0] is not None else 0
+            stack.append(0.0)
+            start = clock()
+            try:
+                return func(*args)
+            finally:
+                elapsed = clock() - start
+                self_time[stage] += elapsed - stack.pop()
+                total_time[stage] += elapsed
+                calls[stage] += 1
+                pool_sizes[stage] += size
+                if stack:
+                    stack[-1] += elapsed
+                if trace and len(events) < max_events:
+                    events.append((stage, start, elapsed, size))
+        return timed
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def stop(self):
+        if self._start is not None:
+            self.wall_time += time.perf_counter() - self._start
+            self._start = None
+
+    def get_summary(self):
+        """
+        The measures per stage, plus the share of the session wall
+        time spent outside of the stages as 'loop'.
+        """
+        summary = {}
+        for stage in STAGES:
+            calls = self.calls[stage]
+            summary[stage] = {
+                'calls': calls,
+                'self_time': self.self_time[stage],
+                'total_time': self.total_time[stage],
+                'mean_time': self.self_time[stage] / calls if calls else 0.0,
+                'mean_pool_size': float(self.pool_sizes[stage]) / calls if calls else 0.0,
+                'share': self.self_time[stage] / self.wall_time if self.wall_time else 0.0
+            }
+        loop = max(self.wall_time - sum(self.self_time.values()), 0.0)
+        summary['loop'] = {
+            'calls': 0, 'self_time': loop, 'total_time': loop, 'mean_time': 0.0,
+            'mean_pool_size': 0.0, 'share': loop / self.wall_time if self.wall_time else 0.0
+        }
+        return summary
+
+    def print_summary(self):
+        print("%-26s %10s %10s %10s %9s %7s" % ('stage', 'calls', 'time (s)', 'mean (us)', 'pool size', 'share'))
+        for stage, row in self.get_summary().items():
+            print("%-26s %10d %10.4f %10.2f %9.1f %6.1f%%" % (
+                stage, row['calls'], row['self_time'], row['mean_time'] * 1e6,
+                row['mean_pool_size'], row['share'] * 100.0))
+        print("%-26s %10s %10.4f" % ('wall time', '', self.wall_time))
+
+    def export_trace(self, path):
+        """
+        Writes the traced calls in the Chrome trace event format, to
+        be opened in chrome://tracing, Perfetto or speedscope.
+        """
+        if not self.trace:
+            raise ValueError("export_trace needs a StageProfiler(trace=True)")
+        origin = self.events[0][1] if self.events else 0.0
+        trace_events = [
+            {
+                'name': stage, 'cat': 'stage', 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                'ts': (start - origin) * 1e6, 'dur': elapsed * 1e6, 'args': {'pool_size': size}
+            }
+            for stage, start, elapsed, size in self.events
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+
+class _Accumulators(object):
+    """
+    Running sums over the completed bars of a session. Adding a
+    bar and copying the whole state are both O(1).
+    """
+    __slots__ = (
+        'n', 'first_equity', 'last_equity', 'mean', 'm2',
+        'peak', 'max_drawdown', 'duration', 'max_duration',
+        'turnover', 'gross_exposure', 'net_exposure'
+    )
+
+    def __init__(self):
+        self.n              = 0
+        self.first_equity   = None
+        self.last_equity    = None
+        self.mean           = 0.0   # Welford mean and sum of squared
+        self.m2             = 0.0   # deviations of the returns
+        self.peak           = -np.inf
+        self.max_drawdown   = 0.0
+        self.duration       = 0
+        self.max_duration   = 0
+        self.turnover       = 0.0
+        self.gross_exposure = 0.0
+        self.net_exposure   = 0.0
+
+    def copy(self):
+        other = _Accumulators.__new__(_Accumulators)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def add(self, equity, traded, gross, net):
+        if self.last_equity is None:
+            self.first_equity = equity
+        else:
+            # the return of this bar is return number self.n
+            r           = equity / self.last_equity - 1
+            delta       = r - self.mean
+            self.mean   += delta / self.n
+            self.m2     += delta * (r - self.mean)
+        self.n           += 1
+        self.last_equity = equity
+
+        if equity >= self.peak:
+            self.peak       = equity
+            self.duration   = 0
+        else:
+            self.duration   += 1
+        self.max_drawdown   = max(self.max_drawdown, 1 - equity / self.peak)
+        self.max_duration   = max(self.max_duration, self.duration)
+
+        self.turnover       += traded / equity
+        self.gross_exposure += gross
+        self.net_exposure   += net
+
+
+class IncrementalStatistics(object):
+    """
+    Performance statistics of a session, kept up to date in O(1)
+    per bar: the returns go through Welford's running mean and
+    variance and the drawdown through a running peak, so results
+    are available at any point of a run without touching the
+    history.
+
+    The PortfolioHandler calls update() whenever the portfolio is
+    valued and add_trades() with each batch of fills. A bar may be
+    updated several times; only its last valuation counts, so the
+    numbers are those of the end-of-bar portfolio the history keeps.
+
+    Parameters:
+    periods - The number of bars per year, for annualising.
+    """
+    def __init__(self, periods=252):
+        self.periods            = periods
+        self.portfolio_handler  = None
+        self._done              = _Accumulators()
+        self._time              = None
+        self._bar               = None     # [equity, traded, gross, net] of the current bar
+
+    def initialize(self, portfolio_handler):
+        self.portfolio_handler = portfolio_handler
+
+    def update(self, time, equity, cash, weights):
+        """
+        Records a valuation of the portfolio at time.
+
+        Parameters:
+        time - The timestamp of the bar.
+        equity - The portfolio equity.
+        cash - The cash held.
+        weights - The weights of the positions.
+        """
+        self._at(time)
+        self._bar[0] = equity
+        self._bar[2] = float(np.abs(weights).sum())
+        self._bar[3] = (equity - cash) / equity if equity else 0.0
+
+    def add_trades(self, time, quantities, prices):
+        """
+        Adds the traded value of a batch of fills at time to the
+        turnover.
+        """
+        self._at(time)
+        self._bar[1] += float(np.abs(np.asarray(quantities, dtype=np.float64) @ np.asarray(prices, dtype=np.float64)))
+
+    def _at(self, time):
+        if time != self._time:
+            if self._bar is not None and self._bar[0] is not None:
+                self._done.add(*self._bar)
+            self._time  = time
+            self._bar   = [None, 0.0, 0.0, 0.0]
+
+    def get_state(self):
+        return {'done': self._done.copy(), 'time': self._time, 'bar': self._bar and list(self._bar)}
+
+    def set_state(self, state):
+        self._done  = state['done']
+        self._time  = state['time']
+        self._bar   = state['bar']
+
+    def get_results(self):
+        """
+        Returns the statistics of the session so far, including the
+        current bar, as a dictionary with the same keys as
+        batch_statistics.
+        """
+        acc = self._done
+        if self._bar is not None and self._bar[0] is not None:
+            acc = acc.copy()
+            acc.add(*self._bar)
+        if acc.n == 0:
+            return batch_statistics([], periods=self.periods)
+
+        volatility = np.sqrt(acc.m2 / (acc.n - 2)) if acc.n > 2 else 0.0
+        return _results(
+            acc.last_equity, acc.last_equity / acc.first_equity - 1, acc.mean, volatility,
+            1 - acc.last_equity / acc.peak, acc.max_drawdown, acc.max_duration,
+            acc.turnover / acc.n, acc.gross_exposure / acc.n, acc.net_exposure / acc.n,
+            self.periods
+        )
+
+    def get_batch_results(self):
+        """
+        Recomputes the statistics from the recorded history with
+        batch_statistics, to verify the running values. The history
+        keeps no fills, so the turnover is left at zero.
+        """
+        portfolio   = self.portfolio_handler.portfolio
+        history     = portfolio.statistics
+        equity      = history['equity'].values
+        gross       = portfolio.weights.abs().sum(axis=1).values
+        net         = (equity - history['cash'].values) / equity
+        return batch_statistics(equity, None, gross, net, self.periods)
+
+    def plot_results(self):
+        import matplotlib.pyplot as plt
+
+        equity      = self.portfolio_handler.portfolio.statistics['equity']
+        drawdown    = 1 - equity / equity.cummax()
+        fig, (top, bottom) = plt.subplots(2, 1, sharex=True)
+        equity.plot(ax=top, title='Equity')
+        (-100.0 * drawdown).plot(ax=bottom, title='Drawdown (%)')
+        plt.show()
+
+
+def batch_statistics(equity, traded=None, gross_exposure=None, net_exposure=None, periods=252):
+    """
+    The statistics of IncrementalStatistics computed at once over
+    whole arrays.
+
+    Parameters:
+    equity - The equity per bar.
+    traded - The value traded per bar, for the turnover.
+    gross_exposure - Sum of absolute weights per bar.
+    net_exposure - Market value over equity per bar.
+    periods - The number of bars per year, for annualising.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0:
+        return _results(np.nan, 0.0, 0.0, 0.0, 0.0, 0.0, 0, 0.0, 0.0, 0.0, periods)
+
+    returns     = equity[1:] / equity[:-1] - 1
+    peak        = np.maximum.accumulate(equity)
+    drawdown    = 1 - equity / peak
+    # bars since the last peak, reset to zero at every new peak
+    at_peak     = equity >= peak
+    last_peak   = np.maximum.accumulate(np.where(at_peak, np.arange(len(equity)), 0))
+    duration    = np.arange(len(equity)) - last_peak
+
+    def mean(values):
+        return 0.0 if values is None else float(np.mean(values))
+
+    turnover = None if traded is None else np.asarray(traded, dtype=np.float64) / equity
+    return _results(
+        equity[-1], equity[-1] / equity[0] - 1,
+        returns.mean() if len(returns) else 0.0,
+        returns.std(ddof=1) if len(returns) > 1 else 0.0,
+        drawdown[-1], drawdown.max(), duration.max(),
+        mean(turnover), mean(gross_exposure), mean(net_exposure), periods
+    )
+
+
+def _results(
+    final_equity, total_return, mean_return, volatility,
+    drawdown, max_drawdown, max_duration,
+    turnover, gross_exposure, net_exposure, periods
+):
+    return {
+        'final_equity': final_equity,
+        'total_return': total_return,
+        'mean_return': periods * mean_return,
+        'volatility': np.sqrt(periods) * volatility,
+        'sharpe': np.sqrt(periods) * mean_return / volatility if volatility > 0 else 0.0,
+        'drawdown_pct': drawdown,
+        'max_drawdown_pct': max_drawdown,
+        'max_drawdown_duration': int(max_duration),
+        'turnover': periods * turnover,
+        'gross_exposure': gross_exposure,
+        'net_exposure': net_exposure
+    }
+
+
+if __name__ == "__main__":
+    equity  = 100.0 * np.cumprod(1 + np.random.normal(0.0004, 0.01, 2520))
+    stats   = IncrementalStatistics()
+    for i, value in enumerate(equity):
+        stats.update(i, value, 0.2 * value, [0.5, 0.3])
+    batch   = batch_statistics(equity, gross_exposure=np.full(len(equity), 0.8), net_exposure=np.full(len(equity), 0.8))
+    print(pd.DataFrame({'incremental': stats.get_results(), 'batch': batch}))
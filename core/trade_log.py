@@ -0,0 +1,283 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNS = ['timestamp', 'ticker', 'action', 'quantity', 'exchange', 'price', 'commission']
+ACTIONS = ['BOT', 'SLD']
+
+
+class TradeLog(object):
+    """
+    Append-only log of fills. Rows are buffered as parallel lists
+    and written out every chunk_size fills, so memory stays bounded
+    however long the run; close() writes the rest.
+
+    Subclasses implement _write(columns) for one chunk of rows.
+
+    Parameters:
+    path - The file (CSV) or directory (binary) of the log.
+    chunk_size - The number of fills buffered between writes.
+    exchange - The exchange recorded for every fill.
+    """
+    def __init__(self, path, chunk_size=10000, exchange='ARCA'):
+        self.path       = path
+        self.chunk_size = chunk_size
+        self.exchange   = exchange
+        self.n_rows     = 0
+        self._reset()
+
+    def _reset(self):
+        self._times         = []
+        self._tickers       = []
+        self._actions       = []
+        self._quantities    = []
+        self._prices        = []
+        self._commissions   = []
+
+    def __len__(self):
+        return self.n_rows + len(self._tickers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_fills(self, time, tickers, actions, quantities, prices, commissions):
+        """
+        Appends a batch of fills made at time, given as parallel
+        sequences.
+        """
+        self._times.extend([time] * len(tickers))
+        self._tickers.extend(tickers)
+        self._actions.extend(actions)
+        self._quantities.extend(quantities)
+        self._prices.extend(prices)
+        self._commissions.extend(commissions)
+        if len(self._tickers) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._tickers:
+            return
+        self._write({
+            'timestamp': self._times, 'ticker': self._tickers, 'action': self._actions,
+            'quantity': self._quantities, 'price': self._prices, 'commission': self._commissions
+        })
+        self.n_rows += len(self._tickers)
+        self._reset()
+
+    def close(self):
+        self.flush()
+
+    def get_state(self):
+        """
+        The extent of the log, for a Checkpoint; the buffered fills
+        are written first.
+        """
+        self.flush()
+        return {'n_rows': self.n_rows}
+
+    def set_state(self, state):
+        """
+        Cuts the log back to its extent at a get_state(), dropping
+        the fills written since, e.g. by the run that failed after
+        the checkpoint a session is resumed from.
+        """
+        self._reset()
+        self._truncate(state)
+        self.n_rows = state['n_rows']
+
+    def _write(self, columns):
+        raise NotImplementedError("Should implement _write()")
+
+    def _truncate(self, state):
+        raise NotImplementedError("Should implement _truncate()")
+
+
+class CsvTradeLog(TradeLog):
+    """
+    TradeLog in the CSV format of the Output/tradelog_*.csv files.
+    Appends to an existing log rather than overwriting it.
+    """
+    def __init__(self, path, chunk_size=10000, exchange='ARCA'):
+        TradeLog.__init__(self, path, chunk_size, exchange)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerow(COLUMNS)
+
+    def _write(self, columns):
+        times = pd.DatetimeIndex(columns['timestamp']).strftime('%Y-%m-%d %H:%M:%S')
+        rows  = zip(times, columns['ticker'], columns['action'], columns['quantity'],
+                    [self.exchange] * len(times), columns['price'], columns['commission'])
+        with open(self.path, 'a', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+    def get_state(self):
+        state = TradeLog.get_state(self)
+        state['offset'] = os.path.getsize(self.path)
+        return state
+
+    def _truncate(self, state):
+        with open(self.path, 'r+b') as f:
+            f.truncate(state['offset'])
+
+
+class BinaryTradeLog(TradeLog):
+    """
+    TradeLog stored column by column as raw binary files, in the
+    manner of MemmapStore, so that a log of millions of fills is
+    read back with np.memmap instead of being parsed.
+
+    Layout of the log directory:
+    meta.json - The ticker and exchange tables and the number of rows.
+    timestamp.i8 - int64 nanosecond timestamps.
+    ticker.i4, exchange.i4 - int32 codes into the tables of meta.json.
+    action.i1 - 0 for BOT, 1 for SLD.
+    quantity.f8, price.f8, commission.f8 - float64 values.
+
+    Opening an existing log cuts every column file back to the rows
+    counted in meta.json, dropping the torn records of a run that
+    crashed while writing, before anything is appended.
+    """
+    META    = 'meta.json'
+    DTYPES  = [
+        ('timestamp', np.int64), ('ticker', np.int32), ('action', np.int8), ('quantity', np.float64),
+        ('exchange', np.int32), ('price', np.float64), ('commission', np.float64)
+    ]
+
+    def __init__(self, path, chunk_size=10000, exchange='ARCA'):
+        TradeLog.__init__(self, path, chunk_size, exchange)
+        if os.path.exists(os.path.join(path, self.META)):
+            meta = _read_meta(path)
+            self._truncate_columns(meta['n_rows'])
+        else:
+            if not os.path.exists(path):
+                os.makedirs(path)
+            for column, dtype in self.DTYPES:
+                open(_column_file(path, column, dtype), 'wb').close()
+            meta = {'tickers': [], 'exchanges': [], 'n_rows': 0}
+        self.tickers    = meta['tickers']
+        self.exchanges  = meta['exchanges']
+        self.n_rows     = meta['n_rows']
+        self._codes     = {ticker: i for i, ticker in enumerate(self.tickers)}
+        if exchange not in self.exchanges:
+            self.exchanges.append(exchange)
+        self._exchange_code = self.exchanges.index(exchange)
+
+    def _code(self, ticker):
+        code = self._codes.get(ticker)
+        if code is None:
+            code = self._codes[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return code
+
+    def _write(self, columns):
+        n       = len(columns['ticker'])
+        arrays  = {
+            'timestamp': np.asarray(pd.DatetimeIndex(columns['timestamp']).values,
+                                    dtype='datetime64[ns]').view(np.int64),
+            'ticker': [self._code(ticker) for ticker in columns['ticker']],
+            'action': np.asarray(columns['action']) == ACTIONS[1],
+            'quantity': columns['quantity'],
+            'exchange': np.full(n, self._exchange_code),
+            'price': columns['price'],
+            'commission': columns['commission']
+        }
+        for column, dtype in self.DTYPES:
+            with open(_column_file(self.path, column, dtype), 'ab') as f:
+                f.write(np.asarray(arrays[column], dtype=dtype).tobytes())
+
+        # replaced last and atomically, so readers never see a row
+        # count ahead of the column files
+        self._write_meta(self.n_rows + n)
+
+    def _truncate(self, state):
+        # the row count goes down first, so the log is never longer
+        # than its column files
+        self._write_meta(state['n_rows'])
+        self._truncate_columns(state['n_rows'])
+
+    def _truncate_columns(self, n_rows):
+        for column, dtype in self.DTYPES:
+            with open(_column_file(self.path, column, dtype), 'r+b') as f:
+                f.truncate(n_rows * np.dtype(dtype).itemsize)
+
+    def _write_meta(self, n_rows):
+        tmp = os.path.join(self.path, self.META + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'tickers': self.tickers, 'exchanges': self.exchanges, 'n_rows': n_rows}, f)
+        os.replace(tmp, os.path.join(self.path, self.META))
+
+
+def _column_file(path, column, dtype):
+    return os.path.join(path, '%s.%s%d' % (column, np.dtype(dtype).kind, np.dtype(dtype).itemsize))
+
+
+def _read_meta(path):
+    with open(os.path.join(path, BinaryTradeLog.META)) as f:
+        return json.load(f)
+
+
+def read_trade_log(path, chunk_size=100000):
+    """
+    Streams a trade log back as DataFrames of at most chunk_size
+    rows with the columns of COLUMNS, so a log larger than memory
+    can be analysed chunk by chunk. A directory is read as a
+    BinaryTradeLog, a file as a CsvTradeLog.
+    """
+    if not os.path.isdir(path):
+        for chunk in pd.read_csv(path, parse_dates=['timestamp'], chunksize=chunk_size):
+            yield chunk
+        return
+
+    meta        = _read_meta(path)
+    n_rows      = meta['n_rows']
+    tickers     = np.array(meta['tickers'], dtype=object)
+    exchanges   = np.array(meta['exchanges'], dtype=object)
+    actions     = np.array(ACTIONS, dtype=object)
+    if n_rows == 0:
+        return
+    maps = {
+        column: np.memmap(_column_file(path, column, dtype), dtype=dtype, mode='r', shape=(n_rows,))
+        for column, dtype in BinaryTradeLog.DTYPES
+    }
+    for start in range(0, n_rows, chunk_size):
+        rows = slice(start, min(start + chunk_size, n_rows))
+        yield pd.DataFrame({
+            'timestamp': pd.DatetimeIndex(np.asarray(maps['timestamp'][rows]).view('datetime64[ns]')),
+            'ticker': tickers[maps['ticker'][rows]],
+            'action': actions[maps['action'][rows]],
+            'quantity': np.asarray(maps['quantity'][rows]),
+            'exchange': exchanges[maps['exchange'][rows]],
+            'price': np.asarray(maps['price'][rows]),
+            'commission': np.asarray(maps['commission'][rows])
+        }, index=pd.RangeIndex(rows.start, rows.stop), columns=COLUMNS)
+
+
+if __name__ == "__main__":
+    import shutil
+    import tempfile
+    import time
+
+    path    = tempfile.mkdtemp()
+    n       = 1000000
+    times   = pd.date_range('2000-01-03', periods=n // 100, freq='B')
+    tickers = ['T%d' % i for i in range(100)]
+    try:
+        for log in [CsvTradeLog(os.path.join(path, 'tradelog.csv')), BinaryTradeLog(os.path.join(path, 'tradelog'))]:
+            start = time.time()
+            with log:
+                for t in times:
+                    log.add_fills(t, tickers, ['BOT'] * 100, [100] * 100, [10.0] * 100, [1.0] * 100)
+            written = time.time() - start
+            start   = time.time()
+            rows    = sum(len(chunk) for chunk in read_trade_log(log.path))
+            print("%-14s %d fills written in %0.2fs, read in %0.2fs" % (
+                type(log).__name__, rows, written, time.time() - start))
+    finally:
+        shutil.rmtree(path)
@@ -0,0 +1,216 @@
+import numpy as np
+import pandas as pd
+
+
+class TradingCalendar(object):
+    """
+    Rebalance schedules over the bars of a PriceHandler, computed
+    once as boolean masks so that a strategy tests its schedule by
+    bar index in O(1) instead of doing date arithmetic every bar.
+
+    The period ends are the last *trading* day of each week, month,
+    quarter and year: a month ending on a weekend or a holiday ends
+    on the trading day before. Holidays stay in the index, as the
+    'B' frequency of the PriceHandler keeps them, but are never
+    trading days.
+
+    Parameters:
+    timestamp - The DatetimeIndex of the bars.
+    holidays - Exchange holidays, as dates or the path of a file
+        read by load_holidays.
+    """
+    PERIODS = ['week', 'month', 'quarter', 'year']
+    ALIASES = {'W': 'week', 'M': 'month', 'Q': 'quarter', 'A': 'year', 'Y': 'year'}
+
+    def __init__(self, timestamp, holidays=None):
+        if isinstance(holidays, str):
+            holidays = load_holidays(holidays)
+        self.holidays   = pd.DatetimeIndex(holidays if holidays is not None else []).normalize()
+        self.timestamp  = pd.DatetimeIndex([])
+        self._offset    = pd.offsets.CustomBusinessDay(holidays=list(self.holidays))
+
+        # the masks are views of buffers with spare rows, so that
+        # extend() appends bars in amortised O(new bars)
+        self._capacity  = 0
+        self._buffers   = {}
+        self._masks     = {}
+        self._trading   = np.zeros(0, dtype=np.intp)
+        self._n_trading = 0
+        for key in ['trading'] + self.PERIODS:
+            self._buffers[key] = np.zeros(0, dtype=bool)
+        self.extend(timestamp)
+
+    @property
+    def trading(self):
+        return self._masks['trading']
+
+    @property
+    def week_end(self):
+        return self._masks['week']
+
+    @property
+    def month_end(self):
+        return self._masks['month']
+
+    @property
+    def quarter_end(self):
+        return self._masks['quarter']
+
+    @property
+    def year_end(self):
+        return self._masks['year']
+
+    def extend(self, timestamp):
+        """
+        Adds the bars of timestamp past the ones of the calendar;
+        timestamp is the whole index, starting with self.timestamp.
+
+        A period end only depends on the next trading day, so only
+        the last trading bar already known and the new bars are
+        computed.
+        """
+        timestamp   = pd.DatetimeIndex(timestamp)
+        n, m        = len(self.timestamp), len(timestamp)
+        if m < n:
+            raise ValueError("A calendar can only be extended with new bars")
+        if m > self._capacity:
+            self._grow(m)
+        self.timestamp = timestamp
+
+        days        = timestamp[n:].normalize()
+        trading     = (days.dayofweek < 5) & ~days.isin(self.holidays)
+        new_rows    = n + np.flatnonzero(trading)
+        first       = self._n_trading
+        for buffer in self._buffers.values():
+            buffer[n:m] = False
+        self._buffers['trading'][n:m] = trading
+        self._append_trading(new_rows)
+
+        # the period ends of the last known trading bar and the new ones
+        rows = self._trading[max(first - 1, 0):self._n_trading]
+        if len(rows):
+            trading_days    = timestamp[rows].normalize()
+            next_days       = trading_days[1:].append(pd.DatetimeIndex([self._next_trading_day(trading_days[-1])]))
+            for period in self.PERIODS:
+                self._buffers[period][rows] = _period_key(trading_days, period) != _period_key(next_days, period)
+
+        for key in self._buffers:
+            if isinstance(key, tuple):
+                self._flag_every(key, first)
+        for key, buffer in self._buffers.items():
+            self._masks[key] = buffer[:m]
+
+    def every(self, n, offset=0):
+        """
+        Mask of every n-th trading day, starting from trading day
+        number offset.
+        """
+        key = ('every', n, offset)
+        if key not in self._masks:
+            self._buffers[key] = np.zeros(self._capacity, dtype=bool)
+            self._flag_every(key, 0)
+            self._masks[key] = self._buffers[key][:len(self.timestamp)]
+        return self._masks[key]
+
+    def _flag_every(self, key, first):
+        # flags the trading bars numbered first and above
+        _, n, offset    = key
+        numbers         = np.arange(first, self._n_trading)
+        hits            = numbers[(numbers >= offset) & ((numbers - offset) % n == 0)]
+        self._buffers[key][self._trading[hits]] = True
+
+    def _append_trading(self, rows):
+        count = self._n_trading + len(rows)
+        if count > len(self._trading):
+            trading = np.zeros(max(2 * len(self._trading), count), dtype=np.intp)
+            trading[:self._n_trading] = self._trading[:self._n_trading]
+            self._trading = trading
+        self._trading[self._n_trading:count] = rows
+        self._n_trading = count
+
+    def _grow(self, rows):
+        capacity = max(2 * self._capacity, rows)
+        for key, buffer in self._buffers.items():
+            grown = np.zeros(capacity, dtype=bool)
+            grown[:len(self.timestamp)] = buffer[:len(self.timestamp)]
+            self._buffers[key] = grown
+        self._capacity = capacity
+
+    def get_mask(self, schedule):
+        """
+        The mask of a schedule: 'week', 'month', 'quarter' or 'year'
+        (or 'W', 'M', 'Q', 'A'), an integer n for every n trading
+        days, or a boolean mask that is returned as it is.
+        """
+        if isinstance(schedule, (int, np.integer)):
+            return self.every(int(schedule))
+        if isinstance(schedule, str):
+            period = self.ALIASES.get(schedule, schedule)
+            if period not in self.PERIODS:
+                raise ValueError("Unknown rebalance schedule '%s'" % schedule)
+            return self._masks[period]
+        mask = np.asarray(schedule, dtype=bool)
+        if len(mask) != len(self.timestamp):
+            raise ValueError("A rebalance mask needs one flag per bar")
+        return mask
+
+    def is_trading_day(self, idx):
+        return self.trading[idx]
+
+    def get_dates(self, schedule):
+        """
+        The timestamps flagged by a schedule.
+        """
+        return self.timestamp[self.get_mask(schedule)]
+
+    def _next_trading_day(self, day):
+        return day + self._offset
+
+
+def _period_key(days, period):
+    """
+    An integer identifying the week, month, quarter or year of
+    each day.
+    """
+    if period == 'week':
+        # days since the epoch of the Monday of the week
+        return (days.values.astype('datetime64[D]').astype(np.int64) - days.dayofweek.values)
+    if period == 'month':
+        return days.year.values * 12 + days.month.values
+    if period == 'quarter':
+        return days.year.values * 4 + days.quarter.values
+    return days.year.values
+
+
+def load_holidays(path):
+    """
+    Reads exchange holidays from a file with one date per line, or
+    a CSV file whose first column holds the dates. Blank lines and
+    lines starting with '#' are skipped, as is a header line.
+    """
+    dates = []
+    with open(path) as f:
+        for line in f:
+            field = line.split('#', 1)[0].split(',', 1)[0].strip()
+            if not field:
+                continue
+            try:
+                dates.append(pd.Timestamp(field))
+            except ValueError:
+                if dates:
+                    raise
+    return pd.DatetimeIndex(dates)
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), 'holidays.csv')
+    with open(path, 'w') as f:
+        f.write("date,name\n2015-01-01,New Year's Day\n2015-04-03,Good Friday\n2015-12-25,Christmas\n")
+
+    cal = TradingCalendar(pd.date_range('2015-01-01', '2015-12-31', freq='B'), path)
+    print("month ends:  ", [str(day.date()) for day in cal.get_dates('month')])
+    print("quarter ends:", [str(day.date()) for day in cal.get_dates('quarter')])
+    print("every 20:    ", [str(day.date()) for day in cal.get_dates(20)])
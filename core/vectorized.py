@@ -0,0 +1,301 @@
+import numpy as np
+import pandas as pd
+
+from core.portfolio_handler import PortfolioHandler
+
+
+class VectorizedBacktest(object):
+    """
+    Backtests target-weight strategies in bulk NumPy operations
+    instead of through the event loop.
+
+    At every rebalance the orders are sized as ConstantPositionSizer
+    does, from the equity and weights of the portfolio marked at
+    that bar, filled at the same price with the commission of
+    SimulationExecutionHandler.calculate_commission. Between
+    rebalances the holdings are constant, so the equity of a whole
+    stretch of bars is one matrix product.
+
+    Missing prices are handled as in the event loop: a ticker with a
+    NaN price, e.g. before it is listed, gets no order, and a flat
+    position is worth nothing whatever its price.
+
+    Parameters:
+    timestamp - The DatetimeIndex of the price rows.
+    tickers - The tickers of the price columns, in order.
+    prices - The (timestamps x tickers) fill and valuation prices,
+        the adjusted closes in the event-driven backtest.
+    initial_cash - The starting cash.
+    commission - Whether to charge the Interactive Brokers commission.
+    """
+    def __init__(self, timestamp, tickers, prices, initial_cash, commission=True):
+        self.timestamp      = pd.DatetimeIndex(timestamp)
+        self.tickers        = list(tickers)
+        self.prices         = np.asarray(prices, dtype=np.float64)
+        self.initial_cash   = initial_cash
+        self.commission     = commission
+
+    @classmethod
+    def from_price_handler(cls, price_handler, initial_cash, tickers=None, commission=True):
+        """
+        Builds the engine on the adjusted closes of a PriceHandler.
+        """
+        if price_handler.adj_close is None:
+            price_handler._get_initial_data()
+        tickers = list(price_handler.init_tickers if tickers is None else tickers)
+        columns = price_handler.get_ticker_columns(tickers)
+        return cls(price_handler.timestamp, tickers, price_handler.adj_close[:, columns],
+                   initial_cash, commission)
+
+    def run(self, target_weights):
+        """
+        Backtests one target-weight schedule.
+
+        Parameters:
+        target_weights - A DataFrame indexed by rebalance timestamp
+            with a column per ticker. NaN means no order for the
+            ticker at that rebalance, as when a strategy leaves it
+            out of its WeightEventPool.
+
+        Returns a dictionary of DataFrames: 'statistics' (equity and
+        cash per timestamp), 'quantities' (net shares per timestamp)
+        and 'fills' (quantity, price and commission per rebalance
+        and ticker, signed quantities with sells negative).
+        """
+        rows    = self._rows(target_weights.index)
+        weights = target_weights.reindex(columns=self.tickers).values.astype(np.float64)
+        result  = self._simulate(rows, weights[np.newaxis])
+
+        times   = self.timestamp[rows]
+        fills   = pd.concat({
+            'quantity': pd.DataFrame(result['fill_quantities'][0], times, self.tickers),
+            'price': pd.DataFrame(self.prices[rows], times, self.tickers),
+            'commission': pd.DataFrame(result['commissions'][0], times, self.tickers)
+        }, axis=1)
+        net     = self._expand(rows, result['net'])[:, 0]
+        return {
+            'statistics': pd.DataFrame({'equity': result['equity'][:, 0], 'cash': self._expand(rows, result['cash'])[:, 0]},
+                                       index=self.timestamp, columns=['equity', 'cash']),
+            'quantities': pd.DataFrame(net, self.timestamp, self.tickers),
+            'fills': fills
+        }
+
+    def run_batch(self, rebalance_times, weights):
+        """
+        Backtests many target-weight schedules sharing the same
+        rebalance timestamps at once.
+
+        Parameters:
+        rebalance_times - The rebalance timestamps.
+        weights - A (configs x tickers) array of weights targeted
+            at every rebalance, or (configs x rebalances x tickers)
+            for weights that change over time.
+
+        Returns a DataFrame of equity, one column per configuration.
+        """
+        rows    = self._rows(rebalance_times)
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim == 2:
+            weights = np.repeat(weights[:, np.newaxis, :], len(rows), axis=1)
+        result  = self._simulate(rows, weights)
+        return pd.DataFrame(result['equity'], index=self.timestamp)
+
+    def _rows(self, times):
+        rows = self.timestamp.get_indexer(pd.DatetimeIndex(times))
+        if (rows < 0).any():
+            raise ValueError("Rebalance timestamps not in the price index: %s"
+                             % list(pd.DatetimeIndex(times)[rows < 0]))
+        return rows
+
+    def _simulate(self, rows, weights):
+        """
+        Runs (configs x rebalances x tickers) weights over the
+        rebalance rows, looping over rebalances only.
+        """
+        n_configs   = weights.shape[0]
+        n_tickers   = len(self.tickers)
+        cash        = np.full(n_configs, float(self.initial_cash))
+        net         = np.zeros((n_configs, n_tickers))
+
+        cash_after      = np.empty((len(rows), n_configs))
+        net_after       = np.empty((len(rows), n_configs, n_tickers))
+        fill_quantities = np.zeros((n_configs, len(rows), n_tickers))
+        commissions     = np.zeros((n_configs, len(rows), n_tickers))
+
+        for k, row in enumerate(rows):
+            price   = self.prices[row]
+            value   = _market_value(net, price)
+            equity  = cash + value.sum(axis=1)
+
+            # ConstantPositionSizer: floor((target - current weight) * equity / price)
+            current = value / equity[:, np.newaxis]
+            dollars = (weights[:, k] - current) * equity[:, np.newaxis]
+            with np.errstate(invalid='ignore'):
+                quantity = np.floor(dollars / price)
+            quantity[~np.isfinite(quantity)] = 0.0
+
+            traded      = quantity != 0
+            commission  = self._commissions(np.abs(quantity), price) if self.commission else np.zeros_like(quantity)
+            cash        = cash - np.where(traded, quantity * price + commission, 0.0).sum(axis=1)
+            net         = net + quantity
+
+            cash_after[k]           = cash
+            net_after[k]            = net
+            fill_quantities[:, k]   = quantity
+            commissions[:, k]       = commission
+
+        return {
+            'equity': self._equity(rows, cash_after, net_after),
+            'cash': cash_after,
+            'net': net_after,
+            'fill_quantities': fill_quantities,
+            'commissions': commissions
+        }
+
+    def _commissions(self, quantity, price):
+        """
+        SimulationExecutionHandler.calculate_commission element-wise;
+        no order costs nothing.
+        """
+        commission = np.minimum(0.5 * price * quantity, np.maximum(1.0, 0.005 * quantity))
+        return np.where(quantity > 0, commission, 0.0)
+
+    def _equity(self, rows, cash_after, net_after):
+        """
+        Equity per timestamp and configuration: the initial cash
+        before the first rebalance, then cash plus holdings valued
+        one stretch of constant holdings at a time.
+        """
+        equity  = np.full((len(self.timestamp), cash_after.shape[1]), float(self.initial_cash))
+        bounds  = list(rows) + [len(self.timestamp)]
+        for k in range(len(rows)):
+            stretch = slice(bounds[k], bounds[k + 1])
+            # tickers no configuration holds are worth nothing, priced or not
+            held    = (net_after[k] != 0).any(axis=0)
+            prices  = np.where(held, self.prices[stretch], 0.0)
+            equity[stretch] = cash_after[k] + prices.dot(net_after[k].T)
+        return equity
+
+    def _expand(self, rows, after):
+        """
+        Repeats the state after each rebalance over the timestamps
+        until the next one, and the initial state before the first.
+        """
+        k = np.searchsorted(rows, np.arange(len(self.timestamp)), side='right') - 1
+        if after.ndim == 2:
+            initial = np.full((1,) + after.shape[1:], float(self.initial_cash))
+        else:
+            initial = np.zeros((1,) + after.shape[1:])
+        return np.concatenate([initial, after])[k + 1]
+
+
+def _market_value(net, price):
+    """
+    The value of net shares at price, zero for a flat position even
+    where the price is NaN, as Position.update_market_value.
+    """
+    return np.where(net != 0, net * price, 0.0)
+
+
+class _RecordingStrategy(object):
+    """
+    Passes signals through from a strategy, keeping a copy of every
+    WeightEventPool so the schedule can be replayed.
+    """
+    def __init__(self, strategy):
+        self.strategy   = strategy
+        self.schedule   = []
+
+    def initialize(self, portfolio_handler):
+        self.strategy.initialize(portfolio_handler)
+
+    def calculate_signals(self, event):
+        weight_events = self.strategy.calculate_signals(event)
+        if weight_events is not None:
+            self.schedule.append((weight_events.time, weight_events.get_weights()))
+        return weight_events
+
+
+def cross_check(
+    price_handler, strategy, initial_cash,
+    position_sizer, execution_handler,
+    start_time=None, tolerance=0.005
+):
+    """
+    Runs a strategy through the event-driven PortfolioHandler loop
+    and replays the target weights it emitted through the
+    VectorizedBacktest, comparing equity, cash and quantities bar
+    by bar. Tickers listed after the start are not traded and add
+    nothing to equity until they have a price, in both engines.
+
+    Parameters:
+    price_handler - A PriceHandler that has not been run yet.
+    strategy - A target-weight strategy.
+    initial_cash - The starting cash.
+    position_sizer - A ConstantPositionSizer.
+    execution_handler - A SimulationExecutionHandler.
+    start_time - The first timestamp, the first price row by default.
+    tolerance - The largest difference in equity and cash allowed, in
+        currency units; quantities must match exactly.
+
+    Returns a dictionary with 'match', the largest differences found,
+    and both sets of results.
+    """
+    if price_handler.adj_close is None:
+        price_handler._get_initial_data()
+    if start_time is None:
+        start_time = price_handler.timestamp[0]
+
+    tickers     = list(price_handler.init_tickers)
+    recorder    = _RecordingStrategy(strategy)
+    handler     = PortfolioHandler(
+        tickers, initial_cash, None, price_handler, position_sizer, None,
+        execution_handler, recorder, None, start_time
+    )
+    handler.initialize_parameters()
+    handler.run_session()
+
+    times, weights  = zip(*recorder.schedule) if recorder.schedule else ((), ())
+    schedule        = pd.DataFrame(list(weights), index=pd.DatetimeIndex(times), columns=tickers)
+    engine          = VectorizedBacktest.from_price_handler(price_handler, initial_cash, tickers)
+    vectorized      = engine.run(schedule)
+
+    event_stats     = handler.portfolio.statistics
+    event_qty       = handler.portfolio.quantities[tickers]
+    vector_stats    = vectorized['statistics'].reindex(event_stats.index)
+    vector_qty      = vectorized['quantities'].reindex(event_qty.index)
+
+    equity_diff     = (event_stats['equity'] - vector_stats['equity']).abs().max()
+    cash_diff       = (event_stats['cash'] - vector_stats['cash']).abs().max()
+    quantity_diff   = (event_qty - vector_qty).abs().values.max() if len(event_qty) else 0.0
+    return {
+        'match': bool(equity_diff <= tolerance and cash_diff <= tolerance and quantity_diff == 0),
+        'max_equity_diff': equity_diff,
+        'max_cash_diff': cash_diff,
+        'max_quantity_diff': quantity_diff,
+        'event_driven': {'statistics': event_stats, 'quantities': event_qty},
+        'vectorized': vectorized
+    }
+
+
+if __name__ == "__main__":
+    import datetime
+    import time
+
+    from constant_position_sizer import ConstantPositionSizer
+    from core.excution_handler import SimulationExecutionHandler
+    from core.price_handler import CsvPriceHandler
+    from strategy.constant_mix_strategy import ConstantMixStrategy
+
+    tickers = ['SPY', 'AGG']
+    ph = CsvPriceHandler(tickers, datetime.datetime(2006, 11, 1), datetime.datetime(2015, 12, 31))
+    report = cross_check(ph, ConstantMixStrategy({'SPY': 0.6, 'AGG': 0.4}), 100000.0,
+                         ConstantPositionSizer(), SimulationExecutionHandler())
+    print("match: %s, max equity difference %0.6f" % (report['match'], report['max_equity_diff']))
+
+    engine      = VectorizedBacktest.from_price_handler(ph, 100000.0)
+    month_ends  = ph.get_calendar().get_dates('month')
+    mixes       = np.linspace(0, 1, 10001)
+    start       = time.time()
+    equity      = engine.run_batch(month_ends, np.column_stack([mixes, 1 - mixes]))
+    print("%d allocations in %0.2fs" % (len(mixes), time.time() - start))
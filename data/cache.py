@@ -0,0 +1,231 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data.base_api import AbstractData
+from data.data_factory import DataFactory
+
+# local time after which the day's bars are taken as published
+SESSION_CLOSE = datetime.time(16, 0)
+
+
+class DataCache(object):
+    """
+    On-disk store of vendor history, one directory per vendor and
+    ticker under cache_dir. Each column is kept as its own .npy
+    file next to the date index, and meta.json records the column
+    names and the date range the vendor has already been asked for.
+
+    A save writes the files into a new directory that then replaces
+    the ticker's directory, so an interrupted save, first or not,
+    leaves the previous cache intact.
+    """
+    META = 'meta.json'
+    INDEX = 'index.npy'
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def path(self, vendor, ticker):
+        return os.path.join(self.cache_dir, vendor, ticker)
+
+    def load(self, vendor, ticker):
+        """
+        Returns (data, start_date, end_date) for a cached ticker,
+        or None if nothing is cached yet.
+        """
+        path = self.path(vendor, ticker)
+        meta_file = os.path.join(path, self.META)
+        if not os.path.exists(meta_file):
+            return None
+
+        with open(meta_file) as f:
+            meta = json.load(f)
+        index = pd.DatetimeIndex(np.load(os.path.join(path, self.INDEX)))
+        data = pd.DataFrame(
+            {column: np.load(os.path.join(path, 'col_%d.npy' % i), allow_pickle=True)
+             for i, column in enumerate(meta['columns'])},
+            index=index, columns=meta['columns']
+        )
+        return data, pd.Timestamp(meta['start']), pd.Timestamp(meta['end'])
+
+    def save(self, vendor, ticker, data, start_date, end_date):
+        path    = self.path(vendor, ticker)
+        parent  = os.path.dirname(path)
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+
+        tmp = tempfile.mkdtemp(prefix='.%s.' % ticker, dir=parent)
+        try:
+            np.save(os.path.join(tmp, self.INDEX), np.asarray(data.index.values, dtype='datetime64[ns]'))
+            for i, column in enumerate(data.columns):
+                values = np.asarray(data[column].values)
+                np.save(os.path.join(tmp, 'col_%d.npy' % i), values, allow_pickle=values.dtype == object)
+            meta = {
+                'columns': [str(column) for column in data.columns],
+                'start': pd.Timestamp(start_date).isoformat(),
+                'end': pd.Timestamp(end_date).isoformat()
+            }
+            with open(os.path.join(tmp, self.META), 'w') as f:
+                json.dump(meta, f)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+        # a directory cannot replace a non-empty one, so the old one
+        # is moved aside first; in between the ticker is not cached
+        old = None
+        if os.path.exists(path):
+            old = tmp + '.old'
+            os.rename(path, old)
+        os.rename(tmp, path)
+        if old is not None:
+            shutil.rmtree(old)
+
+    def invalidate(self, vendor=None, ticker=None):
+        """
+        Drops the cached history of one ticker, of a whole vendor,
+        or of everything when called without arguments.
+        """
+        if vendor is None:
+            path = self.cache_dir
+        elif ticker is None:
+            path = os.path.join(self.cache_dir, vendor)
+        else:
+            path = self.path(vendor, ticker)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+
+class CachedData(AbstractData):
+    """
+    Wraps a vendor so that every ticker is downloaded at most once
+    per date: a request inside the cached range is served from disk
+    and a request reaching outside it only fetches the missing
+    head and tail of the range.
+
+    A list of tickers is returned as one wide frame whose columns
+    are named '<ticker>-<field>', e.g. 'AAPL-Adj Close', which is
+    the layout PriceHandler reads.
+
+    Only sessions that have closed count as covered: a fetched range
+    is covered up to the last completed session at most. Days asked
+    for ahead of time, e.g. today before the close, are fetched
+    again by the next request reaching them, and their new rows
+    replace the cached ones.
+    """
+    def __init__(self, vendor, vendor_name, cache):
+        self.vendor         = vendor
+        self.vendor_name    = vendor_name
+        self.cache          = cache
+
+    def get_data(self, ticker, start_date, end_date):
+        if type(ticker) == list:
+            frames = [self._get_ticker(t, start_date, end_date) for t in ticker]
+            for t, frame in zip(ticker, frames):
+                frame.columns = ['%s-%s' % (t, column) for column in frame.columns]
+            data = pd.concat(frames, axis=1)
+        else:
+            data = self._get_ticker(ticker, start_date, end_date)
+        return data
+
+    def _get_ticker(self, ticker, start_date, end_date):
+        start_date  = pd.Timestamp(start_date)
+        end_date    = pd.Timestamp(end_date)
+        one_day     = datetime.timedelta(days=1)
+
+        cached = self.cache.load(self.vendor_name, ticker)
+        if cached is None:
+            pieces  = []
+            missing = [(start_date, end_date)]
+            covered = (start_date, start_date - one_day)
+        else:
+            data, cached_start, cached_end = cached
+            pieces  = [data]
+            missing = []
+            # the fetched ranges always join up with the cached one,
+            # so the covered range stays a single interval
+            if start_date < cached_start:
+                missing.append((start_date, cached_start - one_day))
+            if end_date > cached_end:
+                missing.append((cached_end + one_day, end_date))
+            covered = (cached_start, cached_end)
+
+        if missing:
+            settled = _last_session()
+            for start, end in missing:
+                piece = self.vendor.get_data(ticker, start, end)
+                pieces.append(piece)
+                # only the sessions that have closed are final
+                end = min(end, settled)
+                if end >= start:
+                    covered = (min(covered[0], start), max(covered[1], end))
+            data = pd.concat(pieces)
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+            self.cache.save(self.vendor_name, ticker, data, covered[0], covered[1])
+
+        return data.loc[start_date:end_date].copy()
+
+
+def _last_session(now=None):
+    """
+    The last weekday whose session has closed, at midnight.
+    """
+    now = pd.Timestamp(now if now is not None else datetime.datetime.now())
+    day = now.normalize()
+    if now.time() < SESSION_CLOSE:
+        day -= pd.Timedelta(days=1)
+    return pd.offsets.BDay().rollback(day)
+
+
+class CachedDataFactory(DataFactory):
+    """
+    DataFactory whose vendors read through a DataCache.
+
+    Parameters:
+    cache_dir - The root directory of the cache.
+    factory - The factory providing the underlying vendors,
+        DataFactory() by default.
+    """
+    def __init__(self, cache_dir, factory=None):
+        self.cache      = DataCache(cache_dir)
+        self.factory    = factory if factory is not None else DataFactory()
+
+    def get(self, vendor):
+        data = self.factory.get(vendor)
+        if data is None:
+            return None
+        return CachedData(data, vendor, self.cache)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    class FakeData(AbstractData):
+        def __init__(self):
+            self.calls = []
+
+        def get_data(self, ticker, start_date, end_date):
+            self.calls.append((ticker, start_date, end_date))
+            index = pd.date_range(start_date, end_date, freq='B')
+            return pd.DataFrame({'Close': np.arange(len(index), dtype=float)}, index=index)
+
+    class FakeFactory(object):
+        def __init__(self):
+            self.vendor = FakeData()
+
+        def get(self, vendor):
+            return self.vendor
+
+    fake = FakeFactory()
+    factory = CachedDataFactory(tempfile.mkdtemp(), fake)
+    vendor = factory.get('fake')
+    vendor.get_data(['AAPL', 'C'], '2016-01-01', '2016-03-01')
+    vendor.get_data(['AAPL', 'C'], '2016-01-15', '2016-02-15')
+    vendor.get_data(['AAPL', 'C'], '2016-01-01', '2016-04-01')
+    print(fake.vendor.calls)
@@ -0,0 +1,59 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.base_api import AbstractData
+from data.fetch import fetch_all
+
+DATA_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'DataStore')
+
+
+class CsvData(AbstractData):
+    """
+    Reads daily bars from <csv_dir>/<ticker>.csv files laid out as
+    Date,Open,High,Low,Close,Volume,Adj Close (the DataStore format,
+    in any date order).
+
+    A list of tickers is read concurrently and returned as one wide
+    frame on the union of their calendars, with columns named
+    '<ticker>-<field>', e.g. 'AAPL-Adj Close'.
+    """
+    COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close']
+    DTYPES  = {
+        'Open': np.float64, 'High': np.float64, 'Low': np.float64,
+        'Close': np.float64, 'Volume': np.int64, 'Adj Close': np.float64
+    }
+
+    def __init__(self, csv_dir=None, max_workers=8):
+        self.csv_dir        = csv_dir if csv_dir is not None else DATA_STORE
+        self.max_workers    = max_workers
+
+    def get_data(self, ticker, start_date, end_date):
+        if type(ticker) == list:
+            frames = fetch_all(lambda t: self._read(t, start_date, end_date), ticker,
+                               self.max_workers, retries=0)
+            for t, frame in zip(ticker, frames):
+                frame.columns = ['%s-%s' % (t, column) for column in frame.columns]
+            data = pd.concat(frames, axis=1).sort_index()
+        else:
+            data = self._read(ticker, start_date, end_date)
+        return data
+
+    def _read(self, ticker, start_date, end_date):
+        data = pd.read_csv(
+            os.path.join(self.csv_dir, '%s.csv' % ticker),
+            usecols=self.COLUMNS, dtype=self.DTYPES,
+            parse_dates=['Date'], index_col='Date'
+        )
+        data = data.sort_index()
+        return data.loc[start_date:end_date]
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.time()
+    d = CsvData().get_data(['AAPL', 'AGG', 'SPY'], '2000-01-01', '2017-01-01')
+    print(d.tail())
+    print("loaded %s rows in %0.3fs" % (len(d), time.time() - start))
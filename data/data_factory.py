@@ -1,10 +1,11 @@
 
 import datetime
 
+from data.csv_api import CsvData
 from data.google_api import GoogleData
 from data.quandl_api import QuandlData
+from data.get_data import merge_frames
 from data.yahoo_api import YahooData
-from utils import fillnan
 
 
 class DataFactory:
@@ -15,18 +16,21 @@ class DataFactory:
             return YahooData()
         elif vendor == 'google':
             return GoogleData()
+        elif vendor == 'csv':
+            return CsvData()
         else:
             return None
 
 
 class StockData(object):
-    def __init__(self,  vendor, tickers, fields = None):
-        self.vendor     = vendor
-        self.tickers    = tickers
-        self.properties = fields
+    def __init__(self,  vendor, tickers, fields = None, data_factory = None):
+        self.vendor         = vendor
+        self.tickers        = tickers
+        self.properties     = fields
+        self.data_factory   = data_factory
 
     def get_data(self,  start_date, end_date):
-        data_factory = DataFactory()
+        data_factory = self.data_factory if self.data_factory is not None else DataFactory()
         vendor = data_factory.get(self.vendor)
         data = vendor.get_data(self.tickers, start_date, end_date)
         return data
@@ -46,7 +50,7 @@ if __name__ == "__main__":
     s2 = StockData('yahoo', ['SPY'])
     d2 = s2.get_data(start_date, end_date)
 
-    d3 = d1.combine(d2, lambda a, b: fillnan(a, b))
+    d3 = merge_frames([d2, d1])
     print(d3)
     # a = q.get_data(['AAPL','C'], start_date, end_date)
     # b = y.get_data('AAPL', start_date, end_date)
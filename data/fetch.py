@@ -0,0 +1,73 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimiter(object):
+    """
+    Spaces out calls so that no more than rate of them start per
+    second, across all threads sharing the limiter.
+    """
+    def __init__(self, rate=None):
+        self.interval   = 1.0 / rate if rate else 0.0
+        self._next      = 0.0
+        self._lock      = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the next call may start and returns the time it
+        was allowed to start at.
+        """
+        if not self.interval:
+            return time.time()
+        with self._lock:
+            now         = time.time()
+            start       = max(now, self._next)
+            self._next  = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+        return start
+
+
+def retry_call(func, args=(), retries=3, backoff=0.5, limiter=None, exceptions=(Exception,)):
+    """
+    Calls func(*args), retrying up to retries more times when it
+    raises one of exceptions. The wait between attempts doubles
+    from backoff seconds and the last failure is re-raised.
+    """
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.wait()
+        try:
+            return func(*args)
+        except exceptions:
+            if attempt >= retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+            attempt += 1
+
+
+def fetch_all(func, keys, max_workers=8, retries=3, backoff=0.5, rate=None, limiter=None):
+    """
+    Calls func(key) for every key on a bounded thread pool and
+    returns the results as a list in the order of keys.
+
+    Parameters:
+    func - The per-key fetch, e.g. one vendor download per ticker.
+    keys - The keys to fetch.
+    max_workers - The number of concurrent calls.
+    retries - The number of retries of a failing call.
+    backoff - The initial wait in seconds before a retry.
+    rate - The maximum number of calls started per second, or None.
+    limiter - A RateLimiter shared with other fetches, used instead
+        of a new one for rate.
+    """
+    if limiter is None:
+        limiter = RateLimiter(rate)
+    if max_workers <= 1 or len(keys) <= 1:
+        return [retry_call(func, (key,), retries, backoff, limiter) for key in keys]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+        futures = [executor.submit(retry_call, func, (key,), retries, backoff, limiter) for key in keys]
+        return [future.result() for future in futures]
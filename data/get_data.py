@@ -1,11 +1,71 @@
-
+import numpy as np
+import pandas as pd
 
 
 def get_data_from_db(data, data_symbols, start_date, end_date):
-    for sym in data_symbols:
-        if data is None:
-            data = sym.get_data(start_date, end_date)
-        else:
-            data = data.combine_first(sym.get_data(start_date, end_date))
+    """
+    Downloads every StockData in data_symbols and merges the results,
+    together with any existing data, into one frame. Where several
+    sources have a value for the same cell the earliest one wins,
+    i.e. data first and then data_symbols in order.
+    """
+    frames = [] if data is None else [data]
+    frames += [sym.get_data(start_date, end_date) for sym in data_symbols]
+    return merge_frames(frames)
+
+
+def merge_frames(frames):
+    """
+    Merges frames onto the union of their indexes and columns in a
+    single allocation. Frames are given in priority order: a value
+    from an earlier frame is never overwritten, later frames only
+    fill cells that are still NaN. This is the result of folding
+    the frames with combine_first, without realigning the whole
+    accumulated frame once per frame.
+
+    The single float64 matrix only holds frames with numeric columns
+    and unique index and column labels; frames with any non-numeric
+    column, e.g. a vendor's text field, or duplicate labels are
+    merged by folding combine_first instead.
+    """
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 0:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    if not all(_is_float_mergeable(frame) for frame in frames):
+        merged = frames[0]
+        for frame in frames[1:]:
+            merged = merged.combine_first(frame)
+        return merged
+
+    index = frames[0].index
+    for frame in frames[1:]:
+        index = index.union(frame.index)
+    columns, seen = [], set()
+    for frame in frames:
+        for column in frame.columns:
+            if column not in seen:
+                seen.add(column)
+                columns.append(column)
+    columns = pd.Index(columns)
+
+    values = np.full((len(index), len(columns)), np.nan)
+    for frame in frames:
+        rows    = index.get_indexer(frame.index)
+        cols    = columns.get_indexer(frame.columns)
+        block   = values[np.ix_(rows, cols)]
+        source  = np.asarray(frame.values, dtype=np.float64)
+        fill    = np.isnan(block) & ~np.isnan(source)
+        block[fill] = source[fill]
+        values[np.ix_(rows, cols)] = block
+
+    return pd.DataFrame(values, index=index, columns=columns)
+
 
-    return data
\ No newline at end of file
+def _is_float_mergeable(frame):
+    return (
+        frame.index.is_unique and frame.columns.is_unique and
+        all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+            for dtype in frame.dtypes)
+    )
@@ -0,0 +1,146 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.csv_api import CsvData
+
+
+class MemmapStore(object):
+    """
+    Binary price store that backtests open with np.memmap, so that
+    startup does not parse anything and concurrent processes share
+    the same pages of the OS file cache.
+
+    Layout of the store directory:
+    meta.json - The tickers, the fields and the number of rows.
+    dates.i8 - One int64 nanosecond timestamp per row.
+    field_<k>.f8 - One float64 (rows x tickers) row-major array per
+        field, in the order of meta['fields'].
+
+    Rows are days, so appending new days only appends bytes to the
+    end of every file and never rewrites history. Price gaps are
+    forward filled when the rows are written; the volume of a gap
+    is zero, as nothing traded, like in PriceHandler, and NaN for
+    tickers whose data has no volume.
+    """
+    FIELDS  = ['Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close']
+    META    = 'meta.json'
+    DATES   = 'dates.i8'
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, self.META)) as f:
+            meta = json.load(f)
+        self.tickers    = meta['tickers']
+        self.fields     = meta['fields']
+        self.n_rows     = meta['n_rows']
+        self.ticker_idx = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def create(cls, path, tickers, fields=None):
+        """
+        Creates an empty store for a fixed universe of tickers.
+        """
+        fields = list(fields) if fields is not None else list(cls.FIELDS)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        for name in [cls.DATES] + ['field_%d.f8' % k for k in range(len(fields))]:
+            open(os.path.join(path, name), 'wb').close()
+        cls._write_meta(path, list(tickers), fields, 0)
+        return cls(path)
+
+    @classmethod
+    def from_csv(cls, path, tickers, csv_dir=None, start_date=None, end_date=None):
+        """
+        Builds a store from DataStore-format CSV files.
+        """
+        store = cls.create(path, tickers)
+        store.append(CsvData(csv_dir).get_data(list(tickers), start_date, end_date))
+        return store
+
+    @staticmethod
+    def _write_meta(path, tickers, fields, n_rows):
+        # written last and replaced atomically, so readers never see
+        # a row count ahead of the data files
+        tmp = os.path.join(path, MemmapStore.META + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'tickers': tickers, 'fields': fields, 'n_rows': n_rows}, f)
+        os.replace(tmp, os.path.join(path, MemmapStore.META))
+
+    def get_dates(self):
+        if self.n_rows == 0:
+            return pd.DatetimeIndex([])
+        dates = np.memmap(os.path.join(self.path, self.DATES), dtype=np.int64, mode='r', shape=(self.n_rows,))
+        return pd.DatetimeIndex(np.asarray(dates).view('datetime64[ns]'))
+
+    def get_field(self, field):
+        """
+        Returns a read-only (rows x tickers) memmap of one field.
+        """
+        k = self.fields.index(field)
+        if self.n_rows == 0:
+            return np.zeros((0, len(self.tickers)))
+        return np.memmap(os.path.join(self.path, 'field_%d.f8' % k), dtype=np.float64, mode='r',
+                         shape=(self.n_rows, len(self.tickers)))
+
+    def append(self, data):
+        """
+        Appends the days of a wide '<ticker>-<field>' frame, such as
+        CsvData or CachedData output, that are later than the last
+        stored day. The prices of tickers missing from the frame
+        are carried forward from the previous day.
+        """
+        unknown = set(c.rsplit('-', 1)[0] for c in data.columns if '-' in c) - set(self.ticker_idx)
+        if unknown:
+            raise ValueError("Tickers %s are not in the store, rebuild it to add tickers" % sorted(unknown))
+
+        dates = self.get_dates()
+        if len(dates):
+            data = data[data.index > dates[-1]]
+        data = data.sort_index()
+        if len(data) == 0:
+            return
+
+        blocks = []
+        for k, field in enumerate(self.fields):
+            columns = ['%s-%s' % (ticker, field) for ticker in self.tickers]
+            block   = np.array(data.reindex(columns=columns).values, dtype=np.float64)
+            if field == 'Volume':
+                known = np.array([column in data.columns for column in columns], dtype=bool)
+                block[:, known] = np.nan_to_num(block[:, known])
+                blocks.append(np.ascontiguousarray(block))
+                continue
+            if self.n_rows:
+                block = np.vstack([np.asarray(self.get_field(field)[-1:]), block])
+            block = pd.DataFrame(block).ffill().values[1 if self.n_rows else 0:]
+            blocks.append(np.ascontiguousarray(block))
+
+        index = np.asarray(pd.DatetimeIndex(data.index).values, dtype='datetime64[ns]').view(np.int64)
+        self._write_rows(self.DATES, index, 8)
+        for k, block in enumerate(blocks):
+            self._write_rows('field_%d.f8' % k, block, 8 * len(self.tickers))
+
+        self.n_rows += len(data)
+        self._write_meta(self.path, self.tickers, self.fields, self.n_rows)
+
+
+    def _write_rows(self, name, rows, row_size):
+        # written at the end of the rows counted in the meta, cutting
+        # off whatever an append that crashed before its meta update
+        # left behind, so the new rows stay aligned with the meta
+        offset = self.n_rows * row_size
+        with open(os.path.join(self.path, name), 'r+b') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(rows.tobytes())
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), 'store')
+    store = MemmapStore.from_csv(path, ['AAPL', 'SPY'], end_date='2015-12-31')
+    store.append(CsvData().get_data(['AAPL', 'SPY'], '2015-01-01', '2017-01-01'))
+    print(store.n_rows, store.get_dates()[-3:], store.get_field('Adj Close')[-3:])
@@ -2,12 +2,34 @@ import pandas as pd
 import quandl
 
 from data.base_api import AbstractData
+from data.fetch import RateLimiter, fetch_all
 
 auth_tok = '7rgk5sisbRwpDCDtUx9x'
 vendor   = 'WIKI'
 
 
 class QuandlData(AbstractData):
+    """
+    Downloads daily bars from Quandl. A list of tickers is fetched
+    concurrently on a bounded thread pool, retrying failed requests
+    with exponential backoff. Every request, of a single ticker or
+    of a list, and every retry goes through one rate limiter, so at
+    most rate requests start per second.
+
+    Parameters:
+    max_workers - The number of concurrent downloads.
+    retries - The number of retries of a failing download.
+    backoff - The initial wait in seconds before a retry.
+    rate - The maximum number of requests per second, or None.
+    fetch - The vendor call, quandl.get by default.
+    """
+    def __init__(self, max_workers=8, retries=3, backoff=0.5, rate=None, fetch=None):
+        self.max_workers    = max_workers
+        self.retries        = retries
+        self.backoff        = backoff
+        self.rate           = rate
+        self.fetch          = fetch if fetch is not None else quandl.get
+        self.limiter        = RateLimiter(rate)
 
     def _rename_columns(self,data):
         dict = {'Ex-Dividend': 'Ex Dividend',
@@ -33,14 +55,21 @@ class QuandlData(AbstractData):
     def get_data(self, ticker, start_date, end_date):
         if type(ticker) == list:
             print(" start to download ticker %s from quandl" % ticker)
-            d_dict = dict(zip(ticker,[quandl.get("%s/%s" % (vendor, t), trim_start=start_date, trim_end=end_date, authtoken=auth_tok) for t in ticker]))
+            d_dict = dict(zip(ticker, self._download(ticker, start_date, end_date)))
             data = pd.Panel.from_dict(d_dict, orient= 'Minor')
             print(" ticker %s is  downloaded from" % ticker)
         else:
-            data = quandl.get("%s/%s" % (vendor, ticker), trim_start=start_date, trim_end=end_date, authtoken=auth_tok)
+            data = self._download([ticker], start_date, end_date)[0]
 
         data = self._rename_columns(data)
         if isinstance(data, pd.Panel):
             data = data.to_frame()
         return data
 
+    def _download(self, tickers, start_date, end_date):
+        return fetch_all(lambda t: self._get_ticker(t, start_date, end_date), tickers,
+                         self.max_workers, self.retries, self.backoff, limiter=self.limiter)
+
+    def _get_ticker(self, ticker, start_date, end_date):
+        return self.fetch("%s/%s" % (vendor, ticker), trim_start=start_date, trim_end=end_date, authtoken=auth_tok)
+
@@ -1,20 +1,31 @@
-
-import date_utils
 from core.pool import WeightEventPool
 
 
 class ConstantMixStrategy(object):
-    def __init__(self, tickers_and_weights):
-        self.tickers_and_weights = tickers_and_weights
+    """
+    Rebalances to constant weights on a schedule of the price
+    handler's TradingCalendar: 'week', 'month', 'quarter', 'year',
+    every n trading days or a boolean mask with a flag per bar.
+    The default is the last trading day of each month.
+    """
+    def __init__(self, tickers_and_weights, schedule='month'):
+        self.tickers_and_weights    = tickers_and_weights
+        self.schedule               = schedule
+        self.rebalance              = None
 
     def initialize(self, portfolio_handler):
-        self.portfolio_handler = portfolio_handler
+        self.portfolio_handler  = portfolio_handler
+        self.price_handler      = portfolio_handler.price_handler
+        self.rebalance          = self.price_handler.get_calendar().get_mask(self.schedule)
 
     def calculate_signals(self, event):
-        if self._is_rebalance(event.time):
+        if self._is_rebalance(self.price_handler.curr_idx):
             twe = WeightEventPool(event.time)
             twe.add_weights(self.tickers_and_weights)
             return twe
 
-    def _is_rebalance(self, time):
-        return date_utils._end_of_month(time)
+    def _is_rebalance(self, idx):
+        if idx >= len(self.rebalance):
+            # the price handler was extended: the calendar masks grew with it
+            self.rebalance = self.price_handler.get_calendar().get_mask(self.schedule)
+        return self.rebalance[idx]
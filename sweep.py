@@ -0,0 +1,204 @@
+import itertools
+import os
+import shutil
+import tempfile
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import ArrayPriceHandler
+from core.statistics import batch_statistics
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+
+SUMMARY = ['final_equity', 'total_return', 'volatility', 'sharpe', 'max_drawdown_pct']
+
+
+def expand_grid(grid):
+    """
+    Expands {'name': [values], ...} into the list of every
+    combination of parameters, as dictionaries. A list of
+    dictionaries is returned unchanged.
+    """
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+    return list(grid)
+
+
+def default_position_sizer(params):
+    return ConstantPositionSizer()
+
+
+def default_execution_handler(params):
+    return SimulationExecutionHandler()
+
+
+def constant_mix(params):
+    """
+    A SPY/AGG ConstantMixStrategy with params['spy'] in SPY and the
+    rest in AGG, the strategy factory of the demo.
+    """
+    return ConstantMixStrategy({'SPY': params['spy'], 'AGG': 1.0 - params['spy']})
+
+
+class ParameterSweep(object):
+    """
+    Runs one backtest per configuration of a parameter grid on a
+    pool of worker processes.
+
+    The prices are loaded once, written to memory-mapped files and
+    opened read-only by every worker, so all processes share the
+    same pages instead of each receiving a pickled copy.
+
+    Parameters:
+    price_handler - A PriceHandler whose data is loaded once for all runs.
+    initial_cash - The starting cash of every run.
+    strategy_factory - Called with the parameters of a configuration
+        to build its strategy.
+    grid - {'name': [values]} or a list of parameter dictionaries.
+    position_sizer_factory - Builds the position sizer of a configuration.
+    execution_handler_factory - Builds the execution handler of a configuration.
+    processes - The number of worker processes, all cores by default.
+
+    The factories are sent to the workers, so they must be module
+    level functions or other picklable callables.
+    """
+    def __init__(
+        self, price_handler, initial_cash, strategy_factory, grid,
+        position_sizer_factory=default_position_sizer,
+        execution_handler_factory=default_execution_handler,
+        processes=None
+    ):
+        self.price_handler              = price_handler
+        self.initial_cash               = initial_cash
+        self.strategy_factory           = strategy_factory
+        self.configs                    = expand_grid(grid)
+        self.position_sizer_factory     = position_sizer_factory
+        self.execution_handler_factory  = execution_handler_factory
+        self.processes                  = processes
+
+    def run(self):
+        """
+        Returns (summary, equity): one row of parameters and summary
+        statistics per configuration, and the equity curves in long
+        form with columns config, timestamp and equity.
+        """
+        path = tempfile.mkdtemp(prefix='sweep_')
+        try:
+            self._share_prices(path)
+            setup = {
+                'path': path,
+                'tickers': list(self.price_handler.init_tickers),
+                'initial_cash': self.initial_cash,
+                'strategy_factory': self.strategy_factory,
+                'position_sizer_factory': self.position_sizer_factory,
+                'execution_handler_factory': self.execution_handler_factory
+            }
+            tasks = [(i, params, setup) for i, params in enumerate(self.configs)]
+            if self.processes == 1:
+                results = [_run_config(task) for task in tasks]
+            else:
+                pool = Pool(self.processes)
+                try:
+                    chunksize = max(1, len(tasks) // (4 * (self.processes or os.cpu_count() or 1)))
+                    results = list(pool.imap_unordered(_run_config, tasks, chunksize))
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+        results.sort(key=lambda result: result[0])
+        return self._summary(results), self._equity(results)
+
+    def _share_prices(self, path):
+        ph = self.price_handler
+        if ph.close is None:
+            ph._get_initial_data()
+        np.save(os.path.join(path, 'timestamp.npy'), np.asarray(ph.timestamp.values, dtype='datetime64[ns]'))
+        np.save(os.path.join(path, 'close.npy'), np.ascontiguousarray(ph.close, dtype=np.float64))
+        np.save(os.path.join(path, 'adj_close.npy'), np.ascontiguousarray(ph.adj_close, dtype=np.float64))
+
+    def _summary(self, results):
+        rows = []
+        for config_id, timestamp, equity in results:
+            row = {'config': config_id}
+            row.update(self.configs[config_id])
+            row.update(summarise_equity(equity))
+            rows.append(row)
+        return pd.DataFrame(rows).set_index('config')
+
+    def _equity(self, results):
+        return pd.concat([
+            pd.DataFrame({'config': config_id, 'timestamp': timestamp, 'equity': equity})
+            for config_id, timestamp, equity in results
+        ], ignore_index=True)
+
+
+def summarise_equity(equity, periods=252):
+    """
+    Total return, annualised volatility and Sharpe ratio (zero risk
+    free rate) and maximum drawdown of an equity curve.
+    """
+    results = batch_statistics(equity, periods=periods)
+    return {key: results[key] for key in SUMMARY}
+
+
+_shared_prices = {}
+
+
+def _open_prices(path):
+    """
+    Memory-maps the shared prices, once per worker process.
+    """
+    if path not in _shared_prices:
+        _shared_prices[path] = (
+            pd.DatetimeIndex(np.load(os.path.join(path, 'timestamp.npy'))),
+            np.load(os.path.join(path, 'close.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'adj_close.npy'), mmap_mode='r')
+        )
+    return _shared_prices[path]
+
+
+def _run_config(task):
+    config_id, params, setup = task
+    timestamp, close, adj_close = _open_prices(setup['path'])
+
+    tickers         = setup['tickers']
+    price_handler   = ArrayPriceHandler(timestamp, tickers, close, adj_close)
+    port_handler    = PortfolioHandler(
+        tickers, setup['initial_cash'], None,
+        price_handler=price_handler,
+        position_sizer=setup['position_sizer_factory'](params),
+        risk_manager=None,
+        execution_handler=setup['execution_handler_factory'](params),
+        strategy=setup['strategy_factory'](params),
+        statistics=None,
+        start_time=timestamp[0]
+    )
+    port_handler.initialize_parameters()
+    port_handler.run_session()
+
+    equity = port_handler.portfolio.statistics['equity']
+    return config_id, equity.index.values, equity.values
+
+
+if __name__ == "__main__":
+    import datetime
+    import time
+
+    from core.price_handler import CsvPriceHandler
+    # the factories are pickled by reference, and a worker started
+    # with spawn (macOS, Windows) only finds them by module name
+    from sweep import constant_mix
+    ph = CsvPriceHandler(['SPY', 'AGG'], datetime.datetime(2006, 11, 1), datetime.datetime(2015, 12, 31))
+    sweep = ParameterSweep(ph, 100000.0, constant_mix, {'spy': [i / 20.0 for i in range(21)]})
+    start = time.time()
+    summary, equity = sweep.run()
+    print(summary)
+    print("%d configs in %0.2fs" % (len(summary), time.time() - start))
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.portfolio_handler import PortfolioHandler
+from core.position import Position
+from core.position_book import PositionBook
+from core.price_handler import ArrayPriceHandler
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+
+def test_a_reduced_position_keeps_its_average_price():
+    position = Position('A', 'BOT', 100, 10.0, 1.0)
+    assert position.avg_price == pytest.approx(10.01)
+
+    position.transact_shares('SLD', 40, 12.0, 1.0)
+    assert position.avg_price == pytest.approx(10.01)
+    assert position.realised_pnl == pytest.approx(40 * (12.0 - 10.01) - 1.0)
+    assert position.cost_basis == pytest.approx(60 * 10.01)
+
+
+def test_the_commission_of_a_short_reduces_its_proceeds():
+    position = Position('A', 'SLD', 10, 20.0, 1.0)
+    assert position.avg_price == pytest.approx(19.9)
+
+    position.transact_shares('SLD', 10, 20.0, 1.0)
+    assert position.avg_price == pytest.approx(19.9)
+
+    # flipped through zero, the new long is opened at the fill price
+    position.transact_shares('BOT', 30, 18.0, 1.0)
+    assert position.avg_price == 18.0
+    assert position.realised_pnl == pytest.approx(20 * (19.9 - 18.0) - 1.0)
+
+
+def test_position_book_follows_position():
+    rng     = np.random.RandomState(0)
+    book    = PositionBook(['A'])
+    single  = Position('A')
+    for _ in range(200):
+        action      = 'BOT' if rng.rand() < 0.5 else 'SLD'
+        quantity    = float(rng.randint(1, 50))
+        price       = float(rng.uniform(10, 20))
+        book.transact(['A'], [action], [quantity], [price], [1.0])
+        single.transact_shares(action, quantity, price, 1.0)
+        for field in PositionBook.FIELDS:
+            assert getattr(book, field)[0] == pytest.approx(getattr(single, field))
+
+
+@pytest.mark.parametrize('position_book', [False, True])
+def test_equity_is_cash_plus_market_value(position_book):
+    # the closes are twice the adjusted closes, as before a 2:1 split
+    rng         = np.random.RandomState(1)
+    tickers     = ['A', 'B', 'C']
+    timestamp   = pd.bdate_range('2015-01-01', periods=120)
+    adj_close   = 50.0 * np.exp(np.cumsum(rng.normal(0, 0.02, (len(timestamp), 3)), axis=0))
+    handler     = PortfolioHandler(
+        tickers, 1e5, None, ArrayPriceHandler(timestamp, tickers, 2.0 * adj_close, adj_close),
+        ConstantPositionSizer(), None, SimulationExecutionHandler(),
+        ConstantMixStrategy({'A': 0.5, 'B': 0.7, 'C': -0.2}, schedule=1), None, timestamp[0],
+        position_book=position_book
+    )
+    handler.initialize_parameters()
+    handler.run_session()
+
+    portfolio   = handler.portfolio
+    quantities  = np.asarray(portfolio.quantities.iloc[-1], dtype=np.float64)
+    assert (quantities < 0).any() and (quantities > 0).any()
+    assert portfolio.equity == pytest.approx(portfolio.cur_cash + np.dot(quantities, adj_close[-1]))
+
+
+def test_orders_fill_at_the_adjusted_close():
+    tickers     = ['A']
+    timestamp   = pd.bdate_range('2015-01-01', periods=3)
+    close       = np.array([[100.0], [102.0], [104.0]])
+    handler     = PortfolioHandler(
+        tickers, 1e4, None, ArrayPriceHandler(timestamp, tickers, close, close / 2),
+        ConstantPositionSizer(), None, SimulationExecutionHandler(),
+        ConstantMixStrategy({'A': 1.0}, schedule=1), None, timestamp[0]
+    )
+    handler.initialize_parameters()
+    handler.run_session()
+
+    # before the change the fill was at the close, 102
+    position = handler.portfolio.positions['A']
+    assert position.avg_bot == 51.0
+
+
+# Hand-worked fills under the rules before and after the accounting
+# change that came with the sweep runner: a reduction used to
+# re-average avg_price with the exit price and net its commission
+# into it, and the commission of an increasing short used to add to
+# its proceeds. cash and market value are the same under both rules,
+# so only the new rules keep equity == init + total_pnl.
+CASES = [
+    # fills, mark, cash, market value, avg_price before, after
+    ([('BOT', 100, 10.0, 1.0), ('SLD', 40, 12.0, 1.0)], 11.0, 10000 - 1001 + 479, 660.0, 521.0 / 60, 10.01),
+    ([('SLD', 10, 20.0, 1.0)], 20.0, 10000 + 199, -200.0, 20.1, 19.9),
+]
+
+
+@pytest.mark.parametrize('fills, mark, cash, market_value, before, after', CASES)
+def test_accounting_before_and_after(fills, mark, cash, market_value, before, after):
+    position = Position('A')
+    for fill in fills:
+        position.transact_shares(*fill)
+    position.update_market_value(mark, mark)
+
+    assert position.avg_price == pytest.approx(after)
+    assert position.market_value == pytest.approx(market_value)
+    assert 10000 + position.total_pnl == pytest.approx(cash + market_value)
+
+    # the old avg_price put the cost basis, and so equity, elsewhere
+    total_pnl_before = position.realised_pnl + market_value - position.net * before
+    assert 10000 + total_pnl_before != pytest.approx(cash + market_value)
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data.cache
+from data.base_api import AbstractData
+from data.cache import CachedData, DataCache
+
+
+class FakeVendor(AbstractData):
+    """
+    Publishes business days up to self.published.
+    """
+    def __init__(self, published):
+        self.published  = pd.Timestamp(published)
+        self.calls      = []
+
+    def get_data(self, ticker, start_date, end_date):
+        self.calls.append((pd.Timestamp(start_date), pd.Timestamp(end_date)))
+        index = pd.date_range(start_date, min(pd.Timestamp(end_date), self.published), freq='B')
+        return pd.DataFrame({'Close': np.arange(len(index), dtype=float)}, index=index)
+
+
+def test_unpublished_days_are_fetched_again(tmp_path, monkeypatch):
+    vendor  = FakeVendor('2016-03-01')
+    cached  = CachedData(vendor, 'fake', DataCache(str(tmp_path)))
+
+    monkeypatch.setattr(data.cache, '_last_session', lambda: pd.Timestamp('2016-03-01'))
+    assert cached.get_data('AAPL', '2016-01-01', '2016-03-10').index[-1] == pd.Timestamp('2016-03-01')
+    assert DataCache(str(tmp_path)).load('fake', 'AAPL')[2] == pd.Timestamp('2016-03-01')
+
+    # two more sessions close and are published
+    vendor.published = pd.Timestamp('2016-03-03')
+    monkeypatch.setattr(data.cache, '_last_session', lambda: pd.Timestamp('2016-03-03'))
+    frame = cached.get_data('AAPL', '2016-01-01', '2016-03-10')
+
+    assert vendor.calls[-1] == (pd.Timestamp('2016-03-02'), pd.Timestamp('2016-03-10'))
+    assert frame.index[-1] == pd.Timestamp('2016-03-03')
+
+    # nothing left to fetch inside the closed sessions
+    calls = len(vendor.calls)
+    cached.get_data('AAPL', '2016-01-04', '2016-03-03')
+    assert len(vendor.calls) == calls
+
+
+def test_last_session():
+    assert data.cache._last_session(pd.Timestamp('2016-03-02 10:00')) == pd.Timestamp('2016-03-01')
+    assert data.cache._last_session(pd.Timestamp('2016-03-02 17:00')) == pd.Timestamp('2016-03-02')
+    assert data.cache._last_session(pd.Timestamp('2016-03-06 12:00')) == pd.Timestamp('2016-03-04')
+
+
+def frame(start, periods, value):
+    index = pd.date_range(start, periods=periods, freq='B')
+    return pd.DataFrame({'Close': np.full(periods, value), 'Volume': np.full(periods, value)}, index=index)
+
+
+def test_an_interrupted_resave_keeps_the_previous_cache(tmp_path, monkeypatch):
+    cache = DataCache(str(tmp_path))
+    cache.save('fake', 'AAPL', frame('2016-01-01', 5, 1.0), '2016-01-01', '2016-01-07')
+
+    # the re-save dies after writing the index
+    save    = np.save
+    saved   = []
+
+    def crash(path, values, allow_pickle=False):
+        if saved:
+            raise IOError("disk full")
+        saved.append(path)
+        save(path, values, allow_pickle=allow_pickle)
+    monkeypatch.setattr(np, 'save', crash)
+    with pytest.raises(IOError):
+        cache.save('fake', 'AAPL', frame('2016-01-01', 10, 2.0)[['Volume']], '2016-01-01', '2016-01-14')
+    monkeypatch.undo()
+
+    data, start, end = cache.load('fake', 'AAPL')
+    assert data['Close'].tolist() == [1.0] * 5 and data['Volume'].tolist() == [1.0] * 5
+    assert end == pd.Timestamp('2016-01-07')
+    assert os.listdir(str(tmp_path / 'fake')) == ['AAPL']
+
+    cache.save('fake', 'AAPL', frame('2016-01-01', 10, 2.0)[['Volume']], '2016-01-01', '2016-01-14')
+    data, start, end = cache.load('fake', 'AAPL')
+    assert list(data.columns) == ['Volume'] and len(data) == 10
+    assert sorted(os.listdir(str(tmp_path / 'fake' / 'AAPL'))) == ['col_0.npy', 'index.npy', 'meta.json']
+
+
+def test_invalidate(tmp_path):
+    cache = DataCache(str(tmp_path))
+    for vendor in ['quandl', 'google']:
+        for ticker in ['AAPL', 'SPY']:
+            cache.save(vendor, ticker, frame('2016-01-01', 5, 1.0), '2016-01-01', '2016-01-07')
+
+    cache.invalidate('quandl', 'AAPL')
+    assert cache.load('quandl', 'AAPL') is None
+    assert cache.load('quandl', 'SPY') is not None
+
+    cache.invalidate('google')
+    assert cache.load('google', 'AAPL') is None and cache.load('google', 'SPY') is None
+    assert cache.load('quandl', 'SPY') is not None
+
+    cache.invalidate()
+    assert cache.load('quandl', 'SPY') is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constant_position_sizer import ConstantPositionSizer
+from core.checkpoint import Checkpoint
+from core.excution_handler import SimulationExecutionHandler
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import ArrayPriceHandler
+from core.trade_log import BinaryTradeLog, CsvTradeLog, read_trade_log
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+TICKERS = ['A', 'B', 'C']
+
+
+def make_handler(trade_log, checkpoint=None):
+    rng         = np.random.RandomState(0)
+    timestamp   = pd.bdate_range('2015-01-01', periods=100)
+    adj_close   = 50.0 * np.exp(np.cumsum(rng.normal(0, 0.02, (len(timestamp), 3)), axis=0))
+    handler     = PortfolioHandler(
+        TICKERS, 1e5, None, ArrayPriceHandler(timestamp, TICKERS, adj_close.copy(), adj_close),
+        ConstantPositionSizer(), None, SimulationExecutionHandler(),
+        ConstantMixStrategy({'A': 0.3, 'B': 0.3, 'C': 0.4}, schedule=1), None, timestamp[0],
+        trade_log=trade_log, checkpoint=checkpoint
+    )
+    handler.initialize_parameters()
+    return handler
+
+
+@pytest.mark.parametrize('log_type, name', [(BinaryTradeLog, 'log'), (CsvTradeLog, 'log.csv')])
+def test_resume_does_not_log_fills_twice(tmp_path, log_type, name):
+    with log_type(str(tmp_path / ('full_' + name)), chunk_size=1) as log:
+        make_handler(log).run_session()
+    expected = pd.concat(read_trade_log(log.path), ignore_index=True)
+
+    # a run that dies on bar 50 after a snapshot on bar 30, having
+    # logged the fills of the bars in between
+    path    = str(tmp_path / name)
+    handler = make_handler(log_type(path, chunk_size=1), Checkpoint(str(tmp_path / 'checkpoint'), every=30))
+    stream  = handler.price_handler.stream_next
+
+    def crash():
+        if handler.price_handler.curr_idx == 50:
+            raise RuntimeError("crashed")
+        return stream()
+    handler.price_handler.stream_next = crash
+    with pytest.raises(RuntimeError):
+        handler.run_session()
+    snapshot = Checkpoint.load(str(tmp_path / 'checkpoint'))['components']['trade_log']
+    assert 0 < snapshot['n_rows'] < len(pd.concat(read_trade_log(path)))
+
+    with log_type(path, chunk_size=1) as log:
+        resumed = make_handler(log)
+        resumed.resume(str(tmp_path / 'checkpoint'))
+        resumed.run_session()
+    logged = pd.concat(read_trade_log(path), ignore_index=True)
+
+    assert not logged.duplicated().any()
+    pd.testing.assert_frame_equal(logged, expected)
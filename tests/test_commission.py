@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import ArrayPriceHandler
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+
+@pytest.mark.parametrize('quantity, price, commission', [
+    (100, 50.0, 1.0),       # the $1 minimum
+    (1000, 50.0, 5.0),      # $0.005 a share
+    (4, 0.1, 0.2),          # capped at half the trade value
+])
+def test_interactive_brokers_commission(quantity, price, commission):
+    handler = SimulationExecutionHandler()
+    assert handler.calculate_commission(quantity, price) == pytest.approx(commission)
+    assert handler.calculate_commissions(np.array([quantity]), np.array([price]))[0] == pytest.approx(commission)
+
+
+@pytest.mark.parametrize('position_book', [False, True])
+def test_a_fill_is_charged_its_commission(position_book):
+    # all the cash in A at 50 on the second bar: 1000 shares, $5.00
+    tickers     = ['A']
+    timestamp   = pd.bdate_range('2015-01-01', periods=2)
+    close       = np.array([[40.0], [50.0]])
+    handler     = PortfolioHandler(
+        tickers, 50000.0, None, ArrayPriceHandler(timestamp, tickers, close, close.copy()),
+        ConstantPositionSizer(), None, SimulationExecutionHandler(),
+        ConstantMixStrategy({'A': 1.0}, schedule=1), None, timestamp[0],
+        position_book=position_book
+    )
+    handler.initialize_parameters()
+    fills = []
+    execute_order = handler.execution_handler.execute_order
+    handler.execution_handler.execute_order = lambda orders: fills.append(execute_order(orders)) or fills[-1]
+    handler.run_session()
+
+    assert fills[0].quantities == [1000] and fills[0].prices == [50.0]
+    assert fills[0].commissions == [5.0]
+    assert handler.portfolio.cur_cash == pytest.approx(-5.0)
+    assert handler.portfolio.equity == pytest.approx(50000.0 - 5.0)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.pool import WeightEventPool
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import ArrayPriceHandler
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+
+def build_sizer(**kwargs):
+    # a flat 1e4 portfolio, on a bar where A is at 100 and B at 50
+    tickers     = ['A', 'B']
+    timestamp   = pd.bdate_range('2015-01-01', periods=3)
+    close       = np.tile([100.0, 50.0], (len(timestamp), 1))
+    sizer       = ConstantPositionSizer(**kwargs)
+    handler     = PortfolioHandler(
+        tickers, 1e4, None, ArrayPriceHandler(timestamp, tickers, close, close),
+        sizer, None, SimulationExecutionHandler(),
+        ConstantMixStrategy({'A': 0.5}, schedule=1), None, timestamp[0]
+    )
+    handler.initialize_parameters()
+    handler._stream_next()
+    return sizer, timestamp[1]
+
+
+def weight_events(time, weights):
+    pool = WeightEventPool(time)
+    pool.add_weights(weights)
+    return pool
+
+
+def orders_of(order_events):
+    return dict(zip(order_events.tickers, zip(order_events.actions, order_events.quantities)))
+
+
+def test_targets_that_net_to_zero_give_no_order():
+    sizer, time = build_sizer()
+    order_events = sizer.size_orders([
+        weight_events(time, {'A': 0.5, 'B': 0.2}),
+        weight_events(time, {'A': -0.3}),
+        weight_events(time, {'A': -0.2, 'B': -0.2}),
+    ])
+
+    assert order_events.time == time
+    assert orders_of(order_events) == {}
+
+
+def test_targets_are_summed_per_ticker():
+    sizer, time = build_sizer()
+    order_events = sizer.size_orders([
+        weight_events(time, {'A': 0.5, 'B': 0.2}),
+        weight_events(time, {'A': -0.75}),
+    ])
+
+    # A nets to -0.25 of 1e4 at 100, B stays at 0.2 of 1e4 at 50
+    assert orders_of(order_events) == {'A': ('SLD', 25), 'B': ('BOT', 40)}
+
+
+@pytest.mark.parametrize('kwargs, weights, expected', [
+    # 4 shares of A are under min_quantity, 5 shares of B are not
+    ({'min_quantity': 5}, {'A': 0.04, 'B': 0.025}, {'B': ('BOT', 5)}),
+    # 900 of A is under min_notional, 1000 of B is not
+    ({'min_notional': 1000.0}, {'A': 0.09, 'B': -0.1}, {'B': ('SLD', 20)}),
+])
+def test_orders_under_the_thresholds_are_dropped(kwargs, weights, expected):
+    sizer, time = build_sizer(**kwargs)
+    order_events = sizer.size_orders([weight_events(time, weights)])
+
+    assert orders_of(order_events) == expected
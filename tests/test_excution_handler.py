@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SlippageExecutionHandler
+from core.pool import OrderEventPool
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import ArrayPriceHandler
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+
+def build_handler():
+    # A trades 1000 shares a bar, so at most 100 fill per bar
+    tickers     = ['A']
+    timestamp   = pd.bdate_range('2015-01-01', periods=4)
+    close       = np.array([[100.0], [100.0], [101.0], [102.0]])
+    volume      = np.full((len(timestamp), 1), 1000.0)
+    execution   = SlippageExecutionHandler(slippage_bps=0.0, participation=0.1)
+    handler     = PortfolioHandler(
+        tickers, 1e5, None, ArrayPriceHandler(timestamp, tickers, close, close.copy(), volume),
+        ConstantPositionSizer(), None, execution,
+        ConstantMixStrategy({'A': 0.5}, schedule=1), None, timestamp[0]
+    )
+    handler.initialize_parameters()
+    return handler, execution, timestamp
+
+
+def order(time, action, quantity):
+    order_events = OrderEventPool(time)
+    order_events.add_orders(['A'], [action], [quantity])
+    return order_events
+
+
+def fills_of(fill_events):
+    return list(zip(fill_events.tickers, fill_events.actions, fill_events.quantities))
+
+
+def test_the_remainder_of_a_partial_fill_is_filled_on_the_next_bar():
+    handler, execution, timestamp = build_handler()
+    handler._stream_next()
+    assert fills_of(execution.execute_order(order(timestamp[1], 'BOT', 150))) == [('A', 'BOT', 100)]
+    assert execution.pending == {'A': ('BOT', 50.0)}
+
+    handler._stream_next()
+    pending = execution.get_pending_orders(timestamp[2])
+    assert pending.time == timestamp[2]
+    assert list(zip(pending.tickers, pending.actions, pending.quantities)) == [('A', 'BOT', 50.0)]
+    assert fills_of(execution.execute_order(pending)) == [('A', 'BOT', 50)]
+    assert execution.pending == {}
+    assert execution.get_pending_orders(timestamp[3]) is None
+
+
+def test_a_new_order_replaces_the_remainder_and_shares_the_bar_volume():
+    handler, execution, timestamp = build_handler()
+    handler._stream_next()
+    execution.execute_order(order(timestamp[1], 'BOT', 150))
+
+    # the remainder goes first and takes 50 of the bar's 100 shares,
+    # the new order gets the other 50 and what is left replaces the
+    # remainder rather than adding to it
+    handler._stream_next()
+    execution.execute_order(execution.get_pending_orders(timestamp[2]))
+    assert fills_of(execution.execute_order(order(timestamp[2], 'SLD', 80))) == [('A', 'SLD', 50)]
+    assert execution.pending == {'A': ('SLD', 30.0)}
+
+    handler._stream_next()
+    assert fills_of(execution.execute_order(execution.get_pending_orders(timestamp[3]))) == [('A', 'SLD', 30)]
+    assert execution.pending == {}
+
+
+def test_a_session_fills_the_remainder_ahead_of_the_new_order():
+    handler, execution, timestamp = build_handler()
+    orders = []
+    execute_order = execution.execute_order
+
+    def record(order_events):
+        fill_events = execute_order(order_events)
+        orders.append((order_events.time, order_events.quantities[0], fills_of(fill_events)))
+        return fill_events
+    execution.execute_order = record
+    handler.run_session()
+
+    # half of 1e5 at 100 is 500 shares, 100 fill a bar: on each bar
+    # the remainder takes the whole cap, and the sizer's order for
+    # the rest fills nothing and replaces it
+    assert orders == [
+        (timestamp[1], 500, [('A', 'BOT', 100)]),
+        (timestamp[2], 400, [('A', 'BOT', 100)]),
+        (timestamp[2], 295, []),
+        (timestamp[3], 295, [('A', 'BOT', 100)]),
+        (timestamp[3], 191, []),
+    ]
+    assert handler.portfolio.positions['A'].net == 300
+    assert execution.pending == {'A': ('BOT', 191.0)}
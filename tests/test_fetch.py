@@ -0,0 +1,125 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data.fetch
+
+pytest.importorskip('quandl')
+from data.quandl_api import QuandlData
+
+
+class FakeTime(object):
+    """
+    A clock that only moves when slept on, so waits are exact.
+    """
+    def __init__(self):
+        self.now    = 0.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FlakyFetch(object):
+    """
+    A vendor call failing the first failures requests of each ticker.
+    """
+    def __init__(self, clock, failures):
+        self.clock      = clock
+        self.failures   = failures
+        self.calls      = []
+
+    def __call__(self, code, trim_start=None, trim_end=None, authtoken=None):
+        self.calls.append((code, self.clock.now))
+        if sum(1 for call in self.calls if call[0] == code) <= self.failures:
+            raise IOError("service unavailable")
+        return pd.DataFrame({'Close': [1.0]}, index=pd.to_datetime([trim_start]))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(data.fetch, 'time', clock)
+    return clock
+
+
+def test_a_single_ticker_retries_with_backoff_under_the_rate_limit(clock):
+    fetch   = FlakyFetch(clock, failures=2)
+    quandl  = QuandlData(max_workers=1, retries=3, backoff=0.5, rate=1.0, fetch=fetch)
+    frame   = quandl._download(['AAPL'], '2015-01-02', '2015-01-05')[0]
+
+    assert frame['Close'].tolist() == [1.0]
+    # backoff 0.5 then the limiter up to 1 s, backoff 1.0
+    assert [when for _, when in fetch.calls] == [0.0, 1.0, 2.0]
+    assert clock.sleeps == [0.5, 0.5, 1.0]
+
+
+def test_single_and_list_requests_share_the_rate_limit(clock):
+    fetch   = FlakyFetch(clock, failures=0)
+    quandl  = QuandlData(max_workers=1, rate=2.0, fetch=fetch)
+    quandl._download(['AAPL'], '2015-01-02', '2015-01-05')
+    quandl._download(['SPY', 'AGG'], '2015-01-02', '2015-01-05')
+    quandl._download(['GS'], '2015-01-02', '2015-01-05')
+
+    assert [when for _, when in fetch.calls] == [0.0, 0.5, 1.0, 1.5]
+
+
+def test_the_last_failure_is_raised_once_the_retries_are_spent(clock):
+    fetch   = FlakyFetch(clock, failures=5)
+    quandl  = QuandlData(max_workers=1, retries=2, backoff=0.1, fetch=fetch)
+
+    with pytest.raises(IOError):
+        quandl._download(['AAPL'], '2015-01-02', '2015-01-05')
+    assert len(fetch.calls) == 3
+    assert clock.sleeps == pytest.approx([0.1, 0.2])
+
+
+def test_concurrent_downloads_retry_in_order_under_the_rate_limit():
+    tickers     = ['T%02d' % i for i in range(12)]
+    lock        = threading.Lock()
+    attempts    = dict((ticker, 0) for ticker in tickers)
+    in_flight   = [0, 0]    # now, most
+
+    def fetch(code, trim_start=None, trim_end=None, authtoken=None):
+        ticker = code.split('/')[1]
+        with lock:
+            attempts[ticker] += 1
+            attempt = attempts[ticker]
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        try:
+            # later tickers answer first, every third one fails twice
+            time.sleep(0.002 * (len(tickers) - int(ticker[1:])))
+            if int(ticker[1:]) % 3 == 0 and attempt <= 2:
+                raise IOError("service unavailable")
+            return pd.DataFrame({'Close': [float(ticker[1:])]}, index=pd.to_datetime([trim_start]))
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    quandl  = QuandlData(max_workers=4, retries=3, backoff=0.001, rate=500.0, fetch=fetch)
+    slots   = []
+    wait    = quandl.limiter.wait
+
+    def recorded_wait():
+        start = wait()
+        with lock:
+            slots.append(start)
+        return start
+    quandl.limiter.wait = recorded_wait
+    frames  = quandl._download(tickers, '2015-01-02', '2015-01-05')
+
+    assert [frame['Close'].iloc[0] for frame in frames] == [float(i) for i in range(12)]
+    assert attempts == dict((ticker, 3 if int(ticker[1:]) % 3 == 0 else 1) for ticker in tickers)
+    assert 1 < in_flight[1] <= 4
+    # every attempt, retries included, took its own slot of the limiter
+    slots.sort()
+    assert len(slots) == sum(attempts.values())
+    assert min(np.diff(slots)) >= quandl.limiter.interval - 1e-9
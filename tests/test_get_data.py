@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from data.get_data import merge_frames
+
+
+def fold(frames):
+    merged = frames[0]
+    for frame in frames[1:]:
+        merged = merged.combine_first(frame)
+    return merged
+
+
+def test_earlier_frames_win_and_later_ones_fill_gaps():
+    first   = pd.DataFrame({'A': [1.0, np.nan]}, index=pd.to_datetime(['2015-01-02', '2015-01-05']))
+    second  = pd.DataFrame({'A': [9.0, 2.0, 3.0], 'B': [4.0, 5.0, 6.0]},
+                           index=pd.to_datetime(['2015-01-02', '2015-01-05', '2015-01-06']))
+    merged  = merge_frames([first, second])
+
+    assert merged['A'].tolist() == [1.0, 2.0, 3.0]
+    pd.testing.assert_frame_equal(merged, fold([first, second])[merged.columns], check_freq=False)
+
+
+def test_non_numeric_columns_are_kept():
+    first   = pd.DataFrame({'A': [1.0, np.nan], 'exchange': ['NYSE', None]},
+                           index=pd.to_datetime(['2015-01-02', '2015-01-05']))
+    second  = pd.DataFrame({'A': [9.0, 2.0], 'exchange': ['ARCA', 'ARCA']},
+                           index=pd.to_datetime(['2015-01-02', '2015-01-05']))
+    merged  = merge_frames([first, second])
+
+    assert merged['A'].tolist() == [1.0, 2.0]
+    assert merged['exchange'].tolist() == ['NYSE', 'ARCA']
+
+
+def test_duplicate_index_labels_merge_as_combine_first():
+    first   = pd.DataFrame({'A': [1.0, 2.0]}, index=pd.to_datetime(['2015-01-02', '2015-01-02']))
+    second  = pd.DataFrame({'B': [3.0]}, index=pd.to_datetime(['2015-01-05']))
+
+    pd.testing.assert_frame_equal(merge_frames([first, second]), fold([first, second]))
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.indicators import RollingMax, RollingMin
+
+
+def stream(indicator, values):
+    return np.array([indicator.update(row).copy() for row in values])
+
+
+@pytest.mark.parametrize('window', [1, 5, 50])
+def test_rolling_max_of_a_falling_series(window):
+    values = np.column_stack([np.linspace(100.0, 1.0, 300), np.linspace(50.0, 40.0, 300)])
+    np.testing.assert_array_equal(
+        stream(RollingMax(window, 2), values), pd.DataFrame(values).rolling(window).max().values)
+
+
+def test_rolling_min_of_a_rising_series():
+    values = np.linspace(1.0, 100.0, 300)[:, None]
+    np.testing.assert_array_equal(
+        stream(RollingMin(20, 1), values), pd.DataFrame(values).rolling(20).min().values)
+
+
+def test_rolling_max_and_min_with_gaps_match_pandas():
+    rng     = np.random.RandomState(0)
+    values  = 100 * np.cumprod(1 + rng.normal(0, 0.01, (500, 4)), axis=0)
+    values[:30, 0]      = np.nan
+    values[200:203, 1]  = np.nan
+    for indicator, expected in [(RollingMax(25, 4), pd.DataFrame(values).rolling(25).max()),
+                                (RollingMin(25, 4), pd.DataFrame(values).rolling(25).min())]:
+        np.testing.assert_array_equal(stream(indicator, values), expected.values)
@@ -0,0 +1,163 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+import core.live
+import core.trading_calendar
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.live import AsyncLiveSession, FileTailFeed, QueueFeed
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import ArrayPriceHandler
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+TICKERS = ['AAPL', 'SPY', 'AGG']
+WEIGHTS = {'AAPL': 0.3, 'SPY': 0.3, 'AGG': 0.4}
+
+
+def make_handler(n_bars):
+    timestamp   = pd.bdate_range(end='2024-01-02', periods=n_bars)
+    prices      = np.tile([100.0, 200.0, 100.0], (n_bars, 1))
+    handler     = PortfolioHandler(
+        TICKERS, 1e6, None, ArrayPriceHandler(timestamp, TICKERS, prices, prices.copy()),
+        ConstantPositionSizer(), None, SimulationExecutionHandler(),
+        ConstantMixStrategy(WEIGHTS, schedule=1), None, timestamp[-1]
+    )
+    handler.initialize_parameters()
+    return handler
+
+
+async def produce(put, n_ticks, seed=0):
+    rng     = np.random.RandomState(seed)
+    prices  = np.array([100.0, 200.0, 100.0])
+    start   = pd.Timestamp('2024-01-02 09:30')
+    for k in range(n_ticks):
+        i           = rng.randint(len(TICKERS))
+        prices[i]   *= np.exp(rng.normal(0, 0.001))
+        put(start + pd.Timedelta(seconds=k), TICKERS[i], prices[i])
+        await asyncio.sleep(0.001)
+
+
+def run_queue_session(handler, n_ticks):
+    async def main():
+        feed    = QueueFeed()
+        session = AsyncLiveSession(handler, feed)
+
+        async def producer():
+            await produce(feed.put, n_ticks)
+            feed.close()
+        await asyncio.gather(producer(), session.run_session_async())
+        return session
+    return asyncio.run(main())
+
+
+class TickFeed(object):
+    """
+    A feed yielding one tick per bar, in order, stamped with the
+    arrival time of core.live._clock.
+    """
+    def __init__(self, n_ticks, seed=0):
+        rng         = np.random.RandomState(seed)
+        prices      = np.array([100.0, 200.0, 100.0])
+        start       = pd.Timestamp('2024-01-02 09:30')
+        self.ticks  = []
+        for k in range(n_ticks):
+            i           = rng.randint(len(TICKERS))
+            prices[i]   *= np.exp(rng.normal(0, 0.001))
+            self.ticks.append((start + pd.Timedelta(seconds=k), TICKERS[i], prices[i], np.nan))
+
+    def __aiter__(self):
+        self._ticks = iter(self.ticks)
+        return self
+
+    async def __anext__(self):
+        for tick in self._ticks:
+            return [tick + (core.live._clock(),)]
+        raise StopAsyncIteration
+
+
+def test_work_per_tick_does_not_grow_with_history(monkeypatch):
+    # the rows of the trading calendar recomputed per bar and the
+    # price buffers allocated stand in for the time spent, which
+    # is too noisy to compare on a loaded machine
+    period_key = core.trading_calendar._period_key
+    for n_bars in [10, 50000]:
+        handler = make_handler(n_bars)
+        ph      = handler.price_handler
+        rows    = []
+
+        def recorded_period_key(days, period):
+            rows.append(len(days))
+            return period_key(days, period)
+        monkeypatch.setattr(core.trading_calendar, '_period_key', recorded_period_key)
+
+        buffers = []
+        append  = ph.append
+
+        def recorded_append(*args):
+            added = append(*args)
+            if not buffers or buffers[-1] is not ph._buffers['adj_close']:
+                buffers.append(ph._buffers['adj_close'])
+            return added
+        ph.append = recorded_append
+
+        calendar    = ph.get_calendar()
+        session     = AsyncLiveSession(handler, TickFeed(200))
+        session.run_session()
+
+        assert len(session.bar_latency) == 200 and len(session.order_latency) > 0
+        assert ph.get_calendar() is calendar
+        assert max(rows) <= 2
+        # the buffers only double
+        assert len(buffers) <= 1 + np.log2((n_bars + 200.0) / n_bars)
+
+
+def test_latency_runs_from_the_tick_to_the_order_and_the_bar_end(monkeypatch):
+    clock = iter(range(1000000))
+    monkeypatch.setattr(core.live, '_clock', lambda: next(clock))
+    handler = make_handler(10)
+    session = AsyncLiveSession(handler, TickFeed(50))
+    session.run_session()
+
+    # one clock reading at the tick, one at the first order of the
+    # bar if any, one at the bar end
+    assert len(session.bar_latency) == 50
+    assert session.order_latency == [1] * len(session.order_latency)
+    assert sorted(session.bar_latency) == [1] * (50 - len(session.order_latency)) + [2] * len(session.order_latency)
+    assert len(session.order_latency) > 0
+    stats = session.get_latency_stats()
+    assert stats['tick_to_bar_end']['count'] == 50 and stats['tick_to_bar_end']['max'] == 2
+
+
+def test_bad_ticks_are_skipped():
+    handler = make_handler(10)
+
+    async def main():
+        feed    = QueueFeed()
+        session = AsyncLiveSession(handler, feed)
+        feed.put(pd.Timestamp('2024-01-02 09:30'), 'MSFT', 300.0)
+        feed.put('not a time', 'AAPL', 101.0)
+        feed.put(pd.Timestamp('2024-01-02 09:30'), 'AAPL', 'n/a')
+        feed.put(pd.Timestamp('2024-01-02 09:31'), 'SPY', 201.0)
+        feed.close()
+        await session.run_session_async()
+        return session
+    session = asyncio.run(main())
+
+    assert len(session.bar_latency) == 1
+    assert handler.price_handler.adj_close[-1].tolist() == [100.0, 201.0, 100.0]
+
+
+def test_file_feed_skips_malformed_lines(tmp_path):
+    path = str(tmp_path / 'ticks.csv')
+    with open(path, 'w') as f:
+        f.write('2024-01-02 09:30:00,AAPL,101.0\n')
+        f.write('garbage\n')
+        f.write('2024-01-02 09:30:01,SPY,not-a-price\n')
+        f.write('2024-01-02 09:30:02,AGG,99.0,1000\n')
+    handler = make_handler(10)
+    session = AsyncLiveSession(handler, FileTailFeed(path, poll_interval=0.001, from_start=True, idle_timeout=0.05))
+    session.run_session()
+
+    assert handler.price_handler.adj_close[-1].tolist() == [101.0, 200.0, 99.0]
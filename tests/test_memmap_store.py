@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.memmap_store import MemmapStore
+
+
+def frame(dates, tickers, value):
+    columns = ['%s-%s' % (ticker, field) for ticker in tickers for field in MemmapStore.FIELDS]
+    return pd.DataFrame(value, index=pd.DatetimeIndex(dates), columns=columns)
+
+
+def test_append_cuts_off_bytes_of_a_crashed_append(tmp_path):
+    path    = str(tmp_path / 'store')
+    tickers = ['A', 'B']
+    store   = MemmapStore.create(path, tickers)
+    store.append(frame(['2015-01-02', '2015-01-05'], tickers, 1.0))
+
+    # an append that died after writing some data but before the meta
+    for name in os.listdir(path):
+        if name != MemmapStore.META:
+            with open(os.path.join(path, name), 'ab') as f:
+                f.write(b'\xff' * 13)
+
+    store = MemmapStore(path)
+    store.append(frame(['2015-01-06'], tickers, 2.0))
+
+    store = MemmapStore(path)
+    assert store.n_rows == 3
+    assert list(store.get_dates()) == list(pd.DatetimeIndex(['2015-01-02', '2015-01-05', '2015-01-06']))
+    np.testing.assert_array_equal(store.get_field('Adj Close'), [[1.0, 1.0], [1.0, 1.0], [2.0, 2.0]])
+    for k in range(len(store.fields)):
+        assert os.path.getsize(os.path.join(path, 'field_%d.f8' % k)) == 3 * 8 * len(tickers)
+
+
+def test_gaps_carry_prices_but_not_volume(tmp_path):
+    store   = MemmapStore.create(str(tmp_path / 'store'), ['A', 'B'])
+    data    = frame(['2015-01-02', '2015-01-05', '2015-01-06'], ['A', 'B'], 1.0)
+    data.loc['2015-01-05', ['B-%s' % field for field in MemmapStore.FIELDS]] = np.nan
+    data.loc['2015-01-06', 'B-Close'] = 3.0
+    store.append(data)
+
+    # a day without any volume for B
+    store.append(frame(['2015-01-07'], ['A', 'B'], 2.0).drop(columns=['B-Volume']))
+
+    np.testing.assert_array_equal(store.get_field('Close')[:, 1], [1.0, 1.0, 3.0, 2.0])
+    np.testing.assert_array_equal(store.get_field('Volume')[:, 0], [1.0, 1.0, 1.0, 2.0])
+    np.testing.assert_array_equal(store.get_field('Volume')[:3, 1], [1.0, 0.0, 1.0])
+    assert np.isnan(store.get_field('Volume')[3, 1])
@@ -0,0 +1,13 @@
+from core.portfolio import Portfolio
+
+
+def test_a_new_ticker_twice_in_a_batch_gets_one_history_column():
+    portfolio = Portfolio(None, 1e5, ['A'], position_book=True)
+    portfolio.transact_positions(
+        ['BOT', 'BOT', 'SLD', 'BOT'], ['B', 'A', 'B', 'C'],
+        [10, 5, 4, 1], [20.0, 100.0, 21.0, 50.0], [1.0, 1.0, 1.0, 1.0]
+    )
+
+    assert portfolio.book.tickers == ['A', 'B', 'C']
+    assert portfolio.history.tickers == ['A', 'B', 'C']
+    assert portfolio.book.net.tolist() == [5.0, 6.0, 1.0]
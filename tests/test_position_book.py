@@ -0,0 +1,41 @@
+import time
+
+import numpy as np
+
+from core.position_book import PositionBook
+
+
+def test_adding_tickers_one_by_one_grows_in_amortised_constant_time():
+    def build(n):
+        book  = PositionBook([])
+        start = time.perf_counter()
+        for i in range(n):
+            book.add_ticker('T%d' % i)
+        return book, time.perf_counter() - start
+
+    build(1000)
+    small, small_time = build(2000)
+    large, large_time = build(20000)
+    # quadratic growth would take about 100 times longer
+    assert large_time < 30 * small_time
+    assert len(large) == 20000 and large.ticker_idx['T19999'] == 19999
+    for field in PositionBook.FIELDS:
+        assert len(getattr(large, field)) == 20000
+
+
+def test_new_tickers_start_flat_after_trading_and_marking():
+    book = PositionBook(['A'])
+    book.transact(['A'], ['BOT'], [10], [100.0], [1.0])
+    book.mark_to_market(np.array([110.0]))
+    ids  = book.get_ids(['B', 'A', 'C', 'B'])
+
+    assert ids.tolist() == [1, 0, 2, 1]
+    assert book.tickers == ['A', 'B', 'C']
+    for field in PositionBook.FIELDS:
+        assert getattr(book, field)[1:].tolist() == [0.0, 0.0]
+    assert book.market_value[0] == 1100.0
+
+    book.transact(['C'], ['SLD'], [5], [20.0], [1.0])
+    book.mark_to_market(np.array([110.0, 50.0, 30.0]))
+    assert book.market_value.tolist() == [1100.0, 0.0, -150.0]
+    assert book.unrealised_pnl[0] == book.market_value[0] - book.cost_basis[0]
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.portfolio_handler import PortfolioHandler
+from core.price_handler import CsvPriceHandler
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+
+def write_csv(path, ticker, dates, price):
+    frame = pd.DataFrame({
+        'Open': price, 'High': price, 'Low': price, 'Close': price,
+        'Volume': 1000, 'Adj Close': price
+    }, index=pd.DatetimeIndex(dates, name='Date'))
+    frame.to_csv(str(path / ('%s.csv' % ticker)))
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    # B is listed on the fourth business day
+    dates = pd.bdate_range('2015-01-01', periods=10)
+    write_csv(tmp_path, 'A', dates, np.linspace(100.0, 109.0, 10))
+    write_csv(tmp_path, 'B', dates[3:], np.linspace(50.0, 56.0, 7))
+    return tmp_path
+
+
+def test_a_ticker_has_no_price_before_it_is_listed(csv_dir):
+    ph = CsvPriceHandler(['A', 'B'], '2015-01-01', '2015-01-14', csv_dir=str(csv_dir))
+    ph._get_initial_data()
+
+    assert np.isnan(ph.adj_close[:3, 1]).all()
+    assert ph.adj_close[3:, 1].tolist() == np.linspace(50.0, 56.0, 7).tolist()
+    assert not np.isnan(ph.adj_close[:, 0]).any()
+
+
+@pytest.mark.parametrize('position_book', [False, True])
+def test_a_late_listing_leaves_equity_valued(csv_dir, position_book):
+    ph      = CsvPriceHandler(['A', 'B'], '2015-01-01', '2015-01-14', csv_dir=str(csv_dir))
+    handler = PortfolioHandler(
+        ['A', 'B'], 1e5, None, ph, ConstantPositionSizer(), None, SimulationExecutionHandler(),
+        ConstantMixStrategy({'A': 0.5, 'B': 0.5}, schedule=1), None, pd.Timestamp('2015-01-01'),
+        position_book=position_book
+    )
+    handler.initialize_parameters()
+    handler.run_session()
+
+    statistics  = handler.portfolio.statistics
+    quantities  = handler.portfolio.quantities
+    assert not statistics['equity'].isnull().any()
+    # B is only bought once it has a price
+    assert (quantities['B'].loc[:'2015-01-05'] == 0).all()
+    assert quantities['B'].iloc[-1] > 0
+    assert handler.portfolio.equity == pytest.approx(
+        handler.portfolio.cur_cash + np.dot(quantities.iloc[-1], ph.adj_close[-1]))
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from core.price_handler import ArrayPriceHandler
+from sweep import ParameterSweep, constant_mix
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SPAWNED_SWEEP = """
+import multiprocessing
+import numpy as np
+import pandas as pd
+from core.price_handler import ArrayPriceHandler
+from sweep import ParameterSweep, constant_mix
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method('spawn')
+    timestamp   = pd.bdate_range('2015-01-01', periods=60)
+    prices      = np.column_stack([np.linspace(200.0, 210.0, 60), np.linspace(100.0, 101.0, 60)])
+    ph          = ArrayPriceHandler(timestamp, ['SPY', 'AGG'], prices, prices.copy())
+    summary, _  = ParameterSweep(ph, 1e5, constant_mix, {'spy': [0.0, 0.5, 1.0]}, processes=2).run()
+    print(len(summary))
+"""
+
+
+def test_the_demo_factory_runs_in_spawned_workers():
+    output = subprocess.check_output(
+        [sys.executable, '-c', SPAWNED_SWEEP], cwd=ROOT,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT] + sys.path))
+    )
+    assert output.decode().strip().splitlines()[-1] == '3'
+
+
+def test_sweep_in_process_matches_constant_mix():
+    timestamp   = pd.bdate_range('2015-01-01', periods=60)
+    prices      = np.column_stack([np.linspace(200.0, 210.0, 60), np.linspace(100.0, 101.0, 60)])
+    ph          = ArrayPriceHandler(timestamp, ['SPY', 'AGG'], prices, prices.copy())
+    summary, equity = ParameterSweep(ph, 1e5, constant_mix, {'spy': [0.0, 1.0]}, processes=1).run()
+
+    assert summary['spy'].tolist() == [0.0, 1.0]
+    # SPY rose 5% and AGG 1% over the run
+    assert summary.loc[1, 'total_return'] > summary.loc[0, 'total_return'] > 0
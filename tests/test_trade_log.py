@@ -0,0 +1,27 @@
+import os
+
+import pandas as pd
+
+from core.trade_log import BinaryTradeLog, read_trade_log
+
+
+def test_binary_log_drops_torn_records_on_reopen(tmp_path):
+    path = str(tmp_path / 'log')
+    with BinaryTradeLog(path) as log:
+        log.add_fills(pd.Timestamp('2015-01-02'), ['A', 'B'], ['BOT', 'SLD'], [10, 5], [1.5, 2.5], [1.0, 1.0])
+
+    # a run that crashed halfway through writing its next chunk
+    for name in os.listdir(path):
+        if name != BinaryTradeLog.META:
+            with open(os.path.join(path, name), 'ab') as f:
+                f.write(b'\x01\x02\x03')
+
+    with BinaryTradeLog(path) as log:
+        log.add_fills(pd.Timestamp('2015-01-05'), ['A'], ['SLD'], [10], [1.75], [1.0])
+
+    fills = pd.concat(read_trade_log(path))
+    assert fills['ticker'].tolist() == ['A', 'B', 'A']
+    assert fills['action'].tolist() == ['BOT', 'SLD', 'SLD']
+    assert fills['quantity'].tolist() == [10, 5, 10]
+    assert fills['price'].tolist() == [1.5, 2.5, 1.75]
+    assert fills['timestamp'].tolist() == list(pd.DatetimeIndex(['2015-01-02', '2015-01-02', '2015-01-05']))
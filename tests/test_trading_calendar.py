@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from core.price_handler import ArrayPriceHandler
+from core.trading_calendar import TradingCalendar
+
+
+HOLIDAYS = ['2015-01-01', '2015-04-03', '2015-12-25', '2016-01-01']
+
+
+def assert_same_masks(calendar, expected):
+    for name in ['trading', 'week_end', 'month_end', 'quarter_end', 'year_end']:
+        np.testing.assert_array_equal(getattr(calendar, name), getattr(expected, name), name)
+    for n, offset in [(1, 0), (5, 2), (20, 0)]:
+        np.testing.assert_array_equal(calendar.every(n, offset), expected.every(n, offset))
+
+
+def test_extend_matches_a_calendar_built_at_once():
+    for freq in ['B', 'D', '4h']:
+        timestamp   = pd.date_range('2014-11-20', '2016-01-10', freq=freq)
+        calendar    = TradingCalendar(timestamp[:7], HOLIDAYS)
+        calendar.every(5, 2)
+        for end in [8, 30, 31, 250, len(timestamp) - 1, len(timestamp)]:
+            calendar.extend(timestamp[:end])
+        assert_same_masks(calendar, TradingCalendar(timestamp, HOLIDAYS))
+
+
+def test_append_extends_the_price_handler_calendar():
+    timestamp   = pd.date_range('2015-01-01', '2015-12-31', freq='B')
+    prices      = np.arange(1.0, len(timestamp) + 1)[:, None]
+    handler     = ArrayPriceHandler(timestamp[:5], ['A'], prices[:5], prices[:5])
+    calendar    = handler.get_calendar()
+    for i in range(5, len(timestamp)):
+        handler.append(timestamp[i:i + 1], prices[i:i + 1], prices[i:i + 1])
+
+    assert handler.get_calendar() is calendar
+    assert handler.timestamp.equals(timestamp)
+    np.testing.assert_array_equal(handler.adj_close, prices)
+    assert_same_masks(calendar, TradingCalendar(timestamp))
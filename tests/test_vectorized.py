@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from constant_position_sizer import ConstantPositionSizer
+from core.excution_handler import SimulationExecutionHandler
+from core.price_handler import ArrayPriceHandler
+from core.vectorized import VectorizedBacktest, cross_check
+from strategy.constant_mix_strategy import ConstantMixStrategy
+
+
+def prices(n_bars, listed, seed=0):
+    """
+    Random walks for three tickers, the last one listed on bar
+    listed and without a price before.
+    """
+    rng         = np.random.RandomState(seed)
+    adj_close   = 50.0 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_bars, 3)), axis=0))
+    adj_close[:listed, 2] = np.nan
+    return pd.bdate_range('2015-01-01', periods=n_bars), adj_close
+
+
+def test_cross_check_with_a_ticker_listed_after_the_start():
+    timestamp, adj_close = prices(300, 100)
+    listed  = timestamp[100]
+    tickers = ['A', 'B', 'C']
+    report  = cross_check(
+        ArrayPriceHandler(timestamp, tickers, adj_close.copy(), adj_close),
+        ConstantMixStrategy({'A': 0.3, 'B': 0.3, 'C': 0.4}, schedule=5), 1e5,
+        ConstantPositionSizer(), SimulationExecutionHandler()
+    )
+
+    assert report['match'], (report['max_equity_diff'], report['max_cash_diff'], report['max_quantity_diff'])
+    quantities = report['event_driven']['quantities']
+    assert (quantities['C'][quantities.index < listed] == 0).all() and quantities['C'].iloc[-1] > 0
+    assert not report['event_driven']['statistics']['equity'].isnull().any()
+
+
+def test_batch_equity_is_finite_before_a_listing():
+    timestamp, adj_close = prices(120, 60)
+    engine  = VectorizedBacktest(timestamp, ['A', 'B', 'C'], adj_close, 1e5)
+    equity  = engine.run_batch(timestamp[::20], [[0.5, 0.5, 0.0], [0.2, 0.4, 0.4]])
+
+    assert np.isfinite(equity.values).all()
+    # the first configuration never holds C, the second buys it once listed
+    single  = engine.run(pd.DataFrame([[0.2, 0.4, 0.4]] * 6, index=timestamp[::20], columns=['A', 'B', 'C']))
+    np.testing.assert_allclose(equity[1].values, single['statistics']['equity'].values)